@@ -0,0 +1,75 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Bits per point and throughput of the attribute codec, on a reflectance that
+varies smoothly in space with sensor noise on top.
+
+    python benchmarks/bench_attributes.py --sizes 10000 100000 --levels 14
+
+Throughput is in leaves per second, bits per point are against the input
+points. raw bpp is the quantized attribute stored as is.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from elementree.lidar.octree import attributes
+from elementree.lidar.octree.LinearOctree import LinearOctree
+from elementree.lidar.octree.Region import Region
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10_000, 100_000])
+    parser.add_argument('--levels', type=int, default=14)
+    parser.add_argument('--bits', type=int, default=8)
+    parser.add_argument('--noise', type=float, default=0.02)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f'{"points":>10} {"leaves":>10} {"raw bpp":>8} {"coded bpp":>10} '
+          f'{"enc k/s":>9} {"dec k/s":>9}')
+    for size in args.sizes:
+        points = rng.uniform(-50, 50, size=(size, 4))
+        points[:, 3] = np.clip(
+            0.5 + 0.3 * np.sin(points[:, 0] / 20) * np.cos(points[:, 1] / 20)
+            + args.noise * rng.normal(size=size), 0, 1
+        )
+        tree = LinearOctree(points, Region(1, 1, 1, 0, 0, 0))
+        tree.setup(args.levels)
+        tree.build_tree()
+
+        start = time.perf_counter()
+        values = attributes.leaf_attributes(tree)
+        data = attributes.encode_attributes(tree.occupancy, values, args.bits)
+        encode = time.perf_counter() - start
+        start = time.perf_counter()
+        attributes.decode(data, tree.occupancy)
+        decode = time.perf_counter() - start
+
+        print(f'{size:>10} {len(values):>10} '
+              f'{args.bits * len(values) / size:>8.3f} '
+              f'{8 * len(data) / size:>10.3f} '
+              f'{len(values) / encode / 1000:>9.1f} '
+              f'{len(values) / decode / 1000:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+End to end frames per second of encoding a recorded drive, one KITTI style
+.bin file per frame, with batch.encode_frames against a loop of
+Octree(...).setup(levels), build_tree() and bft() per frame.
+
+    python benchmarks/bench_batch.py --frames 50 --points 120000 --workers 1 2 4
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from elementree.lidar.octree import batch
+from elementree.lidar.octree.Octree import Octree
+from elementree.lidar.octree.Region import Region
+
+
+def _loop(paths: list[str], levels: int, vectorized: bool):
+    for path in paths:
+        points = np.fromfile(path, dtype=np.float32).reshape(-1, 4)
+        tree = Octree(points, Region(1, 1, 1, 0, 0, 0))
+        tree.setup(levels)
+        tree.build_tree(vectorized=vectorized)
+        bytes(tree.bft())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=50)
+    parser.add_argument('--points', type=int, default=120_000)
+    parser.add_argument('--levels', type=int, default=16)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--object-frames', type=int, default=2,
+                        help='frames the object Octree loop is timed on')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for i in range(args.frames):
+            path = os.path.join(directory, f'{i:06d}.bin')
+            rng.uniform(-80, 80, size=(args.points, 4)).astype(np.float32).tofile(path)
+            paths.append(path)
+
+        print(f'{args.frames} frames of {args.points} points, '
+              f'{os.cpu_count()} CPUs')
+        start = time.perf_counter()
+        _loop(paths[:args.object_frames], args.levels, vectorized=False)
+        elapsed = time.perf_counter() - start
+        print(f'{"Octree loop":>28} {args.object_frames / elapsed:>8.2f} frames/s')
+
+        start = time.perf_counter()
+        _loop(paths, args.levels, vectorized=True)
+        elapsed = time.perf_counter() - start
+        print(f'{"Octree loop, vectorized":>28} {args.frames / elapsed:>8.2f} frames/s')
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            for _ in batch.encode_frames(paths, args.levels, workers=workers):
+                pass
+            elapsed = time.perf_counter() - start
+            print(f'{f"encode_frames, {workers} workers":>28} '
+                  f'{args.frames / elapsed:>8.2f} frames/s')
+
+
+if __name__ == '__main__':
+    main()
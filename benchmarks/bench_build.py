@@ -0,0 +1,73 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Wall clock of Octree.build_tree against the vectorized build.
+
+    python benchmarks/bench_build.py --sizes 100000 1000000 10000000
+
+The object build is only timed up to --max-reference points, it takes minutes
+beyond that.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from elementree.lidar.octree.Octree import Octree
+from elementree.lidar.octree.Region import Region
+
+
+def _tree(points: np.ndarray, levels: int) -> Octree:
+    tree = Octree(points, Region(1, 1, 1, 0, 0, 0))
+    tree.setup(levels)
+    return tree
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--levels', type=int, default=16)
+    parser.add_argument('--max-reference', type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f'{"points":>10} {"object s":>10} {"vector s":>10} {"speedup":>8}')
+    for size in args.sizes:
+        points = rng.uniform(-50, 50, size=(size, 4)).astype(np.float32)
+
+        tree = _tree(points, args.levels)
+        start = time.perf_counter()
+        tree.build_tree(vectorized=True)
+        vector = time.perf_counter() - start
+        occupancy = tree.bft()
+
+        if size <= args.max_reference:
+            tree = _tree(points, args.levels)
+            start = time.perf_counter()
+            tree.build_tree()
+            reference = time.perf_counter() - start
+            assert tree.bft() == occupancy
+            print(f'{size:>10} {reference:>10.3f} {vector:>10.3f} '
+                  f'{reference / vector:>7.1f}x')
+        else:
+            print(f'{size:>10} {"-":>10} {vector:>10.3f} {"-":>8}')
+
+
+if __name__ == '__main__':
+    main()
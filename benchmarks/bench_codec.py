@@ -0,0 +1,66 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Throughput and bits per point of the occupancy codec.
+
+    python benchmarks/bench_codec.py --sizes 10000 100000 --levels 12
+
+MB/s is measured on the raw occupancy stream, one byte per node.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from elementree.lidar.octree import codec
+from elementree.lidar.octree.LinearOctree import LinearOctree
+from elementree.lidar.octree.Region import Region
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10_000, 100_000])
+    parser.add_argument('--levels', type=int, default=12)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f'{"points":>10} {"nodes":>10} {"raw bpp":>8} {"coded bpp":>10} '
+          f'{"enc MB/s":>9} {"dec MB/s":>9}')
+    for size in args.sizes:
+        tree = LinearOctree(rng.normal(size=(size, 4)), Region(1, 1, 1, 0, 0, 0))
+        tree.setup(args.levels)
+        tree.build_tree()
+        occupancy = tree.occupancy
+
+        start = time.perf_counter()
+        data = codec.encode(tree)
+        encode = time.perf_counter() - start
+        start = time.perf_counter()
+        decoded = codec.decode_occupancy(data)
+        decode = time.perf_counter() - start
+        assert np.array_equal(decoded, occupancy)
+
+        megabytes = len(occupancy) / 1e6
+        print(f'{size:>10} {len(occupancy):>10} '
+              f'{8 * len(occupancy) / size:>8.3f} {8 * len(data) / size:>10.3f} '
+              f'{megabytes / encode:>9.3f} {megabytes / decode:>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
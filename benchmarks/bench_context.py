@@ -0,0 +1,99 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Wall clock of context.features against building the tree it describes, and
+against reading the same features off the Octree objects in Python.
+
+    python benchmarks/bench_context.py --sizes 10000 100000 1000000
+"""
+import argparse
+import time
+from collections import deque
+
+import numpy as np
+
+from elementree.lidar.octree import context
+from elementree.lidar.octree import morton
+from elementree.lidar.octree.LinearOctree import LinearOctree
+from elementree.lidar.octree.Octree import Octree
+from elementree.lidar.octree.Region import Region
+
+
+def _python(tree: Octree) -> int:
+    """
+    Parent, sibling and 3x3x3 neighbour occupancy of every node, walking the
+    node objects
+    """
+    grid, rows = {}, []
+    nodes = deque([(tree, None, (0, 0, 0))])
+    while nodes:
+        node, parent, position = nodes.popleft()
+        grid[(node.level, position)] = node.occupancy
+        rows.append((node.level, position, parent))
+        for i, child in enumerate(node.children):
+            if child:
+                x, y, z = morton.OCTANT_BITS[i].tolist()
+                nodes.append((child, node, (2 * position[0] + x,
+                                            2 * position[1] + y,
+                                            2 * position[2] + z)))
+    features = []
+    for level, (x, y, z), parent in rows:
+        siblings = [0] * 8 if parent is None else [
+            0 if c is None else c.occupancy for c in parent.children]
+        around = [grid.get((level, (x + i, y + j, z + k)), 0)
+                  for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1)]
+        features.append((siblings, around))
+    return len(features)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--levels', type=int, default=12)
+    parser.add_argument('--max-reference', type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f'{"points":>9} {"nodes":>9} {"build s":>8} {"features s":>11} '
+          f'{"M nodes/s":>10} {"python s":>9}')
+    for size in args.sizes:
+        points = rng.uniform(-50, 50, size=(size, 4)).astype(np.float32)
+        tree = LinearOctree(points, Region(1, 1, 1, 0, 0, 0))
+        tree.setup(args.levels)
+        start = time.perf_counter()
+        tree.build_tree()
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        context.features(tree)
+        export = time.perf_counter() - start
+
+        python = '-'
+        if size <= args.max_reference:
+            objects = Octree(points, Region(1, 1, 1, 0, 0, 0))
+            objects.setup(args.levels)
+            objects.build_tree()
+            start = time.perf_counter()
+            _python(objects)
+            python = f'{time.perf_counter() - start:.3f}'
+        print(f'{size:>9} {len(tree):>9} {build:>8.3f} {export:>11.3f} '
+              f'{len(tree) / export / 1e6:>10.2f} {python:>9}')
+
+
+if __name__ == '__main__':
+    main()
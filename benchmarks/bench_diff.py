@@ -0,0 +1,81 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Cost of diff between consecutive scans against the fraction of the scene
+that changed. The fingerprints of each tree are computed once, the time of
+the first diff, and every diff after that only walks the changed paths.
+
+    python benchmarks/bench_diff.py --size 1000000 --changed 0.0001 0.001 0.01
+"""
+import argparse
+import time
+
+import numpy as np
+
+from elementree.lidar.octree import diff
+from elementree.lidar.octree.LinearOctree import LinearOctree
+from elementree.lidar.octree.Region import Region
+
+
+def _tree(points: np.ndarray, levels: int) -> LinearOctree:
+    side = 2 ** levels - 1
+    tree = LinearOctree(points, Region(side, side, side, 0, 0, 0))
+    tree.build_tree()
+    return tree
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=1_000_000)
+    parser.add_argument('--levels', type=int, default=16)
+    parser.add_argument('--depth', type=int, default=12)
+    parser.add_argument('--changed', type=float, nargs='+',
+                        default=[0.0001, 0.001, 0.01, 0.1])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    side = 2 ** args.levels - 1
+    points = rng.integers(0, side, size=(args.size, 4)).astype(np.float64)
+    scene = _tree(points, args.levels)
+    start = time.perf_counter()
+    scene.fingerprints
+    hashing = time.perf_counter() - start
+    print(f'{args.size} points, {len(scene)} nodes, fingerprints '
+          f'{1000 * hashing:.1f} ms per tree')
+
+    print(f'{"changed":>8} {"added":>8} {"removed":>8} {"diff ms":>8} '
+          f'{"xor ms":>8}')
+    for fraction in args.changed:
+        moved = points.copy()
+        count = int(fraction * args.size)
+        moved[:count, :3] = rng.integers(0, side, size=(count, 3))
+        other = _tree(moved, args.levels)
+        other.fingerprints
+
+        start = time.perf_counter()
+        added, removed = diff.diff(scene, other, args.depth)
+        walk = time.perf_counter() - start
+        start = time.perf_counter()
+        diff.xor_occupancy(scene, other)
+        stream = time.perf_counter() - start
+        print(f'{fraction:>8} {len(added):>8} {len(removed):>8} '
+              f'{1000 * walk:>8.1f} {1000 * stream:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Per frame latency of updating an Octree in place with move() against
+building it again, for frames where a given fraction of the points moved.
+
+    python benchmarks/bench_incremental.py --size 20000 --changed 0.001 0.01 0.1
+"""
+import argparse
+import time
+
+import numpy as np
+
+from elementree.lidar.octree.Octree import Octree
+from elementree.lidar.octree.Region import Region
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=20_000)
+    parser.add_argument('--levels', type=int, default=16)
+    parser.add_argument('--changed', type=float, nargs='+',
+                        default=[0.001, 0.01, 0.1])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-50, 50, size=(args.size, 4)).astype(np.float32)
+    tree = Octree(points, Region(1, 1, 1, 0, 0, 0))
+    tree.setup(args.levels)
+    frame = np.array(tree._points)
+    high = 2 ** args.levels - 1
+
+    start = time.perf_counter()
+    tree.build_tree()
+    rebuild = time.perf_counter() - start
+    start = time.perf_counter()
+    Octree(frame, tree.bounds).build_tree(vectorized=True)
+    vectorized = time.perf_counter() - start
+    print(f'{args.size} points, rebuild {1000 * rebuild:.1f} ms, '
+          f'vectorized rebuild {1000 * vectorized:.1f} ms')
+    print(f'{"changed":>8} {"moves":>7} {"update ms":>10} {"nodes":>7} '
+          f'{"speedup":>8}')
+    tree.pop_changes()
+    for fraction in args.changed:
+        moved = rng.choice(args.size, int(fraction * args.size), replace=False)
+        # small jitter, as between two frames of a moving sensor
+        jitter = rng.integers(-64, 65, size=(len(moved), 3))
+        targets = np.clip(frame[moved, :3] + jitter, 0, high - 1)
+        start = time.perf_counter()
+        for index, target in zip(moved.tolist(), targets.tolist()):
+            tree.move(index, target + [0.0])
+        update = time.perf_counter() - start
+        frame[moved, :3] = targets
+        changes = tree.pop_changes()
+        print(f'{fraction:>8.3f} {len(moved):>7} {1000 * update:>10.2f} '
+              f'{len(changes):>7} {rebuild / update:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Time to the first query of an object build, eager against lazy. The lazy
+build splits only the nodes the query walks through; a full traversal
+afterwards splits the rest.
+
+    python benchmarks/bench_lazy.py --sizes 100000 300000 --levels 16
+"""
+import argparse
+import time
+
+import numpy as np
+
+from elementree.lidar.octree.Octree import Octree
+from elementree.lidar.octree.Region import Region
+
+
+def _first_query(points: np.ndarray, levels: int, lazy: bool) -> (float, float):
+    """
+    Seconds from setup to the result of a small box query, and to a full
+    breadth first traversal after it
+    """
+    tree = Octree(points, Region(1, 1, 1, 0, 0, 0))
+    tree.setup(levels)
+    side = 2 ** levels
+    region = Region(side // 2 + side // 64, side // 2 + side // 64,
+                    side // 2 + side // 64, side // 2, side // 2, side // 2)
+    start = time.perf_counter()
+    tree.build_tree(lazy=lazy)
+    tree.query_box(region)
+    first = time.perf_counter() - start
+    tree.bft()
+    return first, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[100_000, 300_000])
+    parser.add_argument('--levels', type=int, default=16)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f'{"points":>8} {"eager s":>8} {"lazy s":>8} {"speedup":>8} '
+          f'{"eager+bft s":>12} {"lazy+bft s":>11}')
+    for size in args.sizes:
+        points = rng.uniform(-50, 50, size=(size, 4)).astype(np.float32)
+        eager, eager_full = _first_query(points, args.levels, lazy=False)
+        lazy, lazy_full = _first_query(points, args.levels, lazy=True)
+        print(f'{size:>8} {eager:>8.3f} {lazy:>8.3f} {eager / lazy:>7.1f}x '
+              f'{eager_full:>12.3f} {lazy_full:>11.3f}')
+
+
+if __name__ == '__main__':
+    main()
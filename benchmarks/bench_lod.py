@@ -0,0 +1,67 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Time until the first coarse cloud is available when a breadth first occupancy
+stream is decoded progressively, against waiting for the whole stream.
+
+    python benchmarks/bench_lod.py --size 1000000 --chunk 65536
+"""
+import argparse
+import time
+
+import numpy as np
+
+from elementree.lidar.octree import codec
+from elementree.lidar.octree import lod
+from elementree.lidar.octree.Octree import Octree
+from elementree.lidar.octree.Region import Region
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=1_000_000)
+    parser.add_argument('--levels', type=int, default=16)
+    parser.add_argument('--chunk', type=int, default=65536,
+                        help='bytes arriving at a time')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-50, 50, size=(args.size, 4)).astype(np.float32)
+    tree = Octree(points, Region(1, 1, 1, 0, 0, 0))
+    tree.setup(args.levels)
+    tree.build_tree(vectorized=True)
+    stream = np.array(tree.bft(), dtype=np.uint8).tobytes()
+
+    start = time.perf_counter()
+    codec.leaf_centers(np.frombuffer(stream, dtype=np.uint8), args.levels)
+    full = time.perf_counter() - start
+    print(f'{len(stream)} bytes, full decode {1000 * full:.1f} ms')
+
+    print(f'{"level":>6} {"bytes read":>11} {"points":>9} {"ms":>9}')
+    decoder = lod.ProgressiveDecoder(args.levels)
+    start = time.perf_counter()
+    for offset in range(0, len(stream), args.chunk):
+        for level, cloud in decoder.feed(stream[offset:offset + args.chunk]):
+            elapsed = time.perf_counter() - start
+            read = min(offset + args.chunk, len(stream))
+            print(f'{level:>6} {read:>11} {len(cloud):>9} '
+                  f'{1000 * elapsed:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
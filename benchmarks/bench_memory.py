@@ -0,0 +1,76 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Peak RSS of building the linked Octree against the LinearOctree arrays.
+
+    python benchmarks/bench_memory.py --sizes 100000 200000
+
+Every build runs in its own process so ru_maxrss only covers that build.
+"""
+import argparse
+import multiprocessing
+import resource
+
+import numpy as np
+
+
+def _build(kind: str, size: int, levels: int, queue):
+    from elementree.lidar.octree.LinearOctree import LinearOctree
+    from elementree.lidar.octree.Octree import Octree
+    from elementree.lidar.octree.Region import Region
+
+    points = np.random.default_rng(0).uniform(-50, 50, size=(size, 4))
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cls = Octree if kind == 'object' else LinearOctree
+    tree = cls(points, Region(1, 1, 1, 0, 0, 0))
+    tree.setup(levels)
+    tree.build_tree()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((baseline, peak, len(tree.bft())))
+
+
+def measure(kind: str, size: int, levels: int) -> (int, int, int):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_build, args=(kind, size, levels, queue)
+    )
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[100_000, 200_000])
+    parser.add_argument('--levels', type=int, default=16)
+    args = parser.parse_args()
+
+    print(f'{"points":>10} {"nodes":>10} {"kind":>8} {"peak MiB":>10} '
+          f'{"build MiB":>10}')
+    for size in args.sizes:
+        for kind in ('object', 'linear'):
+            baseline, peak, nodes = measure(kind, size, args.levels)
+            print(f'{size:>10} {nodes:>10} {kind:>8} {peak / 1024:>10.1f} '
+                  f'{(peak - baseline) / 1024:>10.1f}')
+
+
+if __name__ == '__main__':
+    multiprocessing.set_start_method('spawn')
+    main()
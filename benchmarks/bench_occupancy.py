@@ -0,0 +1,82 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Scans per second integrated into an OccupancyMap. The scans are simulated
+from a sensor driving through a walled room: every ray ends on a wall, the
+floor or the ceiling, so the map fills with free space that pruning keeps
+small.
+
+    python benchmarks/bench_occupancy.py --scans 10 --rays 5000 --levels 10
+"""
+import argparse
+import time
+
+import numpy as np
+
+from elementree.lidar.octree.OccupancyMap import OccupancyMap
+from elementree.lidar.octree.Region import Region
+
+
+def _scan(origin: np.ndarray, rays: int, size: float, height: float,
+          rng: np.random.Generator) -> np.ndarray:
+    """
+    End points of rays from origin to the first surface of the room
+    """
+    azimuth = rng.uniform(0, 2 * np.pi, rays)
+    elevation = rng.uniform(-0.4, 0.4, rays)
+    direction = np.stack((np.cos(azimuth) * np.cos(elevation),
+                          np.sin(azimuth) * np.cos(elevation),
+                          np.sin(elevation)), axis=1)
+    with np.errstate(divide='ignore'):
+        low = np.array([0.05, 0.05, 0.05]) - origin
+        high = np.array([size - 0.05, size - 0.05, height - 0.05]) - origin
+        t = np.where(direction > 0, high / direction, low / direction)
+    return origin + direction * np.min(np.abs(t), axis=1)[:, np.newaxis]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scans', type=int, default=10)
+    parser.add_argument('--rays', type=int, default=5_000)
+    parser.add_argument('--levels', type=int, default=10)
+    parser.add_argument('--size', type=float, default=40.0)
+    parser.add_argument('--resolution', type=float, default=0.05)
+    args = parser.parse_args()
+
+    side = args.resolution * 2 ** args.levels
+    occupancy = OccupancyMap(args.levels, Region(side, side, side, 0, 0, 0))
+    rng = np.random.default_rng(0)
+    height = 4.0
+    print(f'{"scan":>5} {"ms":>8} {"nodes":>9}')
+    total = 0.0
+    for i in range(args.scans):
+        origin = np.array([5 + 30 * i / max(args.scans - 1, 1),
+                           args.size / 2 + 5 * np.sin(i / 3), 1.5])
+        points = _scan(origin, args.rays, args.size, height, rng)
+        start = time.perf_counter()
+        occupancy.insert_scan(points, origin)
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        if i % max(args.scans // 5, 1) == 0 or i == args.scans - 1:
+            print(f'{i:>5} {1000 * elapsed:>8.1f} {len(occupancy):>9}')
+    print(f'{args.scans / total:.2f} scans/s, '
+          f'{args.scans * args.rays / total / 1e3:.1f} k rays/s')
+
+
+if __name__ == '__main__':
+    main()
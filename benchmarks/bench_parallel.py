@@ -0,0 +1,61 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Scaling of LinearOctree.build_tree with the number of workers.
+
+    python benchmarks/bench_parallel.py --size 2000000 --workers 1 2 4 8 16
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from elementree.lidar.octree.LinearOctree import LinearOctree
+from elementree.lidar.octree.Region import Region
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=2_000_000)
+    parser.add_argument('--levels', type=int, default=16)
+    parser.add_argument('--split-depth', type=int, default=2)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    points = np.random.default_rng(0).normal(size=(args.size, 4))
+    print(f'{args.size} points, {os.cpu_count()} cpus')
+    print(f'{"workers":>8} {"build s":>9} {"speedup":>8}')
+    serial = None
+    expected = None
+    for workers in args.workers:
+        tree = LinearOctree(points, Region(1, 1, 1, 0, 0, 0))
+        tree.setup(args.levels)
+        start = time.perf_counter()
+        tree.build_tree(workers=workers, split_depth=args.split_depth)
+        elapsed = time.perf_counter() - start
+        if expected is None:
+            expected = tree.occupancy
+            serial = elapsed
+        assert np.array_equal(expected, tree.occupancy)
+        print(f'{workers:>8} {elapsed:>9.3f} {serial / elapsed:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Latency and throughput of the Octree spatial queries against brute force
+NumPy over the whole cloud.
+
+    python benchmarks/bench_query.py --size 1000000 --queries 1000
+
+Latency is one query at a time, throughput is the batched (M, 3) form.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from elementree import utils
+from elementree.lidar.octree.Octree import Octree
+from elementree.lidar.octree.Region import Region
+
+
+def _brute_radius(coords: np.ndarray, query: np.ndarray, radius: float):
+    offset = coords - query
+    return np.flatnonzero(np.einsum('ij,ij->i', offset, offset) <= radius ** 2)
+
+
+def _brute_knn(coords: np.ndarray, query: np.ndarray, k: int):
+    offset = coords - query
+    distance = np.einsum('ij,ij->i', offset, offset)
+    nearest = np.argpartition(distance, k)[:k]
+    return nearest[np.argsort(distance[nearest])]
+
+
+def _time(function, queries: np.ndarray) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        function(query)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=1_000_000)
+    parser.add_argument('--levels', type=int, default=16)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--radius', type=float, default=1000.0)
+    parser.add_argument('--k', type=int, default=16)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-50, 50, size=(args.size, 4)).astype(np.float32)
+    tree = Octree(points, Region(1, 1, 1, 0, 0, 0))
+    tree.setup(args.levels)
+    tree.build_tree(vectorized=True)
+    coords = tree._linear.points[:, :3].astype(np.float64)
+    scaled, _ = utils.quantize(points, tree._max, np.float32(0))
+    queries = scaled[rng.integers(0, args.size, args.queries), :3]
+    queries = queries.astype(np.float64)
+
+    rows = [
+        ('radius', lambda q: tree.query_radius(q, args.radius),
+         lambda q: _brute_radius(coords, q, args.radius),
+         lambda: tree.query_radius(queries, args.radius)),
+        ('knn', lambda q: tree.knn(q, args.k),
+         lambda q: _brute_knn(coords, q, args.k),
+         lambda: tree.knn(queries, args.k)),
+    ]
+    print(f'{args.size} points, {args.queries} queries')
+    print(f'{"query":>8} {"tree ms":>9} {"brute ms":>9} {"speedup":>8} '
+          f'{"batch q/s":>10}')
+    for name, single, brute, batch in rows:
+        tree_time = _time(single, queries)
+        brute_time = _time(brute, queries)
+        start = time.perf_counter()
+        batch()
+        batch_time = time.perf_counter() - start
+        print(f'{name:>8} {1000 * tree_time / args.queries:>9.3f} '
+              f'{1000 * brute_time / args.queries:>9.3f} '
+              f'{brute_time / tree_time:>7.1f}x '
+              f'{args.queries / batch_time:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Time from a point cloud file to a built tree for every reader format,
+against reading the file into memory and converting it to Python lists as
+loaders did before.
+
+    python benchmarks/bench_readers.py --points 1000000 --levels 16
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from elementree.lidar import readers
+from elementree.lidar.octree.LinearOctree import LinearOctree
+from elementree.lidar.octree.Octree import Octree
+from elementree.lidar.octree.Region import Region
+
+FIELDS = [('x', '<f4'), ('y', '<f4'), ('z', '<f4'), ('intensity', '<f4'),
+          ('ring', '<u2')]
+
+
+def _write(directory: str, cloud: np.ndarray) -> dict[str, str]:
+    paths = {name: os.path.join(directory, f'cloud.{name}')
+             for name in ('bin', 'pcd', 'ply')}
+    np.stack([cloud[f] for f in ('x', 'y', 'z', 'intensity')],
+             axis=1).tofile(paths['bin'])
+    with open(paths['pcd'], 'wb') as file:
+        file.write((f'VERSION 0.7\nFIELDS x y z intensity ring\n'
+                    f'SIZE 4 4 4 4 2\nTYPE F F F F U\nCOUNT 1 1 1 1 1\n'
+                    f'WIDTH {len(cloud)}\nHEIGHT 1\nPOINTS {len(cloud)}\n'
+                    f'DATA binary\n').encode('ascii'))
+        file.write(cloud.tobytes())
+    with open(paths['ply'], 'wb') as file:
+        file.write((f'ply\nformat binary_little_endian 1.0\n'
+                    f'element vertex {len(cloud)}\nproperty float x\n'
+                    f'property float y\nproperty float z\n'
+                    f'property float intensity\nproperty ushort ring\n'
+                    f'end_header\n').encode('ascii'))
+        file.write(cloud.tobytes())
+    return paths
+
+
+def _parsed(path: str) -> list:
+    # the file read into memory and handed over as lists
+    points = readers.read(path)
+    return np.array(points).tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--points', type=int, default=1_000_000)
+    parser.add_argument('--levels', type=int, default=16)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    cloud = np.zeros(args.points, dtype=FIELDS)
+    for name in ('x', 'y', 'z', 'intensity'):
+        cloud[name] = rng.uniform(-50, 50, args.points)
+
+    bounds = Region(1, 1, 1, 0, 0, 0)
+    print(f'{"format":>6} {"map ms":>8} {"parse ms":>9} '
+          f'{"setup s":>8} {"from list":>10} {"tree s":>7}')
+    with tempfile.TemporaryDirectory() as directory:
+        for name, path in _write(directory, cloud).items():
+            start = time.perf_counter()
+            points = readers.read(path)
+            mapped = time.perf_counter() - start
+
+            start = time.perf_counter()
+            parsed = _parsed(path)
+            parse = time.perf_counter() - start
+
+            start = time.perf_counter()
+            Octree(points, bounds).setup(args.levels)
+            setup = time.perf_counter() - start
+            start = time.perf_counter()
+            Octree(parsed, bounds).setup(args.levels)
+            listed = time.perf_counter() - start
+
+            start = time.perf_counter()
+            tree = LinearOctree(readers.read(path), bounds)
+            tree.setup(args.levels)
+            tree.build_tree()
+            built = time.perf_counter() - start
+            print(f'{name:>6} {1000 * mapped:>8.2f} {1000 * parse:>9.1f} '
+                  f'{setup:>8.3f} {listed:>10.3f} {built:>7.3f}')
+
+
+if __name__ == '__main__':
+    main()
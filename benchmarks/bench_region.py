@@ -0,0 +1,68 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Cost of the Region operations on the object build path: deriving the 8
+octant regions of a node, one within_bounds check, and classifying a batch
+of points per point against the vectorized octants().
+
+    python benchmarks/bench_region.py --points 100000
+"""
+import argparse
+import timeit
+
+import numpy as np
+
+from elementree.lidar.octree.Region import Region
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--points', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    region = Region(65535, 65535, 65535, 0, 0, 0)
+    center = region.center()
+    points = np.random.default_rng(0).integers(
+        0, 65535, size=(args.points, 4)
+    )
+    listed = points.tolist()
+    children = region.children(center)
+
+    def per_point():
+        for point in listed:
+            for child in children:
+                if child.within_bounds(point):
+                    break
+
+    number = 10_000
+    child_us = min(timeit.repeat(lambda: region.children(center),
+                                 number=number, repeat=args.repeat))
+    check_ns = min(timeit.repeat(lambda: children[5].within_bounds(listed[0]),
+                                 number=number * 10, repeat=args.repeat))
+    loop = min(timeit.repeat(per_point, number=1, repeat=args.repeat))
+    batch = min(timeit.repeat(lambda: region.octants(points, center),
+                              number=1, repeat=args.repeat))
+    print(f'children()        {1e6 * child_us / number:8.2f} us per node')
+    print(f'within_bounds     {1e9 * check_ns / number / 10:8.1f} ns per call')
+    print(f'per point octants {1e3 * loop:8.1f} ms for {args.points} points')
+    print(f'octants()         {1e3 * batch:8.1f} ms for {args.points} points')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Quantization of a point cloud, the per element loop scale_to_range used to
+run once per axis against utils.quantize.
+
+    python benchmarks/bench_scale.py --sizes 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from elementree import utils
+
+
+def _loop_scale_to_range(to_max, to_min, array):
+    from_min = np.min(array)
+    from_max = np.max(array)
+    scale_factor = utils.scaling_factor(
+        from_min=from_min, from_max=from_max, to_max=to_max, to_min=to_min
+    )
+    for i in range(len(array)):
+        array[i] = int(scale_factor * (array[i] - from_min))
+    return array, scale_factor
+
+
+def _loop(points: np.ndarray, to_max) -> np.ndarray:
+    x, y, z, r = np.hsplit(np.array(points), 4)
+    x, _ = _loop_scale_to_range(to_max, np.float32(0), x)
+    y, _ = _loop_scale_to_range(to_max, np.float32(0), y)
+    z, _ = _loop_scale_to_range(to_max, np.float32(0), z)
+    return np.hstack((x, y, z, r))
+
+
+def _time(function, *args) -> (float, object):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[100_000, 1_000_000])
+    parser.add_argument('--levels', type=int, default=16)
+    args = parser.parse_args()
+
+    to_max = (2 ** args.levels) - 1
+    rng = np.random.default_rng(0)
+    print(f'{"points":>10} {"loop s":>9} {"copy s":>9} {"inplace s":>9} '
+          f'{"speedup":>8}')
+    for size in args.sizes:
+        points = rng.normal(size=(size, 4)).astype(np.float32)
+        loop, expected = _time(_loop, points, to_max)
+        copy, (scaled, _) = _time(utils.quantize, points, to_max, np.float32(0))
+        assert np.array_equal(expected, scaled)
+        inplace, _ = _time(
+            lambda: utils.quantize(points, to_max, np.float32(0), inplace=True)
+        )
+        assert np.array_equal(expected, points)
+        print(f'{size:>10} {loop:>9.3f} {copy:>9.4f} {inplace:>9.4f} '
+              f'{loop / copy:>7.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Size of the saved tree and cold start time of serialize.load against
+pickling the object tree.
+
+    python benchmarks/bench_serialize.py --size 10000000
+
+Cold start is load() plus the first query, on a file that was just written,
+so the page cache may hold part of it. --pickle-max bounds the size the
+object tree is built and pickled at.
+"""
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from elementree.lidar.octree import serialize
+from elementree.lidar.octree.Octree import Octree
+from elementree.lidar.octree.Region import Region
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=10_000_000)
+    parser.add_argument('--levels', type=int, default=16)
+    parser.add_argument('--pickle-max', type=int, default=20_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-50, 50, size=(args.size, 4)).astype(np.float32)
+    tree = Octree(points, Region(1, 1, 1, 0, 0, 0))
+    tree.setup(args.levels)
+    tree.build_tree(vectorized=True)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tree.etoc')
+        start = time.perf_counter()
+        serialize.save(tree, path)
+        save = time.perf_counter() - start
+
+        start = time.perf_counter()
+        loaded = serialize.load(path)
+        load = time.perf_counter() - start
+        loaded.knn(np.full(3, 2 ** (args.levels - 1)), 8)
+        first = time.perf_counter() - start
+        assert np.array_equal(loaded.occupancy[:1000], tree._linear.occupancy[:1000])
+        print(f'{args.size} points: file {os.path.getsize(path) / 2 ** 20:.1f} MiB, '
+              f'save {1000 * save:.0f} ms, load {1000 * load:.2f} ms, '
+              f'load + first knn {1000 * first:.2f} ms')
+
+    size = min(args.size, args.pickle_max)
+    small = Octree(points[:size], Region(1, 1, 1, 0, 0, 0))
+    small.setup(args.levels)
+    small.build_tree()
+    sys.setrecursionlimit(100_000)
+    start = time.perf_counter()
+    data = pickle.dumps(small)
+    dump = time.perf_counter() - start
+    start = time.perf_counter()
+    pickle.loads(data)
+    unpickle = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tree.etoc')
+        serialize.save(small, path)
+        saved = os.path.getsize(path)
+    print(f'{size} points object tree: pickle {len(data) / 2 ** 20:.1f} MiB in '
+          f'{1000 * dump:.0f} ms, unpickle {1000 * unpickle:.0f} ms; '
+          f'saved file {saved / 2 ** 20:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Node count and build time of Octree.build_tree under its stopping criteria,
+on a cloud of dense clusters with repeated returns where the default of
+splitting down to single points creates long chains of nodes.
+
+    python benchmarks/bench_stopping.py --size 100000 --capacity 8 32
+"""
+import argparse
+import time
+
+import numpy as np
+
+from elementree.lidar.octree.Octree import Octree
+from elementree.lidar.octree.Region import Region
+
+
+def _cloud(size: int, rng: np.random.Generator) -> np.ndarray:
+    centres = rng.uniform(-50, 50, size=(20, 4))
+    points = centres[rng.integers(0, len(centres), size)] + \
+        rng.normal(0, 0.05, size=(size, 4))
+    # a quarter of the returns hit the same spot as an earlier one
+    repeated = rng.integers(0, size, size // 4)
+    points[rng.integers(0, size, size // 4)] = points[repeated]
+    return points.astype(np.float32)
+
+
+def _build(points: np.ndarray, levels: int, vectorized: bool,
+           **options) -> (int, float):
+    tree = Octree(points, Region(1, 1, 1, 0, 0, 0))
+    tree.setup(levels)
+    start = time.perf_counter()
+    tree.build_tree(vectorized=vectorized, **options)
+    elapsed = time.perf_counter() - start
+    return sum(1 for _ in tree.iter_bft()), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=100_000)
+    parser.add_argument('--levels', type=int, default=16)
+    parser.add_argument('--capacity', type=int, nargs='+', default=[8, 32])
+    parser.add_argument('--max-depth', type=int, default=12)
+    args = parser.parse_args()
+
+    points = _cloud(args.size, np.random.default_rng(0))
+    settings = [('default', {}), ('merge', {'merge_duplicates': True})]
+    settings += [(f'capacity {c}', {'capacity': c}) for c in args.capacity]
+    settings.append((f'max_depth {args.max_depth}',
+                     {'max_depth': args.max_depth}))
+    settings.append((f'merge, capacity {args.capacity[0]}',
+                     {'merge_duplicates': True,
+                      'capacity': args.capacity[0]}))
+
+    print(f'{"setting":>20} {"nodes":>9} {"object s":>9} {"vector s":>9}')
+    for name, options in settings:
+        nodes, reference = _build(points, args.levels, False, **options)
+        vector_nodes, vector = _build(points, args.levels, True, **options)
+        assert nodes == vector_nodes
+        print(f'{name:>20} {nodes:>9} {reference:>9.3f} {vector:>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Queries along a drive through a TileMap under shrinking memory budgets.
+The map is filled with scans along a straight road, then radius queries
+follow the same road back and forth, so a budget that holds the tiles
+around the sensor keeps a high hit rate and smaller ones spill.
+
+    python benchmarks/bench_tiles.py --scans 200 --budgets 64 8 2
+"""
+import argparse
+import time
+
+import numpy as np
+
+from elementree.lidar.octree.TileMap import TileMap
+
+
+def _drive(scans: int, points: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    (scans, points, 3) scans 2 m apart along the x axis
+    """
+    origins = np.stack((2.0 * np.arange(scans), np.zeros(scans),
+                        np.zeros(scans)), axis=1)
+    offsets = rng.normal(0, [15, 15, 2], size=(scans, points, 3))
+    return origins[:, np.newaxis] + offsets
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scans', type=int, default=200)
+    parser.add_argument('--points', type=int, default=5_000)
+    parser.add_argument('--tile-size', type=float, default=25.0)
+    parser.add_argument('--levels', type=int, default=10)
+    parser.add_argument('--budgets', type=float, nargs='+', default=[64, 8, 2],
+                        help='memory budgets in MB')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    scans = _drive(args.scans, args.points, rng)
+    centres = np.concatenate((scans[:, 0], scans[::-1, 0]))
+    print(f'{"MB":>6} {"insert s":>9} {"query ms":>9} {"hit rate":>9} '
+          f'{"evictions":>10} {"spills":>7} {"tiles":>6}')
+    for budget in args.budgets:
+        tiles = TileMap(args.tile_size, args.levels, int(budget * 2 ** 20))
+        start = time.perf_counter()
+        for scan in scans:
+            tiles.insert(scan)
+        insert = time.perf_counter() - start
+        hits, misses = tiles.hits, tiles.misses
+        start = time.perf_counter()
+        for centre in centres:
+            tiles.query_radius(centre, 5.0)
+        query = time.perf_counter() - start
+        lookups = tiles.hits - hits + tiles.misses - misses
+        print(f'{budget:>6g} {insert:>9.2f} '
+              f'{1000 * query / len(centres):>9.2f} '
+              f'{(tiles.hits - hits) / lookups:>9.1%} '
+              f'{tiles.evictions:>10} {tiles.spills:>7} '
+              f'{len(tiles.tiles):>6}')
+
+
+if __name__ == '__main__':
+    main()
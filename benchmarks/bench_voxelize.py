@@ -0,0 +1,66 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Wall clock of utils.voxelize against building the vectorized tree and
+collecting the occupied nodes of one level from it, the way a voxelized
+cloud was produced before.
+
+    python benchmarks/bench_voxelize.py --sizes 100000 1000000 --depth 8
+"""
+import argparse
+import time
+
+import numpy as np
+
+from elementree.lidar.octree.Octree import Octree
+from elementree.lidar.octree.Region import Region
+from elementree.utils import voxelize
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument('--levels', type=int, default=16)
+    parser.add_argument('--depth', type=int, default=8)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f'{"points":>10} {"voxels":>9} {"voxelize s":>11} {"tree s":>8} '
+          f'{"speedup":>8}')
+    for size in args.sizes:
+        points = rng.uniform(-50, 50, size=(size, 4)).astype(np.float32)
+
+        start = time.perf_counter()
+        voxels, counts, means = voxelize(points, args.levels, args.depth,
+                                         counts=True, column=3)
+        direct = time.perf_counter() - start
+
+        start = time.perf_counter()
+        tree = Octree(points, Region(1, 1, 1, 0, 0, 0))
+        tree.setup(args.levels)
+        tree.build_tree(vectorized=True)
+        np.flatnonzero(tree._linear.level == args.depth)
+        reference = time.perf_counter() - start
+
+        print(f'{size:>10} {len(voxels):>9} {direct:>11.3f} '
+              f'{reference:>8.3f} {reference / direct:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Benchmark suite of the octree pipeline, stage by stage, on synthetic LiDAR
+like clouds. Results are written as JSON, one line per stage, so that runs
+on two commits can be compared or diffed.
+
+    python benchmarks/suite.py --sizes 1000 100000 1000000 --output HEAD.json
+    python benchmarks/suite.py --output new.json --compare HEAD.json
+
+Every stage is timed on its own, best of --repeat runs, then run once more
+under tracemalloc for its peak allocation unless --no-memory is given. The
+object Octree and the codecs are slow at large sizes and only run up to
+--object-max and --codec-max points. With --compare, stages slower than
+--threshold times the baseline are listed and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from elementree.lidar.octree import attributes
+from elementree.lidar.octree import codec
+from elementree.lidar.octree.LinearOctree import LinearOctree
+from elementree.lidar.octree.Octree import Octree
+from elementree.lidar.octree.Region import Region
+
+
+def uniform(size: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Points spread evenly over a 100 m box
+    """
+    points = rng.uniform(-50, 50, size=(size, 4))
+    points[:, 3] = rng.uniform(0, 1, size)
+    return points
+
+
+def clustered(size: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Points in 64 gaussian blobs of different sizes, like returns off
+    vegetation and clutter
+    """
+    centers = rng.uniform(-50, 50, size=(64, 3))
+    spread = rng.uniform(0.5, 5, size=64)
+    cluster = rng.integers(0, 64, size)
+    points = np.empty((size, 4))
+    points[:, :3] = centers[cluster] + \
+        rng.normal(size=(size, 3)) * spread[cluster, np.newaxis]
+    points[:, 3] = rng.uniform(0.2, 0.8, 64)[cluster] + \
+        rng.normal(0, 0.02, size)
+    return points
+
+
+def ground(size: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    A scan of a street: 70 % of the points on a slightly noisy ground plane,
+    densest near the sensor, the rest on box shaped objects standing on it
+    """
+    on_ground = int(0.7 * size)
+    points = np.empty((size, 4))
+    distance = rng.exponential(15, on_ground)
+    angle = rng.uniform(0, 2 * np.pi, on_ground)
+    points[:on_ground, 0] = distance * np.cos(angle)
+    points[:on_ground, 1] = distance * np.sin(angle)
+    points[:on_ground, 2] = rng.normal(0, 0.03, on_ground)
+    points[:on_ground, 3] = rng.normal(0.2, 0.02, on_ground)
+
+    rest = size - on_ground
+    corner = rng.uniform(-40, 40, size=(200, 2))
+    extent = rng.uniform([0.3, 0.3, 1], [5, 2, 3], size=(200, 3))
+    box = rng.integers(0, 200, rest)
+    points[on_ground:, :2] = corner[box] + rng.uniform(size=(rest, 2)) * extent[box, :2]
+    points[on_ground:, 2] = rng.uniform(size=rest) * extent[box, 2]
+    points[on_ground:, 3] = rng.uniform(0.3, 0.9, 200)[box]
+    return points
+
+
+CLOUDS = {'uniform': uniform, 'clustered': clustered, 'ground': ground}
+
+
+def _region() -> Region:
+    return Region(1, 1, 1, 0, 0, 0)
+
+
+def stages(points: np.ndarray, levels: int, args) -> list[(str, callable)]:
+    """
+    (name, function) of every stage to run on points, in pipeline order.
+    Each function prepares what it needs outside of the timed call and
+    returns the call to time.
+    """
+    def linear():
+        tree = LinearOctree(points, _region())
+        tree.setup(levels)
+        tree.build_tree()
+        return tree
+
+    def obj():
+        tree = Octree(points, _region())
+        tree.setup(levels)
+        tree.build_tree()
+        return tree
+
+    def setup(cls):
+        def prepare():
+            tree = cls(points, _region())
+            return lambda: tree.setup(levels)
+        return prepare
+
+    def build(cls, **kwargs):
+        def prepare():
+            tree = cls(points, _region())
+            tree.setup(levels)
+            return lambda: tree.build_tree(**kwargs)
+        return prepare
+
+    def call(make, method):
+        def prepare():
+            tree = make()
+            return lambda: method(tree)
+        return prepare
+
+    result = [
+        ('linear.setup', setup(LinearOctree)),
+        ('linear.build_tree', build(LinearOctree)),
+        ('linear.bft', call(linear, lambda t: t.bft())),
+        ('linear.dft', call(linear, lambda t: t.dft())),
+    ]
+    if len(points) <= args.object_max:
+        result += [
+            ('octree.setup', setup(Octree)),
+            ('octree.build_tree', build(Octree)),
+            ('octree.bft', call(obj, lambda t: t.bft())),
+        ]
+    if len(points) <= args.codec_max:
+        result += [
+            ('codec.encode', call(linear, codec.encode)),
+            ('attributes.encode', call(linear, attributes.encode)),
+        ]
+    return result
+
+
+def _measure(prepare, repeat: int, memory: bool) -> dict:
+    best = float('inf')
+    for _ in range(repeat):
+        run = prepare()
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    record = {'seconds': round(best, 6)}
+    if memory:
+        run = prepare()
+        tracemalloc.start()
+        run()
+        record['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return record
+
+
+def _environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+    }
+
+
+def compare(results: list[dict], baseline: list[dict], threshold: float) -> list[str]:
+    """
+    Lines describing every stage slower than threshold times the baseline
+    """
+    old = {(r['cloud'], r['size'], r['stage']): r for r in baseline}
+    slower = []
+    for record in results:
+        key = (record['cloud'], record['size'], record['stage'])
+        if key not in old:
+            continue
+        ratio = record['seconds'] / max(old[key]['seconds'], 1e-9)
+        if ratio > threshold:
+            slower.append(
+                f'{key[0]:>10} {key[1]:>9} {key[2]:<20} '
+                f'{old[key]["seconds"]:>9.4f}s -> {record["seconds"]:>9.4f}s '
+                f'({ratio:.2f}x)'
+            )
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1_000, 10_000, 100_000])
+    parser.add_argument('--clouds', nargs='+', default=list(CLOUDS),
+                        choices=list(CLOUDS))
+    parser.add_argument('--levels', type=int, default=16)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--object-max', type=int, default=100_000)
+    parser.add_argument('--codec-max', type=int, default=100_000)
+    parser.add_argument('--no-memory', action='store_true')
+    parser.add_argument('--output', help='file to write the JSON results to')
+    parser.add_argument('--compare', help='JSON results of a previous run')
+    parser.add_argument('--threshold', type=float, default=1.2)
+    args = parser.parse_args()
+
+    results = []
+    for cloud in args.clouds:
+        for size in args.sizes:
+            points = CLOUDS[cloud](size, np.random.default_rng(size))
+            points = points.astype(np.float32)
+            for stage, prepare in stages(points, args.levels, args):
+                record = {'cloud': cloud, 'size': size, 'stage': stage}
+                record.update(_measure(prepare, args.repeat, not args.no_memory))
+                results.append(record)
+                peak = record.get('peak_bytes')
+                print(f'{cloud:>10} {size:>9} {stage:<20} '
+                      f'{record["seconds"]:>10.4f}s' +
+                      ('' if peak is None else f' {peak / 2 ** 20:>9.1f} MiB'),
+                      flush=True)
+
+    if args.output:
+        # one line per stage, so two result files diff line by line
+        with open(args.output, 'w') as file:
+            file.write('{"environment": ')
+            file.write(json.dumps(_environment(), sort_keys=True))
+            file.write(',\n "results": [\n  ')
+            file.write(',\n  '.join(json.dumps(r, sort_keys=True) for r in results))
+            file.write('\n]}\n')
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['results']
+        slower = compare(results, baseline, args.threshold)
+        print(f'\n{len(slower)} stages slower than {args.threshold}x the baseline')
+        for line in slower:
+            print(line)
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
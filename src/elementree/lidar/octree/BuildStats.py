@@ -0,0 +1,110 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+from collections import Counter
+from typing import Callable, Union
+
+
+class BuildStats:
+    """
+    Counters and per stage timings collected while an Octree is scaled,
+    built and traversed. Attach one with Octree.stats before setup() or
+    build_tree(); trees without one skip all bookkeeping.
+
+    Stages timed are scale (setup), regions (octant Region construction),
+    bucketing (sorting points into octants), children (creating child
+    nodes, not building them) and build_tree (the whole build, recorded by
+    the root). The callback, if given, is called with the stats every time
+    a root finishes build_tree, e.g. to push them to a metrics system. A
+    lazy build finishes once its last pending node is split or expand() is
+    called on its root.
+    """
+
+    def __init__(self, callback: Union[Callable[['BuildStats'], None], None] = None):
+        self._callback = callback
+        self._timings: Counter = Counter()
+        self._nodes: Counter = Counter()
+        self._leaf_points: Counter = Counter()
+        self._bytes: int = 0
+
+    def add_time(self, stage: str, seconds: float):
+        self._timings[stage] += seconds
+
+    def add_nodes(self, level: int, count: int = 1):
+        self._nodes[level] += count
+
+    def add_leaves(self, points: int, count: int = 1):
+        self._leaf_points[points] += count
+
+    def add_bytes(self, count: int):
+        self._bytes += count
+
+    def finished(self):
+        if self._callback is not None:
+            self._callback(self)
+
+    def reset(self):
+        self._timings.clear()
+        self._nodes.clear()
+        self._leaf_points.clear()
+        self._bytes = 0
+
+    @property
+    def timings(self) -> dict[str, float]:
+        """
+        Seconds spent in every stage
+        """
+        return dict(self._timings)
+
+    @property
+    def nodes_per_level(self) -> list[int]:
+        """
+        Number of nodes built at every level, root first
+        """
+        if not self._nodes:
+            return []
+        return [self._nodes[level] for level in range(max(self._nodes) + 1)]
+
+    @property
+    def points_per_leaf(self) -> dict[int, int]:
+        """
+        Histogram of the number of points in the leaves
+        """
+        return dict(sorted(self._leaf_points.items()))
+
+    @property
+    def max_depth(self) -> int:
+        """
+        Deepest level a node was built at
+        """
+        return max(self._nodes, default=0)
+
+    @property
+    def bytes_emitted(self) -> int:
+        """
+        Occupancy bytes yielded by the traversals
+        """
+        return self._bytes
+
+    def as_dict(self) -> dict:
+        return {
+            'timings': self.timings,
+            'nodes_per_level': self.nodes_per_level,
+            'points_per_leaf': self.points_per_leaf,
+            'max_depth': self.max_depth,
+            'bytes_emitted': self.bytes_emitted,
+        }
@@ -0,0 +1,663 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+import heapq
+from typing import Sequence, Union
+
+import numpy as np
+
+from elementree import utils
+from elementree.lidar.octree import morton
+from elementree.lidar.octree import parallel
+
+from elementree.lidar.octree.Region import Region
+
+# number of set bits of every occupancy byte
+POPCOUNT: np.ndarray = np.array(
+    [bin(i).count('1') for i in range(256)], dtype=np.uint8
+)
+
+
+# bytes converted at a time when iterating one byte at a time
+_CHUNK: int = 1 << 16
+
+
+# nodes holding at most this many points are searched point by point by knn
+_BUCKET: int = 32
+
+
+# odd constant that spreads the octant of a child over the bits of its hash
+_GOLDEN: np.uint64 = np.uint64(0x9e3779b97f4a7c15)
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """
+    splitmix64 finalizer, scrambles uint64 values, wrapping on overflow
+    """
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xbf58476d1ce4e5b9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94d049bb133111eb)
+    return values ^ (values >> np.uint64(31))
+
+
+def _index_dtype(size: int) -> np.dtype:
+    return np.dtype(np.int32) if size < 2 ** 31 else np.dtype(np.int64)
+
+
+def _split(query: np.ndarray, found: np.ndarray, count: int) -> list[np.ndarray]:
+    """
+    Groups the found indices by query, found is sorted by query
+    """
+    if count == 0:
+        return []
+    return np.split(found, np.searchsorted(query, np.arange(1, count)))
+
+
+def _distinct(
+        points: np.ndarray,
+        weights: Union[np.ndarray, None]
+) -> (np.ndarray, np.ndarray, np.ndarray):
+    """
+    First row of every distinct (x, y, z) position, in position order
+    :return: tuple of (rows, their indices into points, number of points at
+        each position, summing weights when given)
+    """
+    if len(points) == 0:
+        return points, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    _, first, inverse = np.unique(
+        points[:, :3], axis=0, return_index=True, return_inverse=True
+    )
+    counts = np.bincount(
+        inverse.reshape(-1), weights=weights, minlength=len(first)
+    ).astype(np.int64)
+    return points[first], first.astype(np.int64), counts
+
+
+class LinearOctree:
+    """
+    Octree stored as flat arrays, one entry per node in breadth first order,
+    instead of one Octree object per node. Takes the same arguments as Octree
+    and is built the same way, with setup(levels) and build_tree(). Points
+    are kept in one shared buffer sorted so that every node holds a
+    contiguous range of it.
+
+    Nodes are read through lightweight OctreeNode views from root or node(i).
+    """
+
+    def __init__(
+            self,
+            point_cloud: Union[np.ndarray, list[(int, int, int)]],
+            bounds: Region
+    ):
+        self._points: np.ndarray = np.asarray(point_cloud)
+        self._bounds: Region = bounds
+        self._max: Union[np.float32, None] = None
+        self._min: Union[np.float32, None] = None
+        self._x_scale_factor: int
+        self._y_scale_factor: int
+        self._z_scale_factor: int
+        self._transform: Union[utils.Transform, None] = None
+        self._depth: int = 0
+        self._order: np.ndarray = np.zeros(0, dtype=np.int64)
+        self._weights: Union[np.ndarray, None] = None
+        self._occupancy: np.ndarray = np.zeros(1, dtype=np.uint8)
+        self._first_child: np.ndarray = np.ones(1, dtype=np.int32)
+        self._level: np.ndarray = np.zeros(1, dtype=np.uint8)
+        self._point_start: np.ndarray = np.zeros(1, dtype=np.int32)
+        self._point_count: np.ndarray = np.zeros(1, dtype=np.int32)
+        self._fingerprints: Union[np.ndarray, None] = None
+
+    @classmethod
+    def from_arrays(
+            cls,
+            bounds: Region,
+            occupancy: np.ndarray,
+            first_child: np.ndarray,
+            level: np.ndarray,
+            point_start: np.ndarray,
+            point_count: np.ndarray,
+            points: np.ndarray,
+            order: np.ndarray,
+            weights: Union[np.ndarray, None] = None,
+            transform: Union[utils.Transform, None] = None,
+            levels: Union[int, None] = None
+    ) -> 'LinearOctree':
+        """
+        Tree over arrays of an already built tree, e.g. memory mapped from a
+        file by serialize.load. The arrays are used as they are, not copied.
+        :param levels: levels passed to setup(), if it was called
+        """
+        tree = cls(points, bounds)
+        tree._points = points
+        if levels is not None:
+            tree._max = (2 ** levels) - 1
+            tree._min = np.float32(0)
+        if transform is not None:
+            tree._transform = transform
+            (tree._x_scale_factor, tree._y_scale_factor,
+             tree._z_scale_factor) = transform.scale
+        lo, hi = morton.root_bounds(bounds)
+        tree._depth = morton.key_depth(lo, hi)
+        tree._order = order
+        tree._weights = weights
+        tree._occupancy = occupancy
+        tree._first_child = first_child
+        tree._level = level
+        tree._point_start = point_start
+        tree._point_count = point_count
+        return tree
+
+    def setup(self, levels, inplace: bool = False):
+        """
+        Scales the points to [0, 2 ** levels - 1] on every axis
+        :param levels: number of levels of the tree
+        :param inplace: overwrite the point cloud passed in instead of
+            copying it, it must be a writable float array
+        """
+        self._max = (2 ** levels) - 1
+        self._min = np.float32(0)
+        self._bounds = Region(x_max=self._max, y_max=self._max, z_max=self._max,
+                              x_min=0, y_min=0, z_min=0)
+        self._scale_to_range(inplace)
+
+    def build_tree(
+            self,
+            weights: np.ndarray = None,
+            dropped: int = 0,
+            workers: int = 1,
+            split_depth: int = 2,
+            max_depth: Union[int, None] = None,
+            capacity: int = 1,
+            merge_duplicates: bool = False
+    ):
+        """
+        Builds the node arrays from the points with morton.build and sorts the
+        point buffer into key order. Points outside of the bounds are dropped
+        from the buffer, the original index of every kept point is in order.
+        :param weights: number of points each row of the buffer stands for,
+            when duplicates have been merged before building
+        :param dropped: points known to be outside of the bounds that are not
+            in the buffer. Like the dropped rows they count towards the root
+        :param workers: with more than one, the subtrees below split_depth
+            are built in a process pool, see parallel.build
+        :param split_depth: level at which the tree is split between workers
+        :param max_depth: deepest level of the tree, nodes there are leaves
+            whatever they hold
+        :param capacity: most points a leaf holds before it is split
+        :param merge_duplicates: keep one row per distinct position, the
+            first one, with the number of points at it in weights. The tree
+            is built over the distinct positions
+        """
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        points, kept = self._points, None
+        if merge_duplicates:
+            points, kept, counts = _distinct(points, weights)
+            # the tree splits on positions, the counts are only carried along
+            weights, split_weights = counts, None
+        else:
+            split_weights = weights
+        if workers > 1:
+            order, nodes = parallel.build(
+                points, self._bounds, weights=split_weights, dropped=dropped,
+                workers=workers, split_depth=split_depth,
+                max_level=max_depth, capacity=capacity
+            )
+        else:
+            order, nodes = morton.build(
+                points, self._bounds, weights=split_weights, dropped=dropped,
+                max_level=max_depth, capacity=capacity
+            )
+        occupancy, level, start, length = nodes
+        lo, hi = morton.root_bounds(self._bounds)
+
+        index = _index_dtype(max(len(points), len(occupancy)) + 1)
+        children = POPCOUNT[occupancy].astype(index)
+        self._depth = morton.key_depth(lo, hi)
+        self._points = points[order]
+        self._order = order if kept is None else kept[order]
+        self._weights = None if weights is None else np.asarray(weights)[order]
+        self._occupancy = occupancy
+        self._first_child = np.cumsum(children, dtype=index) - children + 1
+        self._level = level
+        self._point_start = start.astype(index)
+        self._point_count = length.astype(index)
+        self._fingerprints = None
+
+    def _scale_to_range(self, inplace: bool = False):
+        # in double precision, as Octree scales its list of Python floats
+        points, self._transform = utils.quantize(
+            self._points, self._max, self._min, inplace=inplace,
+            dtype=np.float64
+        )
+        (self._x_scale_factor, self._y_scale_factor,
+         self._z_scale_factor) = self._transform.scale
+        self._points = points
+
+    def bft(self) -> list[np.uint8]:
+        return self._occupancy.tolist()
+
+    def dft(self) -> list[np.uint8]:
+        return self._occupancy[morton.dft_order(self._occupancy)].tolist()
+
+    def iter_bft(self, batch_size: Union[int, None] = None):
+        """
+        Yields the occupancy bytes in breadth first order, one at a time or,
+        with batch_size, as uint8 array views of up to batch_size bytes
+        """
+        step = batch_size or _CHUNK
+        for start in range(0, len(self._occupancy), step):
+            batch = self._occupancy[start:start + step]
+            if batch_size is None:
+                yield from batch.tolist()
+            else:
+                yield batch
+
+    def iter_dft(self, batch_size: Union[int, None] = None):
+        """
+        Yields the occupancy bytes in depth first (pre-order) order, one at a
+        time or, with batch_size, as uint8 arrays of up to batch_size bytes.
+        Only the traversal order is held in memory, the bytes are gathered
+        a batch at a time.
+        """
+        order = morton.dft_order(self._occupancy)
+        step = batch_size or _CHUNK
+        for start in range(0, len(order), step):
+            batch = self._occupancy[order[start:start + step]]
+            if batch_size is None:
+                yield from batch.tolist()
+            else:
+                yield batch
+
+    def query_box(
+            self,
+            region: Union[Region, Sequence[Region]]
+    ) -> Union[np.ndarray, list[np.ndarray]]:
+        """
+        Original indices of the points inside region, with the same half open
+        bounds as Region.within_bounds. Points dropped by the build are never
+        returned.
+        :param region: a Region, or a sequence of Regions to run as a batch
+        :return: sorted int64 indices, or a list of them for a batch
+        """
+        if isinstance(region, Region):
+            return self.query_box([region])[0]
+        boxes = [r.box() for r in region]
+        low = np.array([b[0] for b in boxes]).reshape(-1, 3)
+        high = np.array([b[1] for b in boxes]).reshape(-1, 3)
+
+        query, found = self._search(
+            len(boxes),
+            lambda q, lo, hi: np.all((low[q] < hi) & (lo < high[q]), axis=1),
+            lambda q, lo, hi: np.all((low[q] <= lo) & (hi <= high[q]), axis=1),
+            lambda q, p: np.all((low[q] <= p) & (p < high[q]), axis=1)
+        )
+        return _split(query, found, len(boxes))
+
+    def query_radius(
+            self,
+            point: np.ndarray,
+            radius: Union[float, np.ndarray]
+    ) -> Union[np.ndarray, list[np.ndarray]]:
+        """
+        Original indices of the points within radius of point, in the scaled
+        coordinates of the tree
+        :param point: (3,) query point, or (M, 3) queries to run as a batch
+        :param radius: search radius, or (M,) radii of a batch
+        :return: sorted int64 indices, or a list of them for a batch
+        """
+        point = np.asarray(point, dtype=np.float64)
+        if point.ndim == 1:
+            return self.query_radius(point[None], radius)[0]
+        centre = point[:, :3]
+        limit = np.broadcast_to(
+            np.square(np.asarray(radius, dtype=np.float64)), (len(centre),)
+        )
+
+        def within(q, p):
+            offset = p - centre[q]
+            return np.einsum('ij,ij->i', offset, offset) <= limit[q]
+
+        query, found = self._search(
+            len(centre),
+            lambda q, lo, hi: utils.min_distance(centre[q], lo, hi) <= limit[q],
+            lambda q, lo, hi: utils.max_distance(centre[q], lo, hi) <= limit[q],
+            within
+        )
+        return _split(query, found, len(centre))
+
+    def knn(self, point: np.ndarray, k: int) -> np.ndarray:
+        """
+        Original indices of the k points closest to point, in the scaled
+        coordinates of the tree, nearest first. Ties are broken by index.
+        :param point: (3,) query point, or (M, 3) queries to run as a batch
+        :param k: number of neighbours, at most the number of points
+        :return: (k,) int64 indices, or (M, k) for a batch
+        """
+        point = np.asarray(point, dtype=np.float64)
+        k = min(k, len(self._points))
+        if point.ndim == 1:
+            return self._knn(point[:3], k)
+        found = np.empty((len(point), k), dtype=np.int64)
+        for i, query in enumerate(point[:, :3]):
+            found[i] = self._knn(query, k)
+        return found
+
+    def _search(self, count: int, overlaps, contains, matches):
+        """
+        Walks the tree a level at a time for count queries at once, keeping
+        the (query, node) pairs whose bounds can hold a match
+        :param count: number of queries
+        :param overlaps: f(query, lo, hi), which pairs can hold a match
+        :param contains: f(query, lo, hi), which pairs only hold matches
+        :param matches: f(query, points), which (query, point) pairs match
+        :return: (query, index) arrays of the matches, sorted by query then
+            original index
+        """
+        lo, hi = morton.root_bounds(self._bounds)
+        coords = self._points[:, :3]
+        query = np.arange(count)
+        node = np.zeros(count, dtype=np.int64)
+        low = np.broadcast_to(lo.astype(np.float64), (count, 3))
+        high = np.broadcast_to(hi.astype(np.float64), (count, 3))
+        found: list[(np.ndarray, np.ndarray)] = []
+        if len(self._points) == 0:
+            query = query[:0]
+
+        while len(query) > 0:
+            keep = overlaps(query, low, high)
+            query, node, low, high = query[keep], node[keep], low[keep], high[keep]
+            occupancy = self._occupancy[node]
+            whole = contains(query, low, high)
+            leaf = (occupancy == 0) & ~whole
+            for mask, test in ((whole, False), (leaf, True)):
+                counts = self._point_count[node[mask]]
+                positions = utils.ranges(self._point_start[node[mask]], counts)
+                owners = np.repeat(query[mask], counts)
+                if test:
+                    hit = matches(owners, coords[positions])
+                    owners, positions = owners[hit], positions[hit]
+                found.append((owners, positions))
+
+            split = ~(whole | leaf) & (occupancy > 0)
+            bits = np.unpackbits(
+                occupancy[split][:, None], axis=1, bitorder='little'
+            )
+            row, octant = np.nonzero(bits)
+            rank = np.cumsum(bits, axis=1, dtype=np.int64)[row, octant] - 1
+            node = self._first_child[node[split]][row] + rank
+            query = query[split][row]
+            low, high = morton.child_bounds(
+                low[split][row], high[split][row], octant
+            )
+
+        query = np.concatenate([q for q, _ in found] + [np.zeros(0, np.int64)])
+        index = self._order[
+            np.concatenate([p for _, p in found] + [np.zeros(0, np.int64)])
+        ].astype(np.int64)
+        order = np.lexsort((index, query))
+        return query[order], index[order]
+
+    def _knn(self, point: np.ndarray, k: int) -> np.ndarray:
+        """
+        Best first search, nodes are visited by their distance to point until
+        the next one is farther than the k-th closest point found so far
+        """
+        coords = self._points[:, :3]
+        lo, hi = morton.root_bounds(self._bounds)
+        best_distance = np.zeros(0, dtype=np.float64)
+        best_index = np.zeros(0, dtype=np.int64)
+        if k == 0:
+            return best_index
+        heap = [(0.0, 0, lo.astype(np.float64), hi.astype(np.float64))]
+        while heap:
+            distance, node, low, high = heapq.heappop(heap)
+            if len(best_index) == k and distance > best_distance[-1]:
+                break
+            occupancy = int(self._occupancy[node])
+            if occupancy == 0 or self._point_count[node] <= _BUCKET:
+                start = self._point_start[node]
+                stop = start + self._point_count[node]
+                offset = coords[start:stop] - point
+                best_distance = np.concatenate((
+                    best_distance, np.einsum('ij,ij->i', offset, offset)
+                ))
+                best_index = np.concatenate((
+                    best_index, self._order[start:stop].astype(np.int64)
+                ))
+                order = np.lexsort((best_index, best_distance))[:k]
+                best_distance = best_distance[order]
+                best_index = best_index[order]
+                continue
+            octant = np.flatnonzero(
+                np.unpackbits(np.uint8(occupancy), bitorder='little')
+            )
+            child_lo, child_hi = morton.child_bounds(
+                np.broadcast_to(low, (len(octant), 3)),
+                np.broadcast_to(high, (len(octant), 3)), octant
+            )
+            distances = utils.min_distance(point, child_lo, child_hi)
+            child = int(self._first_child[node])
+            for i in range(len(octant)):
+                heapq.heappush(heap, (
+                    float(distances[i]), child + i, child_lo[i], child_hi[i]
+                ))
+        return best_index
+
+    def node(self, index: int) -> 'OctreeNode':
+        """
+        View of the node at position index of the breadth first order
+        """
+        if index == 0:
+            return self.root
+        lo, hi = morton.root_bounds(self._bounds)
+        start = self._point_start[index]
+        keys, _ = morton.octant_keys(
+            self._points[start:start + 1], lo, hi, self._depth
+        )
+        level = int(self._level[index])
+        low, high = morton.node_bounds(keys, level, self._depth, lo, hi)
+        octant = int(keys[0] >> np.uint64(3 * (self._depth - level))) & 7
+        return OctreeNode(self, index, low[0], high[0], octant)
+
+    @property
+    def root(self) -> 'OctreeNode':
+        lo, hi = morton.root_bounds(self._bounds)
+        return OctreeNode(self, 0, lo, hi, -1)
+
+    @property
+    def scaling_factor(self):
+        return self._x_scale_factor, self._y_scale_factor, self._z_scale_factor
+
+    @property
+    def transform(self) -> Union[utils.Transform, None]:
+        return self._transform
+
+    @property
+    def levels(self) -> Union[int, None]:
+        """
+        Levels passed to setup(), None if the points were not scaled by it
+        """
+        if self._max is None:
+            return None
+        return int(self._max + 1).bit_length() - 1
+
+    @property
+    def bounds(self) -> Region:
+        return self._bounds
+
+    @property
+    def points(self) -> np.ndarray:
+        return self._points
+
+    @property
+    def order(self) -> np.ndarray:
+        return self._order
+
+    @property
+    def weights(self) -> Union[np.ndarray, None]:
+        return self._weights
+
+    @property
+    def occupancy(self) -> np.ndarray:
+        return self._occupancy
+
+    @property
+    def first_child(self) -> np.ndarray:
+        return self._first_child
+
+    @property
+    def level(self) -> np.ndarray:
+        return self._level
+
+    @property
+    def point_start(self) -> np.ndarray:
+        return self._point_start
+
+    @property
+    def point_count(self) -> np.ndarray:
+        return self._point_count
+
+    @property
+    def fingerprints(self) -> np.ndarray:
+        """
+        uint64 hash of the subtree of every node, computed on first use. Two
+        nodes at the same place in trees over the same bounds have the same
+        hash when their subtrees have the same occupancy and their leaves
+        hold points at the same cells, up to hash collisions. Weights and
+        the columns past x, y, z are not part of it.
+        """
+        if self._fingerprints is None:
+            self._fingerprints = self._subtree_hashes()
+        return self._fingerprints
+
+    def _subtree_hashes(self) -> np.ndarray:
+        occupancy = self._occupancy
+        if len(self._points) < int(self._point_count[0]):
+            raise ValueError('fingerprints need the point buffer of the tree')
+        hashes = occupancy.astype(np.uint64)
+
+        # leaves hash the keys of their points, in any order
+        lo, hi = morton.root_bounds(self._bounds)
+        keys, _ = morton.octant_keys(self._points, lo, hi, self._depth)
+        sums = np.concatenate((
+            np.zeros(1, dtype=np.uint64),
+            np.cumsum(_mix(keys + np.uint64(1)), dtype=np.uint64)
+        ))
+        leaf = np.flatnonzero(occupancy == 0)
+        start = self._point_start[leaf].astype(np.int64)
+        end = start + self._point_count[leaf]
+        hashes[leaf] += sums[end] - sums[start]
+
+        # node i + 1 is the i-th set bit of the stream, see morton.dft_order
+        bits = np.unpackbits(occupancy[:, np.newaxis], axis=1,
+                             bitorder='little')
+        parent, octant = np.nonzero(bits)
+        parent, octant = parent[:len(occupancy) - 1], octant[:len(occupancy) - 1]
+        spread = octant.astype(np.uint64) * _GOLDEN
+        levels = np.searchsorted(
+            self._level, np.arange(int(self._level[-1]) + 2)
+        )
+        # deepest level first, every node is done before its parent adds it
+        for start, end in zip(levels[-2:0:-1], levels[:0:-1]):
+            hashes[start:end] = _mix(hashes[start:end])
+            np.add.at(hashes, parent[start - 1:end - 1],
+                      _mix(hashes[start:end] ^ spread[start - 1:end - 1]))
+        hashes[0] = _mix(hashes[:1])[0]
+        return hashes
+
+    def __len__(self):
+        return len(self._occupancy)
+
+
+class OctreeNode:
+    """
+    Read only view of one node of a LinearOctree, with the same accessors as
+    an Octree node. Holds only the node index and its bounds.
+    """
+    __slots__ = ('_tree', '_index', '_lo', '_hi', '_octant')
+
+    def __init__(
+            self,
+            tree: LinearOctree,
+            index: int,
+            lo: np.ndarray,
+            hi: np.ndarray,
+            octant: int
+    ):
+        self._tree = tree
+        self._index = index
+        self._lo = lo
+        self._hi = hi
+        self._octant = octant
+
+    @property
+    def index(self) -> int:
+        return self._index
+
+    @property
+    def bounds(self) -> Region:
+        return Region(
+            x_max=int(self._hi[0]), y_max=int(self._hi[1]),
+            z_max=int(self._hi[2]), x_min=int(self._lo[0]),
+            y_min=int(self._lo[1]), z_min=int(self._lo[2])
+        )
+
+    @property
+    def occupancy(self) -> np.uint8:
+        return self._tree.occupancy[self._index]
+
+    @property
+    def location(self) -> Union[tuple[int, int, int], None]:
+        if self.occupancy == 0:
+            return None
+        return tuple(int(c) for c in (self._lo + self._hi) // 2)
+
+    @property
+    def level(self) -> int:
+        return int(self._tree.level[self._index])
+
+    @property
+    def octant(self) -> int:
+        return self._octant
+
+    @property
+    def points(self) -> np.ndarray:
+        start = self._tree.point_start[self._index]
+        return self._tree.points[start:start + self._tree.point_count[self._index]]
+
+    @property
+    def children(self) -> list[Union['OctreeNode', None]]:
+        children: list[Union['OctreeNode', None]] = [
+            None, None, None, None, None, None, None, None
+        ]
+        occupancy = int(self.occupancy)
+        child = int(self._tree.first_child[self._index])
+        for i in range(8):
+            if occupancy & (1 << i):
+                lo, hi = morton.child_bounds(self._lo, self._hi, i)
+                children[i] = OctreeNode(self._tree, child, lo, hi, i)
+                child += 1
+        return children
+
+    def __eq__(self, other):
+        return (isinstance(other, OctreeNode) and other._tree is self._tree
+                and other._index == self._index)
+
+    def __hash__(self):
+        return hash((id(self._tree), self._index))
@@ -0,0 +1,363 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+from typing import Union
+
+import numpy as np
+
+from elementree import utils
+from elementree.lidar.octree import cfg
+from elementree.lidar.octree import morton
+
+from elementree.lidar.octree.Region import Region
+
+# the 8 octant bits appended to a key to get its children
+_OCTANTS: np.ndarray = np.arange(8, dtype=np.uint64)
+
+# 11 bit values with bit i moved to bit 3 * i, two lookups spread a
+# coordinate of up to morton.MAX_DEPTH bits
+_SPREAD: np.ndarray = morton.spread(np.arange(1 << 11), 11)
+
+
+def _logit(probability: float) -> np.float32:
+    return np.float32(np.log(probability / (1 - probability)))
+
+
+class OccupancyMap:
+    """
+    Probabilistic occupancy map over a cube of 2 ** levels cells per axis.
+    Every known cell holds a clamped log-odds value, updated by casting the
+    rays of a scan from the sensor origin: the cells a ray passes through
+    get a miss, the cell of its end point a hit. Unknown cells are at 0,
+    probability 0.5.
+
+    The cells are the power of two grid of a Morton key, so a node's key is
+    its parent's key followed by 3 octant bits, and nodes are stored per
+    depth as sorted key and value arrays. When the 8 children of a node all
+    hold the same value they are replaced by the node, which with clamping
+    collapses large free or occupied volumes into a few nodes.
+    """
+
+    def __init__(
+            self,
+            levels: int,
+            bounds: Region,
+            hit: float = 0.7,
+            miss: float = 0.4,
+            clamp: (float, float) = (0.12, 0.97),
+            max_range: Union[float, None] = None
+    ):
+        """
+        :param levels: depth of the finest cells, at most morton.MAX_DEPTH
+        :param bounds: area covered, the cells are cubes sized so that the
+            longest axis spans 2 ** levels of them
+        :param hit: probability of a cell being occupied when a ray ends in it
+        :param miss: probability of a cell being occupied when a ray passes
+        :param clamp: (min, max) probabilities the cells are held within
+        :param max_range: rays longer than this, in the units of bounds, are
+            cut to it and their end point is not marked occupied
+        """
+        if not 0 < levels <= morton.MAX_DEPTH:
+            raise ValueError(f'levels must be in [1, {morton.MAX_DEPTH}]')
+        self._levels: int = levels
+        lo = np.array([bounds[cfg.X_MIN], bounds[cfg.Y_MIN],
+                       bounds[cfg.Z_MIN]], dtype=np.float64)
+        hi = np.array([bounds[cfg.X_MAX], bounds[cfg.Y_MAX],
+                       bounds[cfg.Z_MAX]], dtype=np.float64)
+        self._resolution: float = float(np.max(hi - lo)) / (2 ** levels)
+        if self._resolution <= 0:
+            raise ValueError('bounds must not be empty')
+        self._transform: utils.Transform = utils.Transform(
+            lo, np.full(3, 1 / self._resolution)
+        )
+        self._hit: np.float32 = _logit(hit)
+        self._miss: np.float32 = _logit(miss)
+        self._min: np.float32 = _logit(clamp[0])
+        self._max: np.float32 = _logit(clamp[1])
+        self._max_range: Union[float, None] = max_range
+        # sorted Morton keys and log-odds of the stored nodes of each depth
+        self._keys: list[np.ndarray] = [
+            np.zeros(0, dtype=np.uint64) for _ in range(levels + 1)
+        ]
+        self._values: list[np.ndarray] = [
+            np.zeros(0, dtype=np.float32) for _ in range(levels + 1)
+        ]
+        self._scans: int = 0
+
+    def insert_scan(self, points: np.ndarray, origin: np.ndarray):
+        """
+        Integrates one scan. Every cell gets at most one update per scan, a
+        hit when any ray ends in it and a miss otherwise.
+        :param points: (N, 3+) end points of the rays
+        :param origin: (3,) sensor position the rays start from
+        """
+        points = np.asarray(points, dtype=np.float64)[:, :3]
+        origin = np.asarray(origin, dtype=np.float64)[:3]
+        hits = np.ones(len(points), dtype=bool)
+        if self._max_range is not None:
+            offset = points - origin
+            length = np.sqrt(np.einsum('ij,ij->i', offset, offset))
+            hits = length <= self._max_range
+            scale = self._max_range / np.maximum(length[~hits], 1e-12)
+            points = points.copy()
+            points[~hits] = origin + offset[~hits] * scale[:, np.newaxis]
+
+        start = self._grid(origin[np.newaxis])[0]
+        end = self._grid(points)
+        side = 2 ** self._levels
+        inside = np.all((end >= 0) & (end < side), axis=1) & hits
+        occupied = np.unique(self._key(np.floor(end[inside]).astype(np.int64)))
+        free = np.setdiff1d(np.unique(self._traverse(start, end)), occupied,
+                            assume_unique=True)
+
+        keys = np.concatenate((occupied, free))
+        deltas = np.concatenate((
+            np.full(len(occupied), self._hit, dtype=np.float32),
+            np.full(len(free), self._miss, dtype=np.float32)
+        ))
+        order = np.argsort(keys)
+        self._update(keys[order], deltas[order])
+        self._scans += 1
+
+    def _grid(self, points: np.ndarray) -> np.ndarray:
+        """
+        Continuous grid coordinates, cell i spans [i, i + 1)
+        """
+        return (points - self._transform.offset) * self._transform.scale
+
+    def _key(self, cells: np.ndarray) -> np.ndarray:
+        """
+        Morton keys of the finest cells, x in the highest bit of each octant
+        """
+        keys = np.zeros(len(cells), dtype=np.uint64)
+        for axis, shift in ((0, 2), (1, 1), (2, 0)):
+            values = cells[:, axis].astype(np.int64)
+            keys |= (_SPREAD[values & 0x7ff] |
+                     (_SPREAD[values >> 11] << np.uint64(33))) << \
+                np.uint64(shift)
+        return keys
+
+    def _cells(self, keys: np.ndarray, depth: int) -> np.ndarray:
+        """
+        Lower corners in finest cells of the nodes of a depth
+        """
+        cells = np.zeros((len(keys), 3), dtype=np.int64)
+        keys = keys.astype(np.uint64)
+        for bit in range(depth):
+            for axis in range(3):
+                cells[:, axis] |= ((keys >> np.uint64(3 * bit + 2 - axis)) &
+                                   np.uint64(1)).astype(np.int64) << bit
+        return cells << (self._levels - depth)
+
+    def _traverse(self, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+        """
+        Cells every ray passes through before the cell of its end point,
+        stepping all rays one cell at a time together (Amanatides and Woo)
+        :param start: (3,) grid coordinates of the origin of the rays
+        :param end: (N, 3) grid coordinates of the end points
+        :return: uint64 keys of the cells inside the map, repeated where
+            rays cross
+        """
+        side = 2 ** self._levels
+        direction = end - start
+        cell = np.repeat(np.floor(start).astype(np.int64)[np.newaxis],
+                         len(end), axis=0)
+        last = np.floor(end).astype(np.int64)
+        step = np.sign(direction).astype(np.int64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = np.abs(1 / direction)
+            boundary = np.where(step > 0, cell + 1 - start, start - cell)
+            t_max = np.where(step == 0, np.inf, boundary * delta)
+        free = []
+        active = np.flatnonzero(np.any(cell != last, axis=1))
+        cell, last, step = cell[active], last[active], step[active]
+        delta, t_max = delta[active], t_max[active]
+        rows = np.arange(len(cell))
+        while len(cell) > 0:
+            inside = np.all((cell >= 0) & (cell < side), axis=1)
+            free.append(self._key(cell[inside] if not np.all(inside) else cell))
+            # only axes not yet at the end cell, so every ray stops after
+            # as many steps as its cells are apart
+            axis = np.argmin(np.where(cell != last, t_max, np.inf), axis=1)
+            cell[rows, axis] += step[rows, axis]
+            t_max[rows, axis] += delta[rows, axis]
+            going = np.any(cell != last, axis=1)
+            if not np.all(going):
+                cell, last, step = cell[going], last[going], step[going]
+                delta, t_max = delta[going], t_max[going]
+                rows = np.arange(len(cell))
+        if not free:
+            return np.zeros(0, dtype=np.uint64)
+        return np.concatenate(free)
+
+    def _update(self, keys: np.ndarray, deltas: np.ndarray):
+        """
+        Adds deltas to the finest cells of the sorted unique keys
+        """
+        self._expand(keys)
+        stored, values = self._keys[-1], self._values[-1]
+        position = np.searchsorted(stored, keys)
+        found = position < len(stored)
+        found[found] = stored[position[found]] == keys[found]
+        values[position[found]] = np.clip(
+            values[position[found]] + deltas[found], self._min, self._max
+        )
+        new = ~found
+        self._keys[-1] = np.insert(stored, position[new], keys[new])
+        self._values[-1] = np.insert(
+            values, position[new],
+            np.clip(deltas[new], self._min, self._max)
+        )
+        self._prune(keys)
+
+    def _expand(self, keys: np.ndarray):
+        """
+        Splits the pruned nodes above keys back into their 8 children
+        """
+        for depth in range(self._levels):
+            stored = self._keys[depth]
+            if len(stored) == 0:
+                continue
+            ancestors = np.unique(
+                keys >> np.uint64(3 * (self._levels - depth))
+            )
+            _, split, _ = np.intersect1d(stored, ancestors,
+                                         assume_unique=True,
+                                         return_indices=True)
+            if len(split) == 0:
+                continue
+            children = ((stored[split, np.newaxis] << np.uint64(3)) |
+                        _OCTANTS).reshape(-1)
+            values = np.repeat(self._values[depth][split], 8)
+            self._keys[depth] = np.delete(stored, split)
+            self._values[depth] = np.delete(self._values[depth], split)
+            self._insert(depth + 1, children, values)
+
+    def _prune(self, keys: np.ndarray):
+        """
+        Replaces the nodes whose 8 children hold the same value, from the
+        parents of keys upwards
+        """
+        parents = np.unique(keys >> np.uint64(3))
+        for depth in range(self._levels, 0, -1):
+            if len(parents) == 0:
+                return
+            stored, values = self._keys[depth], self._values[depth]
+            if len(stored) == 0:
+                return
+            children = ((parents[:, np.newaxis] << np.uint64(3)) | _OCTANTS)
+            position = np.minimum(np.searchsorted(stored, children),
+                                  len(stored) - 1)
+            child_values = values[position]
+            same = np.all(stored[position] == children, axis=1) & np.all(
+                child_values == child_values[:, :1], axis=1
+            )
+            if not np.any(same):
+                return
+            self._keys[depth] = np.delete(stored, position[same].reshape(-1))
+            self._values[depth] = np.delete(values,
+                                            position[same].reshape(-1))
+            self._insert(depth - 1, parents[same], child_values[same, 0])
+            parents = np.unique(parents[same] >> np.uint64(3))
+
+    def _insert(self, depth: int, keys: np.ndarray, values: np.ndarray):
+        # keys are sorted and not stored at depth yet
+        position = np.searchsorted(self._keys[depth], keys)
+        self._keys[depth] = np.insert(self._keys[depth], position, keys)
+        self._values[depth] = np.insert(self._values[depth], position, values)
+
+    def log_odds(self, points: np.ndarray) -> np.ndarray:
+        """
+        Log-odds of the cells of points, 0 for unknown cells and points
+        outside of the map
+        :param points: (N, 3+) array of points
+        :return: (N,) float32 array
+        """
+        grid = np.floor(self._grid(np.asarray(points, dtype=np.float64)[:, :3]))
+        side = 2 ** self._levels
+        inside = np.all((grid >= 0) & (grid < side), axis=1)
+        keys = self._key(grid[inside].astype(np.int64))
+        found = np.zeros(len(keys), dtype=np.float32)
+        for depth in range(self._levels, -1, -1):
+            stored = self._keys[depth]
+            if len(stored) == 0:
+                continue
+            prefix = keys >> np.uint64(3 * (self._levels - depth))
+            position = np.minimum(np.searchsorted(stored, prefix),
+                                  len(stored) - 1)
+            match = stored[position] == prefix
+            found[match] = self._values[depth][position[match]]
+        values = np.zeros(len(grid), dtype=np.float32)
+        values[inside] = found
+        return values
+
+    def probability(self, points: np.ndarray) -> np.ndarray:
+        """
+        Occupancy probability of the cells of points, 0.5 when unknown
+        """
+        return 1 / (1 + np.exp(-self.log_odds(points)))
+
+    def leaves(self) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        Every stored node, coarser ones stand for all the cells below them
+        :return: tuple of (depth, (M, 3) lower corners in finest cells,
+            log-odds) arrays, ordered by depth then key
+        """
+        depth = np.concatenate([
+            np.full(len(keys), d, dtype=np.uint8)
+            for d, keys in enumerate(self._keys)
+        ])
+        corners = np.concatenate([
+            self._cells(keys, d) for d, keys in enumerate(self._keys)
+        ])
+        return depth, corners, np.concatenate(self._values)
+
+    def occupied(
+            self,
+            threshold: float = 0.5
+    ) -> (np.ndarray, np.ndarray):
+        """
+        Nodes more likely occupied than threshold
+        :return: tuple of ((M, 3) float64 centres in the coordinates of
+            bounds, (M,) float64 edge lengths), a pruned node is one cube
+        """
+        depth, corners, values = self.leaves()
+        keep = values > _logit(threshold)
+        size = (1 << (self._levels - depth[keep].astype(np.int64))).astype(
+            np.float64
+        )
+        centres = self._transform.invert(corners[keep] + size[:, np.newaxis] / 2)
+        return centres, size * self._resolution
+
+    @property
+    def levels(self) -> int:
+        return self._levels
+
+    @property
+    def resolution(self) -> float:
+        return self._resolution
+
+    @property
+    def transform(self) -> utils.Transform:
+        return self._transform
+
+    @property
+    def scans(self) -> int:
+        return self._scans
+
+    def __len__(self):
+        return sum(len(keys) for keys in self._keys)
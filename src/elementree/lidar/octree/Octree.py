@@ -15,16 +15,47 @@
 #      You should have received a copy of the GNU General Public License
 #      along with this program.  If not, see <https://www.gnu.org/licenses/>.
 # ------------------------------------------------------------------------------
+import heapq
+import time
 from collections import deque
-from typing import Union
+from typing import Sequence, Union
 
 import numpy as np
 
 from elementree import utils
 from elementree.lidar.octree import cfg
+from elementree.lidar.octree import morton
+
+from elementree.lidar.octree.BuildStats import BuildStats
+
+from elementree.lidar.octree.LinearOctree import LinearOctree
 
 from elementree.lidar.octree.Region import Region
 
+# (x >= b_x) << 2 | (y >= b_y) << 1 | (z >= b_z) -> octant index
+_OCTANT: tuple = tuple(morton.OCTANT_INDEX.tolist())
+
+# nodes holding more points than this are partitioned with array operations
+_VECTORIZE: int = 256
+
+
+def _batched(occupancy, batch_size: Union[int, None]):
+    """
+    Passes occupancy bytes through, or groups them into uint8 arrays of up to
+    batch_size bytes
+    """
+    if batch_size is None:
+        yield from occupancy
+        return
+    batch: list[np.uint8] = []
+    for occ in occupancy:
+        batch.append(occ)
+        if len(batch) == batch_size:
+            yield np.array(batch, dtype=np.uint8)
+            batch = []
+    if batch:
+        yield np.array(batch, dtype=np.uint8)
+
 
 class Octree:
     """
@@ -38,13 +69,47 @@ class Octree:
             self,
             point_cloud: Union[np.ndarray, list[(int, int, int)]],
             bounds: Region,
-            _level: int = 0
+            _level: int = 0,
+            _indices: list[int] = None,
+            _stats: BuildStats = None
     ):
-        self._points: list[(int, int, int)]
-        if type(point_cloud) is np.ndarray:
-            self._points = point_cloud.tolist()
-        else:
-            self._points = point_cloud
+        # an array is kept as it is, e.g. a memory mapped file, until setup
+        # or the build turns it into a list
+        self._points: Union[list[(int, int, int)], np.ndarray, None] = \
+            point_cloud
+        # position of every point in the point cloud of the root
+        self._indices: Union[list[int], None] = (
+            list(range(len(self._points))) if _indices is None else _indices
+        )
+        # number of points merged into each point, None when none were
+        self._counts: Union[list[int], None] = None
+        # (points, indices, counts, coordinates) of the subtree this node was
+        # built in, once built the node holds the range
+        # [_start, _start + _count) of them instead of lists of its own
+        self._store: Union[tuple, None] = None
+        self._start: int = 0
+        self._count: int = 0
+        # stopping criteria, set by build_tree and shared by the subtree
+        self._capacity: int = 1
+        self._max_depth: Union[int, None] = None
+        self._grid: bool = False
+        # lazy builds split a node the first time its children, occupancy or
+        # location are read, pending until then
+        self._lazy: bool = False
+        self._pending: bool = False
+        # the root counts the nodes still pending and reports the stats of a
+        # lazy build once
+        self._root: 'Octree' = self
+        self._unexpanded: int = 0
+        self._finished: bool = False
+        # position of every index in the lists, built on the first delete
+        self._slots: Union[dict[int, int], None] = None
+        self._next_index: int = len(self._points)
+        # (level, lower corner) -> node, or None if removed, since the last
+        # pop_changes()
+        self._changed: dict[
+            tuple[int, tuple[int, int, int]], Union['Octree', None]
+        ] = {}
         self._bounds: Region = bounds
         self._k: int = 0
         self._max: Union[np.float32, None] = None
@@ -52,6 +117,7 @@ class Octree:
         self._x_scale_factor: int
         self._y_scale_factor: int
         self._z_scale_factor: int
+        self._transform: Union[utils.Transform, None] = None
         self._location: (int, int, int) = None
         self._occupancy: np.uint8 = np.uint8(0)
         self._children: list[Union['Octree', None]] = [
@@ -59,124 +125,681 @@ class Octree:
         ]
         self._octant: int = -1
         self._level: int = _level
+        self._linear: Union[LinearOctree, None] = None
+        self._stats: Union[BuildStats, None] = _stats
 
     def setup(self, levels):
         self._max = (2 ** levels) - 1
         self._min = np.float32(0)
         self._bounds = Region(x_max=self._max, y_max=self._max, z_max=self._max,
                               x_min=0, y_min=0, z_min=0)
+        if self._stats is None:
+            self._scale_to_range()
+            return
+        start = time.perf_counter()
         self._scale_to_range()
+        self._stats.add_time('scale', time.perf_counter() - start)
 
-    def build_tree(self):
+    def build_tree(
+            self,
+            vectorized: bool = False,
+            max_depth: Union[int, None] = None,
+            capacity: int = 1,
+            merge_duplicates: bool = False,
+            lazy: bool = False
+    ):
         """
         Build the octree out of the points in self._points. Creates a new octree
         object at each node while there are points available to sort.
+        :param vectorized: build the tree with bulk array operations on sorted
+            octant keys instead of creating a node object per octant. Requires
+            integer, non-negative bounds as set by setup(). The nodes are
+            stored in a LinearOctree and children returns views into it
+        :param max_depth: deepest level of the tree, nodes there are leaves
+            whatever they hold. After setup(levels) a node also stops
+            splitting once its region is a single cell, which it is by level
+            levels at the latest
+        :param capacity: most points a leaf holds before it is split
+        :param merge_duplicates: keep one point per distinct position, the
+            first one, and the number of points at it in counts. The tree is
+            built over the distinct positions
+        :param lazy: only take in the points, a node is split the first time
+            its children, occupancy or location are read, by a traversal, a
+            query or the caller, and keeps its children from then on. The
+            tree ends up as the full build, expand() builds it all at once.
+            Stats count the nodes and time the splits as they happen, they
+            are reported as finished once the last pending node is split or
+            expand() is called on the root, whichever comes first
         """
-        # Checks if this is a leaf node to break out of the recursion.
-        # if type(self._points) is np.ndarray:
-        #     self._points = self._points.tolist()
-
-        if len(self._points) <= 1:
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        if lazy and vectorized:
+            raise ValueError('vectorized builds are not lazy')
+        self._capacity = capacity
+        self._lazy = lazy
+        self._max_depth = max_depth
+        self._grid = self._max is not None
+        self._unexpanded = 0
+        self._finished = False
+        stats = self._stats
+        if stats is not None and self.level == 0:
+            start = time.perf_counter()
+            self._build(vectorized, merge_duplicates)
+            stats.add_time('build_tree', time.perf_counter() - start)
+            # a lazy build has only taken in the points, see _expand
+            if not self._lazy:
+                self._finish()
             return
-
-        # a, b, and c used to define the octant regions of the space
-        a = (
-            self._bounds[cfg.X_MIN],
-            self._bounds[cfg.Y_MIN],
-            self._bounds[cfg.Z_MIN]
-        )
-        c = (
-            self._bounds[cfg.X_MAX],
-            self._bounds[cfg.Y_MAX],
-            self._bounds[cfg.Z_MAX]
-        )
-        b = (
-            utils.find_center_point(a[cfg.X], c[cfg.X]),
-            utils.find_center_point(a[cfg.Y], c[cfg.Y]),
-            utils.find_center_point(a[cfg.Z], c[cfg.Z])
-        )
-        self.location = b
-        octant_regions: list['Region'] = [
-            Region(
-                x_min=b[cfg.X], y_min=b[cfg.Y], z_min=b[cfg.Z],
-                x_max=c[cfg.X], y_max=c[cfg.Y], z_max=c[cfg.Z]
-            ),
-            Region(
-                x_min=a[cfg.X], y_min=b[cfg.Y], z_min=b[cfg.Z],
-                x_max=b[cfg.X], y_max=c[cfg.Y], z_max=c[cfg.Z]
-            ),
-            Region(
-                x_min=a[cfg.X], y_min=a[cfg.Y], z_min=b[cfg.Z],
-                x_max=b[cfg.X], y_max=b[cfg.Y], z_max=c[cfg.Z]
-            ),
-            Region(
-                x_min=b[cfg.X], y_min=a[cfg.Y], z_min=b[cfg.Z],
-                x_max=c[cfg.X], y_max=b[cfg.Y], z_max=c[cfg.Z]
-            ),
-            Region(
-                x_min=b[cfg.X], y_min=a[cfg.Y], z_min=a[cfg.Z],
-                x_max=c[cfg.X], y_max=b[cfg.Y], z_max=b[cfg.Z],
-            ),
-            Region(
-                x_min=a[cfg.X], y_min=a[cfg.Y], z_min=a[cfg.Z],
-                x_max=b[cfg.X], y_max=b[cfg.Y], z_max=b[cfg.Z]
-            ),
-            Region(
-                x_min=a[cfg.X], y_min=b[cfg.Y], z_min=a[cfg.Z],
-                x_max=b[cfg.X], y_max=c[cfg.Y], z_max=b[cfg.Z],
-            ),
-            Region(
-                x_min=b[cfg.X], y_min=b[cfg.Y], z_min=a[cfg.Z],
-                x_max=c[cfg.X], y_max=c[cfg.Y], z_max=b[cfg.Z]
+        self._build(vectorized, merge_duplicates)
+
+    def _build(self, vectorized: bool = False, merge_duplicates: bool = False):
+        stats = self._stats
+        if vectorized:
+            self._linear = LinearOctree(np.asarray(self.points), self._bounds)
+            self._linear.build_tree(
+                max_depth=self._max_depth, capacity=self._capacity,
+                merge_duplicates=merge_duplicates
             )
-        ]
+            self.occupancy = self._linear.occupancy[0]
+            if stats is not None:
+                self._linear_stats(stats)
+            return
+        if self._store is None:
+            self._own(merge_duplicates)
+        if self._lazy:
+            self._pending = True
+            self._root._unexpanded += 1
+            return
+        self._split()
 
-        # populating a list of octants that will hold the points as they are
-        # sorted
-        octants: list[list[(int, int, int)]] = [
-            [], [], [], [], [], [], [], []
-        ]
+    def _expand(self):
+        """
+        Splits a node a lazy build left pending. The time counts towards
+        build_tree and splitting the last pending node finishes the stats
+        """
+        self._pending = False
+        root = self._root
+        root._unexpanded -= 1
+        stats = self._stats
+        if stats is not None:
+            start = time.perf_counter()
+        if self._store is None:
+            self._own()
+        self._split()
+        if stats is not None:
+            stats.add_time('build_tree', time.perf_counter() - start)
+        if root._unexpanded == 0:
+            root._finish()
+
+    def _finish(self):
+        """
+        Reports the stats of the root, once per build
+        """
+        if self._stats is not None and not self._finished:
+            self._finished = True
+            self._stats.finished()
 
-        # iterates through each point and octant region to see if the point
-        # fits in that region bucket
-        for point in self._points:
-            for i in range(8):
-                if octant_regions[i].within_bounds(point):
-                    octants[i].append(point)
+    def expand(self):
+        """
+        Splits every node of a lazy build that is still pending, as the full
+        build would have. On the root this finishes the stats if splitting
+        the nodes on first use has not already
+        """
+        nodes = [self]
+        while len(nodes) > 0:
+            nodes.extend(child for child in nodes.pop().children if child)
+        if self.level == 0:
+            self._finish()
+
+    def _split(self):
+        """
+        Partitions the range of this node into its octants and builds a child
+        for every octant that is not empty, unless the stopping criteria
+        make it a leaf
+        """
+        stats = self._stats
+        if stats is not None:
+            stats.add_nodes(self.level)
+        if not self._splits():
+            if stats is not None:
+                stats.add_leaves(self._count)
+            return
+        if stats is not None:
+            start = time.perf_counter()
+
+        # b is the split point, the octant regions are derived from it
+        b = self._bounds.center()
+        self.location = b
+        if stats is not None:
+            stats.add_time('regions', time.perf_counter() - start)
+            start = time.perf_counter()
+
+        # the range of this node is reordered so that every octant is one
+        # range of it, in octant order, points outside of all of them go last
+        points, indices, counts, coords = self._store
+        first, end = self._start, self._start + self._count
+        if coords is not None and self._count > _VECTORIZE:
+            sizes, order = self._partition_array(coords, b)
+        else:
+            sizes, order = self._partition_list(points, b)
+        points[first:end] = [points[position] for position in order]
+        indices[first:end] = [indices[position] for position in order]
+        if counts is not None:
+            counts[first:end] = [counts[position] for position in order]
+        if stats is not None:
+            stats.add_time('bucketing', time.perf_counter() - start)
 
         # creates new children nodes for each octant that is not empty
-        for i, octant in enumerate(octants):
-            if len(octant) != 0:
-                self.children[i] = self._create_node(octant, octant_regions[i])
+        for i, size in enumerate(sizes):
+            if size != 0:
+                self.children[i] = self._range_node(
+                    first, size, self._bounds.child(i, b)
+                )
                 self.children[i].octant = i
                 self.occupancy += 2 ** i
+                first += size
+
+    def _partition_list(
+            self,
+            points: list,
+            b: (int, int, int)
+    ) -> (list[int], list[int]):
+        """
+        Octant of every point of the range from three comparisons with the
+        split point, one pass over the points
+        :return: tuple of (points per octant, store positions in partitioned
+            order)
+        """
+        octants: list[list[int]] = [[], [], [], [], [], [], [], []]
+        outside: list[int] = []
+        within_bounds = self._bounds.within_bounds
+        bx, by, bz = b
+        for position in range(self._start, self._start + self._count):
+            point = points[position]
+            if within_bounds(point):
+                octants[_OCTANT[(point[cfg.X] >= bx) << 2 |
+                                (point[cfg.Y] >= by) << 1 |
+                                (point[cfg.Z] >= bz)]].append(position)
+            else:
+                outside.append(position)
+        order = [position for octant in octants for position in octant]
+        order.extend(outside)
+        return [len(octant) for octant in octants], order
+
+    def _partition_array(
+            self,
+            coords: np.ndarray,
+            b: (int, int, int)
+    ) -> (list[int], list[int]):
+        """
+        _partition_list over the coordinate array of the store with a stable
+        sort on the octant indices, which also reorders the coordinates
+        """
+        first, end = self._start, self._start + self._count
+        octant = self._bounds.octants(coords[first:end], b)
+        octant[octant < 0] = 8
+        order = np.argsort(octant, kind='stable')
+        coords[first:end] = coords[first:end][order]
+        sizes = np.bincount(octant, minlength=9)[:8].tolist()
+        return sizes, (order + first).tolist()
 
     def _create_node(
             self,
             octant: list[(int, int, int)],
-            region: 'Region'
+            region: 'Region',
+            indices: list[int] = None
     ) -> Union['Octree', None]:
         if len(octant) == 0:
             return None
 
-        ret = Octree(point_cloud=octant, bounds=region, _level=self.level+1)
-        ret.build_tree()
+        if self._stats is None:
+            ret = Octree(point_cloud=octant, bounds=region,
+                         _level=self.level+1, _indices=indices)
+        else:
+            start = time.perf_counter()
+            ret = Octree(point_cloud=octant, bounds=region,
+                         _level=self.level+1, _indices=indices,
+                         _stats=self._stats)
+            self._stats.add_time('children', time.perf_counter() - start)
+        self._inherit(ret)
+        ret._build()
         return ret
 
-    def _scale_to_range(self):
-        points = np.array(self._points)
-        x, y, z, r = np.hsplit(points, 4)
+    def _range_node(self, start: int, count: int, region: 'Region') -> 'Octree':
+        """
+        Child holding the range [start, start + count) of the store
+        """
+        if self._stats is not None:
+            time_start = time.perf_counter()
+        ret = Octree(point_cloud=[], bounds=region, _level=self.level+1,
+                     _stats=self._stats)
+        ret._points = ret._indices = None
+        ret._store, ret._start, ret._count = self._store, start, count
+        self._inherit(ret)
+        if self._stats is not None:
+            self._stats.add_time('children', time.perf_counter() - time_start)
+        ret._build()
+        return ret
+
+    def _inherit(self, node: 'Octree'):
+        node._root = self._root
+        node._lazy = self._lazy
+        node._capacity = self._capacity
+        node._max_depth = self._max_depth
+        node._grid = self._grid
+
+    def _own(self, merge_duplicates: bool = False):
+        """
+        Turns the lists of this node into the store of the subtree built
+        from it. The points are copied, the store is reordered in place.
+        """
+        points = (self._points.tolist() if isinstance(self._points, np.ndarray)
+                  else list(self._points))
+        indices, counts = self._indices, self._counts
+        if merge_duplicates:
+            first: dict[tuple, int] = {}
+            merged = ([], [], [])
+            for slot, point in enumerate(points):
+                count = 1 if counts is None else counts[slot]
+                position = first.setdefault(tuple(point[:3]), len(merged[0]))
+                if position == len(merged[0]):
+                    merged[0].append(point)
+                    merged[1].append(indices[slot])
+                    merged[2].append(count)
+                else:
+                    merged[2][position] += count
+            points, indices, counts = merged
+        # coordinates as an array for the nodes large enough to partition
+        # with array operations, smaller ranges never read it again
+        coords = None
+        if len(points) > _VECTORIZE:
+            coords = np.array([point[:3] for point in points], dtype=np.float64)
+        self._store = (points, indices, counts, coords)
+        self._start, self._count = 0, len(points)
+        self._points = self._indices = self._counts = None
+        self._slots = None
+
+    def _materialize(self):
+        """
+        Gives the node lists of its own again, to add or remove points
+        """
+        if self._store is None:
+            return
+        points, indices, counts, _ = self._store
+        end = self._start + self._count
+        self._points = points[self._start:end]
+        self._indices = indices[self._start:end]
+        self._counts = None if counts is None else counts[self._start:end]
+        self._store = None
 
-        x, self._x_scale_factor = utils.scale_to_range(self._max, self._min, x)
-        y, self._y_scale_factor = utils.scale_to_range(self._max, self._min, y)
-        z, self._z_scale_factor = utils.scale_to_range(self._max, self._min, z)
+    def _size(self) -> int:
+        return len(self._points) if self._store is None else self._count
 
-        points = np.hstack((x, y, z, r))
+    def _splits(self) -> bool:
+        """
+        Whether the stopping criteria let this node be split
+        """
+        if self._size() <= self._capacity:
+            return False
+        if self._max_depth is not None and self.level >= self._max_depth:
+            return False
+        if self._grid:
+            # every point of a single cell is at the same position
+            bounds = self._bounds
+            return (bounds[cfg.X_MAX] - bounds[cfg.X_MIN] > 1 or
+                    bounds[cfg.Y_MAX] - bounds[cfg.Y_MIN] > 1 or
+                    bounds[cfg.Z_MAX] - bounds[cfg.Z_MIN] > 1)
+        return True
+
+    def _linear_stats(self, stats: BuildStats):
+        linear = self._linear
+        for level, count in enumerate(np.bincount(linear.level).tolist()):
+            stats.add_nodes(level, count)
+        leaf = linear.occupancy == 0
+        points, counts = np.unique(linear.point_count[leaf], return_counts=True)
+        for value, count in zip(points.tolist(), counts.tolist()):
+            stats.add_leaves(value, count)
+
+    def _scale_to_range(self):
+        # scales a copy in place, float arrays in double precision as the
+        # Python floats of a list are
+        points = np.asarray(self._points)
+        points, self._transform = utils.quantize(
+            points.astype(np.float64 if points.dtype.kind == 'f'
+                          else points.dtype),
+            self._max, self._min, inplace=True
+        )
+        (self._x_scale_factor, self._y_scale_factor,
+         self._z_scale_factor) = self._transform.scale
         self._points = points.tolist()
 
 
     def bft(self) -> list[np.uint8]:
-        occupancy: list[np.uint8] = []
+        return list(self.iter_bft())
+
+    def dft(self) -> list[np.uint8]:
+        return list(self.iter_dft())
+
+    def iter_bft(self, batch_size: Union[int, None] = None):
+        """
+        Yields the occupancy of every node in breadth first order as the
+        traversal reaches it
+        :param batch_size: yield uint8 arrays of up to batch_size occupancy
+            bytes instead of one byte at a time
+        """
+        if self._linear is not None:
+            occupancy = self._linear.iter_bft(batch_size)
+        else:
+            occupancy = _batched(self._bft_nodes(), batch_size)
+        yield from self._counted(occupancy, batch_size)
+
+    def iter_dft(self, batch_size: Union[int, None] = None):
+        """
+        Yields the occupancy of every node in depth first (pre-order) order,
+        children in octant order. Uses an explicit stack, so the depth of the
+        tree is not limited by the recursion limit.
+        :param batch_size: yield uint8 arrays of up to batch_size occupancy
+            bytes instead of one byte at a time
+        """
+        if self._linear is not None:
+            occupancy = self._linear.iter_dft(batch_size)
+        else:
+            occupancy = _batched(self._dft_nodes(), batch_size)
+        yield from self._counted(occupancy, batch_size)
+
+    def _counted(self, occupancy, batch_size: Union[int, None]):
+        if self._stats is None:
+            yield from occupancy
+            return
+        for item in occupancy:
+            self._stats.add_bytes(1 if batch_size is None else len(item))
+            yield item
+
+    def query_box(
+            self,
+            region: Union[Region, Sequence[Region]]
+    ) -> Union[np.ndarray, list[np.ndarray]]:
+        """
+        Indices into the point cloud of the points inside region, with the
+        same half open bounds as Region.within_bounds. Subtrees whose bounds
+        do not overlap region are skipped.
+        :param region: a Region, or a sequence of Regions to run as a batch
+        :return: sorted int64 indices, or a list of them for a batch
+        """
+        if self._linear is not None:
+            return self._linear.query_box(region)
+        if not isinstance(region, Region):
+            return [self.query_box(r) for r in region]
+        low, high = region.box()
+        found = []
+        for node in self._leaves(
+                lambda lo, hi: bool(np.all((low < hi) & (lo < high)))):
+            for point, index in zip(node.points, node.indices):
+                if region.within_bounds(point):
+                    found.append(index)
+        return np.array(sorted(found), dtype=np.int64)
+
+    def query_radius(
+            self,
+            point: np.ndarray,
+            radius: Union[float, np.ndarray]
+    ) -> Union[np.ndarray, list[np.ndarray]]:
+        """
+        Indices into the point cloud of the points within radius of point,
+        in the scaled coordinates of the tree. Subtrees farther than radius
+        are skipped.
+        :param point: (3,) query point, or (M, 3) queries to run as a batch
+        :param radius: search radius, or (M,) radii of a batch
+        :return: sorted int64 indices, or a list of them for a batch
+        """
+        if self._linear is not None:
+            return self._linear.query_radius(point, radius)
+        point = np.asarray(point, dtype=np.float64)
+        if point.ndim == 2:
+            radius = np.broadcast_to(radius, (len(point),))
+            return [self.query_radius(p, r) for p, r in zip(point, radius)]
+        centre = point[None, :3]
+        limit = float(radius) ** 2
+        found = []
+        for node in self._leaves(
+                lambda lo, hi: utils.min_distance(centre, lo, hi)[0] <= limit):
+            for p, index in zip(node.points, node.indices):
+                offset = np.asarray(p[:3], dtype=np.float64) - centre[0]
+                if offset @ offset <= limit:
+                    found.append(index)
+        return np.array(sorted(found), dtype=np.int64)
+
+    def knn(self, point: np.ndarray, k: int) -> np.ndarray:
+        """
+        Indices into the point cloud of the k points closest to point, in the
+        scaled coordinates of the tree, nearest first. Ties are broken by
+        index. Nodes are visited closest first until the next one is farther
+        than the k-th closest point found.
+        :param point: (3,) query point, or (M, 3) queries to run as a batch
+        :param k: number of neighbours, at most the number of points
+        :return: (k,) int64 indices, or (M, k) for a batch
+        """
+        if self._linear is not None:
+            return self._linear.knn(point, k)
+        point = np.asarray(point, dtype=np.float64)
+        if point.ndim == 2:
+            return np.array(
+                [self.knn(p, k) for p in point], dtype=np.int64
+            ).reshape(len(point), -1)
+        centre = point[None, :3]
+        nearest: list[(float, int)] = []
+        # entries are (distance, kind, tie, item), nodes sort before points so
+        # every point at a distance is in the heap before the first one is
+        # taken, which keeps ties in index order
+        heap = [(0.0, 0, 0, self)]
+        while heap and len(nearest) < k:
+            distance, kind, tie, item = heapq.heappop(heap)
+            if kind == 1:
+                nearest.append((distance, tie))
+                continue
+            if not any(item.children):
+                for p, index in zip(item.points, item.indices):
+                    offset = np.asarray(p[:3], dtype=np.float64) - centre[0]
+                    heapq.heappush(heap, (float(offset @ offset), 1, index, None))
+            for child in item.children:
+                if child:
+                    lo, hi = child.bounds.box()
+                    heapq.heappush(heap, (
+                        float(utils.min_distance(centre, lo[None], hi[None])[0]),
+                        0, id(child), child
+                    ))
+        return np.array([index for _, index in nearest], dtype=np.int64)
+
+    def _leaves(self, overlaps):
+        """
+        Yields the leaves of the subtrees whose bounds pass overlaps(lo, hi)
+        """
+        nodes = [self]
+        while len(nodes) > 0:
+            node = nodes.pop()
+            if not any(node.children):
+                yield node
+                continue
+            for child in node.children:
+                if child:
+                    lo, hi = child.bounds.box()
+                    if overlaps(lo[None], hi[None]):
+                        nodes.append(child)
+
+    def insert(self, point: (int, int, int), index: int = None) -> int:
+        """
+        Adds a point to the built tree, splitting the leaf it lands in when
+        it now holds more than the capacity the tree was built with. Only the
+        nodes on the path of the point are visited and the tree ends up as
+        build_tree would have built it.
+        :param point: point in the scaled coordinates of the tree, use
+            transform.apply for points of a new frame
+        :param index: index to store the point under, by default the next
+            one after the largest index given out so far
+        :return: index of the point
+        """
+        self._check_mutable()
+        if index is None:
+            index = self._next_index
+        self._next_index = max(self._next_index, index + 1)
+        point = list(point)
+        node = self
+        node._append(point, index)
+        while True:
+            if not any(node.children):
+                if node._splits():
+                    node._build()
+                    node.expand()
+                    self._mark_subtree(node)
+                return index
+            octant = node._octant_of(point)
+            if octant is None:
+                return index
+            child = node.children[octant]
+            if child is None:
+                child = node._create_node(
+                    [point], node._octant_region(octant), [index]
+                )
+                child.octant = octant
+                node.children[octant] = child
+                node.occupancy += 2 ** octant
+                self._mark(node)
+                self._mark(child)
+                return index
+            child._append(point, index)
+            node = child
+
+    def delete(self, index: int) -> (int, int, int):
+        """
+        Removes the point stored under index. Nodes left without points are
+        removed from their parent and nodes left with a single point become
+        leaves again, as build_tree would have built them.
+        :param index: index of the point
+        :return: the point removed
+        """
+        self._check_mutable()
+        slot = self._slot(index)
+        point = self._points[slot]
+        path = [self]
+        while any(path[-1].children):
+            octant = path[-1]._octant_of(point)
+            if octant is None:
+                break
+            path.append(path[-1].children[octant])
+        for node in path:
+            node._remove(index)
+
+        for parent, node in zip(path[-2::-1], path[:0:-1]):
+            if node._size() == 0:
+                parent.children[node.octant] = None
+                parent.occupancy -= 2 ** node.octant
+                self._mark(parent)
+                self._mark(node, removed=True)
+        for node in path:
+            if not node._splits() and any(node.children):
+                self._collapse(node)
+                break
+        return point
+
+    def move(self, index: int, point: (int, int, int)):
+        """
+        Moves the point stored under index to point, keeping its index
+        :param index: index of the point
+        :param point: new position in the scaled coordinates of the tree
+        """
+        self.delete(index)
+        self.insert(point, index)
+
+    def pop_changes(self) -> list[(int, (int, int, int), Union[int, None])]:
+        """
+        Nodes created, removed or given a new occupancy since the last call,
+        e.g. between two frames, and forgets them
+        :return: sorted list of (level, (x_min, y_min, z_min), occupancy)
+            with occupancy None for nodes that were removed
+        """
+        changes = [
+            (level, corner, None if node is None else int(node.occupancy))
+            for (level, corner), node in self._changed.items()
+        ]
+        self._changed = {}
+        return sorted(changes, key=lambda change: change[:2])
+
+    def _check_mutable(self):
+        if self._linear is not None:
+            raise ValueError('trees built with vectorized=True are read only')
+
+    def _append(self, point: (int, int, int), index: int):
+        # split before the point arrives, the caller adds it to the child
+        if self._pending:
+            self._expand()
+        self._materialize()
+        if self._slots is not None:
+            self._slots[index] = len(self._points)
+        self._points.append(point)
+        self._indices.append(index)
+        if self._counts is not None:
+            self._counts.append(1)
+
+    def _slot(self, index: int) -> int:
+        self._materialize()
+        if self._slots is None:
+            self._slots = {i: slot for slot, i in enumerate(self._indices)}
+        return self._slots[index]
+
+    def _remove(self, index: int):
+        # the last point takes the place of the removed one
+        slot = self._slot(index)
+        del self._slots[index]
+        last_point, last_index = self._points.pop(), self._indices.pop()
+        last_count = None if self._counts is None else self._counts.pop()
+        if slot < len(self._points):
+            self._points[slot] = last_point
+            self._indices[slot] = last_index
+            if last_count is not None:
+                self._counts[slot] = last_count
+            self._slots[last_index] = slot
+
+    def _octant_of(self, point: (int, int, int)) -> Union[int, None]:
+        """
+        Octant of this node the point falls in, None if it is outside of the
+        node
+        """
+        if not self._bounds.within_bounds(point):
+            return None
+        b = self.location
+        code = ((point[cfg.X] >= b[cfg.X]) << 2 |
+                (point[cfg.Y] >= b[cfg.Y]) << 1 |
+                (point[cfg.Z] >= b[cfg.Z]))
+        return int(morton.OCTANT_INDEX[code])
+
+    def _octant_region(self, octant: int) -> Region:
+        return self._bounds.child(octant, self.location)
+
+    def _collapse(self, node: 'Octree'):
+        """
+        Turns node into a leaf, removing every node below it
+        """
+        for child in node.children:
+            if child:
+                self._mark_subtree(child, removed=True)
+        node.children = [None, None, None, None, None, None, None, None]
+        node.occupancy = np.uint8(0)
+        node.location = None
+        self._mark(node)
+
+    def _mark(self, node: 'Octree', removed: bool = False):
+        bounds = node.bounds
+        corner = (bounds[cfg.X_MIN], bounds[cfg.Y_MIN], bounds[cfg.Z_MIN])
+        self._changed[(node.level, corner)] = None if removed else node
+
+    def _mark_subtree(self, node: 'Octree', removed: bool = False):
+        nodes = [node]
+        while len(nodes) > 0:
+            node = nodes.pop()
+            self._mark(node, removed)
+            nodes.extend(child for child in node.children if child)
+
+    def _bft_nodes(self):
         nodes = deque([self])
         while len(nodes) > 0:
             node = nodes.popleft()
@@ -184,22 +807,74 @@ class Octree:
                 child = node.children[i]
                 if child:
                     nodes.append(child)
-            occupancy.append(node.occupancy)
-        return occupancy
+            yield node.occupancy
 
-    def dft(self) -> list[np.uint8]:
-        ...
+    def _dft_nodes(self):
+        nodes = [self]
+        while len(nodes) > 0:
+            node = nodes.pop()
+            for i in range(7, -1, -1):
+                child = node.children[i]
+                if child:
+                    nodes.append(child)
+            yield node.occupancy
+
+    @property
+    def points(self) -> list[(int, int, int)]:
+        """
+        Points inside this node, leaves hold at most the capacity the tree
+        was built with
+        """
+        if self._store is None:
+            return self._points
+        return self._store[0][self._start:self._start + self._count]
+
+    @property
+    def indices(self) -> list[int]:
+        """
+        Positions in the root's point cloud of the points of this node
+        """
+        if self._store is None:
+            return self._indices
+        return self._store[1][self._start:self._start + self._count]
+
+    @property
+    def counts(self) -> list[int]:
+        """
+        Number of points merged into each point of this node, all 1 unless
+        the tree was built with merge_duplicates
+        """
+        counts = self._counts if self._store is None else self._store[2]
+        if counts is None:
+            return [1] * self._size()
+        if self._store is None:
+            return counts
+        return counts[self._start:self._start + self._count]
 
     @property
     def scaling_factor(self):
         return self._x_scale_factor, self._y_scale_factor, self._z_scale_factor
 
+    @property
+    def stats(self) -> Union[BuildStats, None]:
+        return self._stats
+
+    @stats.setter
+    def stats(self, value: Union[BuildStats, None]):
+        self._stats = value
+
+    @property
+    def transform(self) -> Union[utils.Transform, None]:
+        return self._transform
+
     @property
     def bounds(self):
         return self._bounds
 
     @property
     def occupancy(self):
+        if self._pending:
+            self._expand()
         return self._occupancy
 
     @occupancy.setter
@@ -210,6 +885,8 @@ class Octree:
 
     @property
     def location(self) -> (int, int, int):
+        if self._pending:
+            self._expand()
         return self._location
 
     @location.setter
@@ -230,6 +907,10 @@ class Octree:
 
     @property
     def children(self) -> list[Union['Octree', None]]:
+        if self._linear is not None:
+            return self._linear.root.children
+        if self._pending:
+            self._expand()
         return self._children
 
     @children.setter
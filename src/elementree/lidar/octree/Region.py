@@ -17,14 +17,32 @@
 # ------------------------------------------------------------------------------
 from typing import Union
 
+import numpy as np
+
+from elementree import utils
 from elementree.lidar.octree import cfg
+from elementree.lidar.octree import morton
+
+# cfg key -> position in Region._bounds
+_INDEX: dict[str, int] = {
+    cfg.X_MAX: 0, cfg.Y_MAX: 1, cfg.Z_MAX: 2,
+    cfg.X_MIN: 3, cfg.Y_MIN: 4, cfg.Z_MIN: 5
+}
+
+# octant -> (x, y, z) upper half flags, as plain tuples for child()
+_UPPER: tuple = tuple(tuple(bool(b) for b in bits)
+                      for bits in morton.OCTANT_BITS.tolist())
 
 
 class Region:
     """
-    Defines an area.
+    Defines an area. The bounds are held in one tuple
+    (x_max, y_max, z_max, x_min, y_min, z_min), the lower bounds are inclusive
+    and the upper bounds exclusive.
     """
 
+    __slots__ = ('_bounds',)
+
     def __init__(
             self,
             x_max: int,
@@ -41,22 +59,112 @@ class Region:
         if z_max < z_min:
             raise ValueError
 
-        self._bounds = {
-            'x_max': x_max,
-            'x_min': x_min,
-            'y_max': y_max,
-            'y_min': y_min,
-            'z_max': z_max,
-            'z_min': z_min
-        }
+        self._bounds: tuple = (x_max, y_max, z_max, x_min, y_min, z_min)
+
+    @classmethod
+    def _of(cls, bounds: tuple) -> 'Region':
+        # bounds derived from a valid region, skips the checks
+        region = cls.__new__(cls)
+        region._bounds = bounds
+        return region
 
     def within_bounds(self, point: (int, int, int, int)) -> bool:
-        x, y, z = point[cfg.X], point[cfg.Y], point[cfg.Z]
-        if (self._bounds[cfg.X_MAX] > x >= self._bounds[cfg.X_MIN] and
-                self._bounds[cfg.Y_MAX] > y >= self._bounds[cfg.Y_MIN] and
-                self._bounds[cfg.Z_MAX] > z >= self._bounds[cfg.Z_MIN]):
-            return True
-        return False
+        x_max, y_max, z_max, x_min, y_min, z_min = self._bounds
+        return (x_max > point[cfg.X] >= x_min and
+                y_max > point[cfg.Y] >= y_min and
+                z_max > point[cfg.Z] >= z_min)
+
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        """
+        Vectorized within_bounds
+        :param points: (N, 3+) array of points
+        :return: (N,) boolean mask of the points inside the region
+        """
+        points = np.asarray(points)
+        return np.all(
+            (points[:, :3] >= self.lo) & (points[:, :3] < self.hi), axis=1
+        )
+
+    def octants(
+            self,
+            points: np.ndarray,
+            center: Union[tuple, None] = None
+    ) -> np.ndarray:
+        """
+        Octant of every point, the index of the child region it falls in
+        :param points: (N, 3+) array of points
+        :param center: split point of the region, center() by default
+        :return: (N,) int64 octant indices, -1 for points outside the region
+        """
+        points = np.asarray(points)
+        if center is None:
+            center = self.center()
+        upper = points[:, :3] >= np.asarray(center)
+        code = (upper[:, 0].astype(np.intp) << 2 |
+                upper[:, 1].astype(np.intp) << 1 |
+                upper[:, 2].astype(np.intp))
+        return np.where(
+            self.contains(points), morton.OCTANT_INDEX[code].astype(np.int64),
+            -1
+        )
+
+    def center(self) -> (int, int, int):
+        """
+        Point the region is split at, the upper halves include it
+        """
+        x_max, y_max, z_max, x_min, y_min, z_min = self._bounds
+        return (
+            utils.find_center_point(x_min, x_max),
+            utils.find_center_point(y_min, y_max),
+            utils.find_center_point(z_min, z_max)
+        )
+
+    def child(self, octant: int, center: Union[tuple, None] = None) -> 'Region':
+        """
+        Region of one octant, see morton.OCTANT_BITS for the numbering
+        :param octant: octant index
+        :param center: split point of the region, center() by default
+        """
+        if center is None:
+            center = self.center()
+        x_max, y_max, z_max, x_min, y_min, z_min = self._bounds
+        x, y, z = _UPPER[octant]
+        return Region._of((
+            x_max if x else center[0],
+            y_max if y else center[1],
+            z_max if z else center[2],
+            center[0] if x else x_min,
+            center[1] if y else y_min,
+            center[2] if z else z_min
+        ))
+
+    def children(self, center: Union[tuple, None] = None) -> list['Region']:
+        """
+        Regions of the 8 octants, in octant order
+        """
+        if center is None:
+            center = self.center()
+        return [self.child(octant, center) for octant in range(8)]
+
+    def box(self) -> (np.ndarray, np.ndarray):
+        """
+        (3,) float64 arrays of the lower and upper bounds
+        """
+        bounds = self._bounds
+        return (np.array(bounds[3:], dtype=np.float64),
+                np.array(bounds[:3], dtype=np.float64))
+
+    @property
+    def lo(self) -> (int, int, int):
+        return self._bounds[3:]
+
+    @property
+    def hi(self) -> (int, int, int):
+        return self._bounds[:3]
 
     def __getitem__(self, item):
-        return self._bounds[item]
+        return self._bounds[_INDEX[item]]
+
+    def __repr__(self):
+        return 'Region(x_max={}, y_max={}, z_max={}, x_min={}, y_min={}, ' \
+               'z_min={})'.format(*self._bounds)
@@ -0,0 +1,240 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+import os
+from typing import Iterable, Union
+
+import numpy as np
+
+from elementree import utils
+from elementree.lidar.octree import cfg
+from elementree.lidar.octree import morton
+
+from elementree.lidar.octree.LinearOctree import LinearOctree
+from elementree.lidar.octree.Region import Region
+
+
+def read_chunks(
+        source: Union[str, np.ndarray],
+        chunk_size: int = 1_000_000,
+        dtype: np.dtype = np.float32,
+        columns: int = 4
+):
+    """
+    Yields a point cloud in chunks of rows without loading all of it. Files
+    are memory mapped, so only the chunk being read is paged in.
+    :param source: an array, a .npy file, or a raw binary file of dtype
+        values with columns values per point
+    :param chunk_size: rows per chunk
+    :param dtype: value type of raw binary files
+    :param columns: values per point of raw binary files
+    :return: generator of (n, columns) array views
+    """
+    if isinstance(source, np.ndarray):
+        points = source
+    elif str(source).endswith('.npy'):
+        points = np.load(source, mmap_mode='r')
+    else:
+        points = np.memmap(source, dtype=dtype, mode='r').reshape(-1, columns)
+    for start in range(0, len(points), chunk_size):
+        yield points[start:start + chunk_size]
+
+
+class StreamBuilder:
+    """
+    Builds a LinearOctree from a point cloud that arrives in chunks and does
+    not have to fit in memory. Each chunk is scaled as setup(levels) would
+    scale the whole cloud and merged into a set of distinct quantized
+    positions with the number of points at each, which is all the tree needs.
+    Memory is bounded by the number of occupied positions, not the number of
+    points.
+
+    The bounds of the cloud are needed before the first insert, either passed
+    in or collected with scan() over the chunks in a first pass. A position
+    is packed into one int64, 3 * levels bits, so levels is at most
+    morton.MAX_DEPTH.
+    """
+
+    def __init__(self, levels: int, bounds: Union[Region, None] = None):
+        if not 0 <= levels <= morton.MAX_DEPTH:
+            raise ValueError(f'levels must be in [0, {morton.MAX_DEPTH}]')
+        self._levels: int = levels
+        self._max: int = (2 ** levels) - 1
+        self._min: np.float32 = np.float32(0)
+        self._from_max: Union[np.ndarray, None] = None
+        self._from_min: Union[np.ndarray, None] = None
+        self._transform: Union[utils.Transform, None] = None
+        if bounds is not None:
+            self._from_max = np.array(
+                [bounds[cfg.X_MAX], bounds[cfg.Y_MAX], bounds[cfg.Z_MAX]]
+            )
+            self._from_min = np.array(
+                [bounds[cfg.X_MIN], bounds[cfg.Y_MIN], bounds[cfg.Z_MIN]]
+            )
+        # distinct positions, packed into one integer, with their point
+        # counts and the sum of their 4th column
+        self._cells: np.ndarray = np.zeros(0, dtype=np.int64)
+        self._counts: np.ndarray = np.zeros(0, dtype=np.int64)
+        self._sums: np.ndarray = np.zeros(0, dtype=np.float64)
+        self._pending: list[tuple] = []
+        self._pending_size: int = 0
+        self._dropped: int = 0
+        self._inserted: int = 0
+
+    def scan(self, chunks: Iterable[np.ndarray]):
+        """
+        First pass over the chunks to find the bounds of the cloud. The
+        chunks have to be iterated again for insert.
+        """
+        if self._transform is not None:
+            raise ValueError('bounds cannot change after the first insert')
+        for chunk in chunks:
+            if len(chunk) == 0:
+                continue
+            chunk_max = np.max(chunk[:, :3], axis=0)
+            chunk_min = np.min(chunk[:, :3], axis=0)
+            if self._from_max is None:
+                self._from_max, self._from_min = chunk_max, chunk_min
+            else:
+                self._from_max = np.maximum(self._from_max, chunk_max)
+                self._from_min = np.minimum(self._from_min, chunk_min)
+
+    def _get_transform(self) -> utils.Transform:
+        if self._transform is None:
+            if self._from_max is None:
+                raise ValueError('bounds are unknown, pass them in or scan()')
+            self._transform = utils.Transform.from_bounds(
+                self._from_max.astype(np.float64),
+                self._from_min.astype(np.float64), self._max, self._min
+            )
+        return self._transform
+
+    def insert(self, chunk: np.ndarray):
+        """
+        Scales a chunk of (n, 4) points and adds it to the tree
+        """
+        chunk = np.asarray(chunk)
+        self._inserted += len(chunk)
+        coords = self._get_transform().apply(chunk, dtype=np.float64)
+
+        # points on or past the upper bound never make it below the root
+        inside = np.all((coords >= 0) & (coords < self._max), axis=1)
+        self._dropped += int(len(chunk) - np.count_nonzero(inside))
+        side = self._max + 1
+        cells = (coords[inside, 0] * side + coords[inside, 1]) * side + \
+            coords[inside, 2]
+        values = chunk[inside, 3].astype(np.float64) if chunk.shape[1] > 3 \
+            else np.zeros(len(cells))
+        self._pending.append((cells, values))
+        self._pending_size += len(cells)
+        # merging sorts everything held so far, wait until it is worth it
+        if self._pending_size >= len(self._cells):
+            self._merge()
+
+    def _merge(self):
+        if not self._pending:
+            return
+        cells = np.concatenate([self._cells] + [p[0] for p in self._pending])
+        counts = np.concatenate(
+            [self._counts] + [np.ones(len(p[0]), dtype=np.int64)
+                              for p in self._pending]
+        )
+        sums = np.concatenate([self._sums] + [p[1] for p in self._pending])
+        self._pending = []
+        self._pending_size = 0
+        self._cells, inverse = np.unique(cells, return_inverse=True)
+        self._counts = np.bincount(
+            inverse, weights=counts, minlength=len(self._cells)
+        ).astype(np.int64)
+        self._sums = np.bincount(
+            inverse, weights=sums, minlength=len(self._cells)
+        )
+
+    def build_tree(self) -> LinearOctree:
+        """
+        Builds the tree of everything inserted so far. The point buffer of the
+        tree holds one row per occupied position, the 4th column is the mean
+        of the points merged into it, and weights holds their number.
+        """
+        self._merge()
+        side = self._max + 1
+        points = np.empty((len(self._cells), 4), dtype=np.float64)
+        points[:, cfg.Z] = self._cells % side
+        points[:, cfg.Y] = (self._cells // side) % side
+        points[:, cfg.X] = self._cells // (side * side)
+        points[:, 3] = self._sums / np.maximum(self._counts, 1)
+        tree = LinearOctree(points, Region(
+            x_max=self._max, y_max=self._max, z_max=self._max,
+            x_min=0, y_min=0, z_min=0
+        ))
+        tree.build_tree(weights=self._counts, dropped=self._dropped)
+        return tree
+
+    @property
+    def scaling_factor(self) -> tuple:
+        return tuple(self._get_transform().scale)
+
+    @property
+    def transform(self) -> utils.Transform:
+        return self._get_transform()
+
+    @property
+    def dropped(self) -> int:
+        return self._dropped
+
+    @property
+    def inserted(self) -> int:
+        return self._inserted
+
+    def __len__(self):
+        self._merge()
+        return len(self._cells)
+
+
+def build_streaming(
+        source: Union[str, os.PathLike, np.ndarray, Iterable[np.ndarray]],
+        levels: int,
+        bounds: Union[Region, None] = None,
+        chunk_size: int = 1_000_000
+) -> LinearOctree:
+    """
+    Builds a LinearOctree chunk by chunk. Without bounds the source is read
+    twice, so an iterator of chunks needs bounds.
+    :param source: file path or array for read_chunks, or an iterable of
+        chunks
+    :param levels: levels of the tree, as for setup()
+    :param bounds: bounds of the cloud before scaling
+    :param chunk_size: rows per chunk when reading a file or array
+    """
+    if isinstance(source, os.PathLike):
+        source = os.fspath(source)
+    if isinstance(source, (str, np.ndarray)):
+        def chunks():
+            return read_chunks(source, chunk_size)
+    else:
+        if bounds is None and iter(source) is source:
+            raise ValueError('a one-shot iterator of chunks needs bounds')
+
+        def chunks():
+            return iter(source)
+
+    builder = StreamBuilder(levels, bounds)
+    if bounds is None:
+        builder.scan(chunks())
+    for chunk in chunks():
+        builder.insert(chunk)
+    return builder.build_tree()
@@ -0,0 +1,384 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Union
+
+import numpy as np
+
+from elementree import utils
+from elementree.lidar.octree import serialize
+
+from elementree.lidar.octree.LinearOctree import LinearOctree
+from elementree.lidar.octree.Region import Region
+
+# arrays of a LinearOctree counted towards the byte budget
+_ARRAYS: tuple = ('occupancy', 'first_child', 'level', 'point_start',
+                  'point_count', 'points', 'order', 'weights')
+
+
+def _nbytes(tree: Union[LinearOctree, None]) -> int:
+    if tree is None:
+        return 0
+    return sum(getattr(tree, name).nbytes for name in _ARRAYS
+               if getattr(tree, name) is not None)
+
+
+class TileMap:
+    """
+    World map split into cubic tiles of tile_size on every axis, each with
+    its own tree of 2 ** levels cells per axis. Points and queries are given
+    in world coordinates and routed to the tiles they touch; query results
+    are the indices insert() returned for the points.
+
+    Only the most recently used tiles are kept in memory, as long as their
+    arrays fit in budget bytes. A tile evicted after it changed is written
+    with serialize.save to a file in directory and loaded back the next time
+    it is used. A tile larger than the whole budget is still loaded, alone.
+
+    Inserted points wait in memory, counted towards the budget, until their
+    tile is next queried, evicted or flushed, so a tile is rebuilt once for
+    all the scans inserted into it since.
+
+    Inside a tile points are kept at their cell, so queries compare the
+    lower corners of the cells, i.e. at the resolution
+    tile_size / 2 ** levels.
+    """
+
+    def __init__(
+            self,
+            tile_size: float,
+            levels: int,
+            budget: int,
+            directory: Union[str, None] = None,
+            capacity: int = 1,
+            max_depth: Union[int, None] = None
+    ):
+        """
+        :param tile_size: edge length of a tile in world units
+        :param levels: levels of the tree of every tile
+        :param budget: most bytes of tile arrays kept in memory
+        :param directory: where evicted tiles are written, by default a
+            temporary directory removed with the map
+        :param capacity: most points a leaf holds before it is split
+        :param max_depth: deepest level of the tile trees
+        """
+        if tile_size <= 0:
+            raise ValueError('tile_size must be positive')
+        self._tile_size: float = float(tile_size)
+        self._levels: int = levels
+        self._side: int = 2 ** levels
+        self._budget: int = budget
+        self._capacity: int = capacity
+        self._max_depth: Union[int, None] = max_depth
+        self._temporary: Union[tempfile.TemporaryDirectory, None] = None
+        if directory is None:
+            self._temporary = tempfile.TemporaryDirectory()
+            directory = self._temporary.name
+        self._directory: str = directory
+        # key -> tree of the tiles in memory, least recently used first,
+        # None for a tile that only has pending points in memory
+        self._resident: OrderedDict[tuple, Union[LinearOctree, None]] = \
+            OrderedDict()
+        # key -> (cells, indices) inserted since the tile was last built
+        self._pending: dict[tuple, list[(np.ndarray, np.ndarray)]] = {}
+        # keys of all tiles with points, of those with a tree in memory or
+        # on disk and of those changed since written
+        self._keys: set[tuple] = set()
+        self._built: set[tuple] = set()
+        self._dirty: set[tuple] = set()
+        self._bytes: int = 0
+        self._next_index: int = 0
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+        self._spills: int = 0
+
+    def insert(self, points: np.ndarray) -> np.ndarray:
+        """
+        Adds points to the tiles they fall in
+        :param points: (N, 3+) world coordinates, columns past z are ignored
+        :return: (N,) int64 indices the points are returned under
+        """
+        points = np.asarray(points, dtype=np.float64)[:, :3]
+        indices = np.arange(self._next_index, self._next_index + len(points),
+                            dtype=np.int64)
+        self._next_index += len(points)
+        keys = np.floor(points / self._tile_size).astype(np.int64)
+        tiles, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        for i, key in enumerate(map(tuple, tiles.tolist())):
+            mine = inverse == i
+            cells = np.clip(self._transform(key).apply(points[mine]),
+                            0, self._side - 1)
+            self._pending.setdefault(key, []).append((cells, indices[mine]))
+            self._bytes += cells.nbytes + indices[mine].nbytes
+            if key in self._resident:
+                self._resident.move_to_end(key)
+            else:
+                self._resident[key] = None
+            self._keys.add(key)
+        self._evict()
+        return indices
+
+    def query_box(self, region: Region) -> np.ndarray:
+        """
+        Indices of the points inside region, with the same half open bounds
+        as Region.within_bounds
+        :param region: box in world coordinates
+        :return: sorted int64 indices
+        """
+        low, high = region.box()
+        found = [np.zeros(0, dtype=np.int64)]
+        for key in self._overlapping(low, high):
+            transform = self._transform(key)
+            lo, hi = (transform.scale * (low - transform.offset),
+                      transform.scale * (high - transform.offset))
+            found.append(self._tile(key).query_box(
+                Region(*hi.tolist(), *lo.tolist())))
+        return np.sort(np.concatenate(found))
+
+    def query_radius(self, point: np.ndarray, radius: float) -> np.ndarray:
+        """
+        Indices of the points within radius of point
+        :param point: (3,) world coordinates
+        :param radius: search radius in world units
+        :return: sorted int64 indices
+        """
+        point = np.asarray(point, dtype=np.float64)[:3]
+        found = [np.zeros(0, dtype=np.int64)]
+        for key in self._overlapping(point - radius, point + radius):
+            transform = self._transform(key)
+            found.append(self._tile(key).query_radius(
+                transform.scale * (point - transform.offset),
+                radius * transform.scale[0]))
+        return np.sort(np.concatenate(found))
+
+    def knn(self, point: np.ndarray, k: int) -> np.ndarray:
+        """
+        Indices of the k points closest to point, nearest first, ties broken
+        by index. Tiles are searched closest first until the next one is
+        farther than the k-th point found.
+        :param point: (3,) world coordinates
+        :param k: number of neighbours
+        :return: (k,) int64 indices, fewer if the map holds fewer points
+        """
+        point = np.asarray(point, dtype=np.float64)[:3]
+        keys = sorted(self._keys)
+        corners = np.array(keys, dtype=np.float64).reshape(-1, 3) * \
+            self._tile_size
+        distance = utils.min_distance(point, corners, corners + self._tile_size)
+        distances = np.zeros(0)
+        indices = np.zeros(0, dtype=np.int64)
+        for i in np.argsort(distance, kind='stable').tolist():
+            if len(indices) >= k and distance[i] > distances[k - 1]:
+                break
+            tree = self._tile(keys[i])
+            transform = tree.transform
+            found = tree.knn(transform.scale * (point - transform.offset), k)
+            sorter = np.argsort(tree.order)
+            rows = sorter[np.searchsorted(tree.order, found, sorter=sorter)]
+            cells = transform.offset + tree.points[rows] / transform.scale
+            distances = np.concatenate(
+                (distances, np.sum(np.square(cells - point), axis=1)))
+            indices = np.concatenate((indices, found))
+            best = np.lexsort((indices, distances))[:k]
+            distances, indices = distances[best], indices[best]
+        return indices
+
+    def flush(self):
+        """
+        Builds the tiles with pending points and writes every changed tile
+        to directory, keeping them in memory
+        """
+        for key in list(self._pending):
+            self._merge(key)
+        for key in list(self._dirty):
+            self._spill(key)
+        self._evict()
+
+    def _tile(self, key: tuple) -> LinearOctree:
+        """
+        Tree of the tile at key, loaded from its file if it is not in
+        memory, as the most recently used tile
+        """
+        tree = self._resident.get(key)
+        if tree is not None or (key in self._resident and
+                                key not in self._built):
+            self._hits += 1
+            self._resident.move_to_end(key)
+        else:
+            self._misses += 1
+            tree = self._load(key)
+        if key in self._pending:
+            tree = self._merge(key)
+        self._evict()
+        return tree
+
+    def _load(self, key: tuple) -> LinearOctree:
+        tree = serialize.load(self._path(key), mmap=False)
+        self._resident[key] = tree
+        self._resident.move_to_end(key)
+        self._bytes += _nbytes(tree)
+        return tree
+
+    def _merge(self, key: tuple) -> LinearOctree:
+        """
+        Rebuilds the tile at key with its pending points, keeping its place
+        in the recently used order
+        """
+        tree = self._resident[key]
+        if tree is None and key in self._built:
+            tree = self._load(key)
+        parts = self._pending.pop(key)
+        self._bytes -= sum(c.nbytes + o.nbytes for c, o in parts)
+        if tree is not None:
+            parts.insert(0, (tree.points, tree.order))
+            self._bytes -= _nbytes(tree)
+        tree = self._build(np.concatenate([c for c, _ in parts]),
+                           np.concatenate([o for _, o in parts]),
+                           self._transform(key))
+        self._resident[key] = tree
+        self._bytes += _nbytes(tree)
+        self._built.add(key)
+        self._dirty.add(key)
+        return tree
+
+    def _evict(self):
+        """
+        Drops least recently used tiles until the rest fit in the budget,
+        never the most recent one
+        """
+        while self._bytes > self._budget and len(self._resident) > 1:
+            key = next(iter(self._resident))
+            if key in self._pending:
+                self._merge(key)
+            if key in self._dirty:
+                self._spill(key)
+            self._bytes -= _nbytes(self._resident.pop(key))
+            self._evictions += 1
+
+    def _spill(self, key: tuple):
+        serialize.save(self._resident[key], self._path(key))
+        self._dirty.discard(key)
+        self._spills += 1
+
+    def _build(
+            self,
+            cells: np.ndarray,
+            order: np.ndarray,
+            transform: utils.Transform
+    ) -> LinearOctree:
+        """
+        Tree over the cells of one tile, with order as the index of every
+        cell instead of its position in cells
+        """
+        bounds = Region(self._side, self._side, self._side, 0, 0, 0)
+        tree = LinearOctree(cells, bounds)
+        tree.build_tree(max_depth=self._max_depth, capacity=self._capacity)
+        return LinearOctree.from_arrays(
+            bounds, tree.occupancy, tree.first_child, tree.level,
+            tree.point_start, tree.point_count, tree.points,
+            order[tree.order], transform=transform, levels=self._levels
+        )
+
+    def _transform(self, key: tuple) -> utils.Transform:
+        return utils.Transform(
+            np.array(key, dtype=np.float64) * self._tile_size,
+            np.full(3, self._side / self._tile_size)
+        )
+
+    def _overlapping(self, low: np.ndarray, high: np.ndarray) -> list[tuple]:
+        """
+        Keys of the tiles with points that overlap the box [low, high]
+        """
+        first = np.floor(low / self._tile_size).astype(np.int64)
+        last = np.floor(high / self._tile_size).astype(np.int64)
+        if np.prod(last - first + 1) > len(self._keys):
+            return sorted(key for key in self._keys
+                          if np.all((first <= key) & (key <= last)))
+        ranges = [range(a, b + 1) for a, b in zip(first.tolist(), last.tolist())]
+        return [(x, y, z) for x in ranges[0] for y in ranges[1]
+                for z in ranges[2] if (x, y, z) in self._keys]
+
+    def _path(self, key: tuple) -> str:
+        return os.path.join(self._directory, '{}_{}_{}.etoc'.format(*key))
+
+    @property
+    def tile_size(self) -> float:
+        return self._tile_size
+
+    @property
+    def resolution(self) -> float:
+        """
+        Edge length of a cell in world units
+        """
+        return self._tile_size / self._side
+
+    @property
+    def tiles(self) -> list[tuple]:
+        """
+        Keys of the tiles holding points, the lower corner of a tile is its
+        key times tile_size
+        """
+        return sorted(self._keys)
+
+    @property
+    def resident(self) -> list[tuple]:
+        """
+        Keys of the tiles in memory, least recently used first
+        """
+        return list(self._resident)
+
+    @property
+    def resident_bytes(self) -> int:
+        return self._bytes
+
+    @property
+    def hits(self) -> int:
+        """
+        Tile lookups served from memory
+        """
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """
+        Tile lookups that loaded the tile from disk
+        """
+        return self._misses
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self._hits + self._misses
+        return self._hits / lookups if lookups else 0.0
+
+    @property
+    def evictions(self) -> int:
+        return self._evictions
+
+    @property
+    def spills(self) -> int:
+        """
+        Tiles written to disk, on eviction or by flush
+        """
+        return self._spills
+
+    def __len__(self):
+        return self._next_index
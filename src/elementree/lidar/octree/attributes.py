@@ -0,0 +1,270 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Compression of a per point attribute, e.g. reflectance, alongside the
+geometry coded by codec.
+
+The attribute is averaged per leaf and quantized to integers. Every node then
+stands for the sum of the leaf values below it. Going down the breadth first
+order, the sum of each child is predicted from its parent as the parent's
+mean times the child's number of leaves. Only the residuals of all but the
+last child of a parent are coded, the last child is the parent's sum minus
+its siblings. That leaves one residual per leaf, minus one, and nodes with a
+single child cost nothing.
+
+The number of leaves below every node follows from the occupancy stream, so
+the decoder needs the geometry but no point counts. Residuals are binarized
+as a zero flag, a sign and an Elias gamma code of the magnitude, and coded
+with the adaptive binary range coder of codec. The probabilities are chosen
+by the bit length of the child's leaf count, which is what the size of the
+residual scales with.
+"""
+import struct
+
+import numpy as np
+
+from elementree.lidar.octree import cfg
+from elementree.lidar.octree import codec
+from elementree.lidar.octree import morton
+
+# bits, attribute min, attribute max, sum of the quantized leaf values
+HEADER = struct.Struct('<Bddq')
+
+# one block of probabilities per bit length of the leaf count of a child
+BANDS: int = 32
+BLOCK: int = 64
+ZERO: int = 0
+SIGN: int = 1
+PREFIX: int = 2
+SUFFIX: int = 34
+
+
+def leaf_attributes(tree, column: int = cfg.R) -> np.ndarray:
+    """
+    Mean of the attribute over the points of every leaf of a built tree, in
+    breadth first order, the order of codec.leaf_centers. Points merged by
+    StreamBuilder are weighted by the number of points they stand for.
+    :param tree: a built LinearOctree, or an Octree
+    :param column: column of the points holding the attribute
+    :return: (K,) float64 array
+    """
+    linear = getattr(tree, '_linear', None) or tree
+    if not hasattr(linear, 'point_start'):
+        return _object_leaf_attributes(tree, column)
+    leaf = linear.occupancy == 0
+    start = linear.point_start[leaf].astype(np.int64)
+    count = linear.point_count[leaf].astype(np.int64)
+    values = linear.points[:, column].astype(np.float64)
+    weights = np.ones(len(values)) if linear.weights is None \
+        else linear.weights.astype(np.float64)
+    # a leaf has at least one point, sums of the runs are read off cumsums
+    totals = np.concatenate(([0], np.cumsum(values * weights)))
+    counts = np.concatenate(([0], np.cumsum(weights)))
+    return (totals[start + count] - totals[start]) / \
+        (counts[start + count] - counts[start])
+
+
+def _object_leaf_attributes(tree, column: int) -> np.ndarray:
+    values = []
+    nodes = [tree]
+    while nodes:
+        children = []
+        for node in nodes:
+            if node.occupancy == 0:
+                values.append(np.mean([p[column] for p in node.points]))
+            children.extend(child for child in node.children if child)
+        nodes = children
+    return np.array(values, dtype=np.float64)
+
+
+def _structure(occupancy: np.ndarray):
+    """
+    Number of leaves below every node, and for every child whose sum is
+    coded, its position and its parent's
+    """
+    count = len(occupancy)
+    bits = np.unpackbits(occupancy[:, np.newaxis], axis=1, bitorder='little')
+    parent = np.nonzero(bits)[0][:count - 1]
+    offsets = morton.level_offsets(occupancy)
+    leaves = (occupancy == 0).astype(np.int64)
+    for start, end in zip(offsets[-2:0:-1], offsets[:0:-1]):
+        np.add.at(leaves, parent[start - 1:end - 1], leaves[start:end])
+    # children of a parent are contiguous, the last of them is not coded
+    child = np.arange(1, count)
+    coded = child[:-1][parent[1:] == parent[:-1]]
+    return leaves, parent, offsets, coded
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    # exact for values below 2 ** 53
+    return np.frexp(values.astype(np.float64))[1].astype(np.int64)
+
+
+def _bands(leaves: np.ndarray) -> np.ndarray:
+    return np.minimum(_bit_length(leaves), BANDS - 1) * BLOCK
+
+
+def _predict(parent_sum: np.ndarray, parent_leaves: np.ndarray,
+             leaves: np.ndarray) -> np.ndarray:
+    return (2 * parent_sum * leaves + parent_leaves) // (2 * parent_leaves)
+
+
+def _binarize(residuals: np.ndarray, base: np.ndarray) -> (np.ndarray, np.ndarray):
+    """
+    Bits of the residuals and the probability each is coded with, in coding
+    order, computed for all residuals at once
+    """
+    nonzero = residuals != 0
+    value = np.abs(residuals)
+    prefix = np.maximum(_bit_length(value) - 1, 0)
+    # zero flag, then sign, n + 1 prefix bits and n suffix bits if nonzero
+    sizes = 1 + nonzero * (2 * prefix + 2)
+    offset = np.cumsum(sizes) - sizes
+    bits = np.zeros(int(sizes.sum()), dtype=np.int64)
+    ctx = np.zeros(len(bits), dtype=np.int64)
+
+    bits[offset] = nonzero
+    ctx[offset] = base + ZERO
+    offset, base = offset[nonzero], base[nonzero]
+    prefix, value = prefix[nonzero], value[nonzero]
+    bits[offset + 1] = residuals[nonzero] < 0
+    ctx[offset + 1] = base + SIGN
+
+    owner = np.repeat(np.arange(len(prefix)), prefix + 1)
+    k = np.arange(len(owner)) - np.repeat(np.cumsum(prefix + 1) - prefix - 1, prefix + 1)
+    position = offset[owner] + 2 + k
+    bits[position] = k < prefix[owner]
+    ctx[position] = base[owner] + PREFIX + np.minimum(k, SUFFIX - PREFIX - 1)
+
+    owner = np.repeat(np.arange(len(prefix)), prefix)
+    j = np.arange(len(owner)) - np.repeat(np.cumsum(prefix) - prefix, prefix)
+    position = offset[owner] + 3 + prefix[owner] + j
+    bits[position] = (value[owner] >> (prefix[owner] - 1 - j)) & 1
+    ctx[position] = base[owner] + SUFFIX + np.minimum(prefix[owner], BLOCK - SUFFIX - 1)
+    return bits, ctx
+
+
+def encode_attributes(
+        occupancy: np.ndarray,
+        values: np.ndarray,
+        bits: int = 8
+) -> bytes:
+    """
+    Compresses one attribute value per leaf
+    :param occupancy: occupancy bytes as returned by bft()
+    :param values: value of every leaf in breadth first order, see
+        leaf_attributes
+    :param bits: precision the values are quantized to between their min
+        and max
+    :return: header followed by the range coded residuals
+    """
+    occupancy = np.asarray(occupancy, dtype=np.uint8)
+    values = np.asarray(values, dtype=np.float64)
+    low = float(values.min()) if len(values) else 0.0
+    high = float(values.max()) if len(values) else 0.0
+    top = (1 << bits) - 1
+    scale = top / (high - low) if high > low else 0.0
+    quantized = np.rint((values - low) * scale).astype(np.int64)
+
+    leaves, parent, offsets, coded = _structure(occupancy)
+    sums = np.zeros(len(occupancy), dtype=np.int64)
+    sums[occupancy == 0] = quantized
+    for start, end in zip(offsets[-2:0:-1], offsets[:0:-1]):
+        np.add.at(sums, parent[start - 1:end - 1], sums[start:end])
+
+    owner = parent[coded - 1]
+    residuals = sums[coded] - _predict(sums[owner], leaves[owner], leaves[coded])
+    bit, ctx = _binarize(residuals, _bands(leaves[coded]))
+
+    probs = [codec.PROB_INIT] * (BANDS * BLOCK)
+    encoder = codec.RangeEncoder()
+    for index, b in zip(ctx.tolist(), bit.tolist()):
+        encoder.encode_bit(probs, index, b)
+    return HEADER.pack(bits, low, high, int(sums[0])) + encoder.finish()
+
+
+def decode_attributes(data: bytes, occupancy: np.ndarray) -> np.ndarray:
+    """
+    Decompresses a stream written by encode_attributes
+    :param data: compressed attributes
+    :param occupancy: the occupancy stream the attributes were coded with
+    :return: (K,) float64 value of every leaf in breadth first order,
+        dequantized
+    """
+    occupancy = np.asarray(occupancy, dtype=np.uint8)
+    bits, low, high, total = HEADER.unpack_from(data)
+    leaves, parent, offsets, coded = _structure(occupancy)
+
+    probs = [codec.PROB_INIT] * (BANDS * BLOCK)
+    decoder = codec.RangeDecoder(data, HEADER.size)
+    residuals = np.zeros(len(coded), dtype=np.int64)
+    for i, base in enumerate(_bands(leaves[coded]).tolist()):
+        if not decoder.decode_bit(probs, base + ZERO):
+            continue
+        negative = decoder.decode_bit(probs, base + SIGN)
+        prefix = 0
+        while decoder.decode_bit(
+                probs, base + PREFIX + min(prefix, SUFFIX - PREFIX - 1)):
+            prefix += 1
+        value = 1
+        ctx = base + SUFFIX + min(prefix, BLOCK - SUFFIX - 1)
+        for _ in range(prefix):
+            value = (value << 1) | decoder.decode_bit(probs, ctx)
+        residuals[i] = -value if negative else value
+
+    # sums are rebuilt a level at a time, parents before their children
+    sums = np.zeros(len(occupancy), dtype=np.int64)
+    sums[0] = total
+    is_coded = np.zeros(len(occupancy), dtype=bool)
+    is_coded[coded] = True
+    residual = np.zeros(len(occupancy), dtype=np.int64)
+    residual[coded] = residuals
+    for start, end in zip(offsets[1:-1], offsets[2:]):
+        child = np.arange(start, end)
+        owner = parent[child - 1]
+        known = is_coded[child]
+        sums[child[known]] = residual[child[known]] + _predict(
+            sums[owner[known]], leaves[owner[known]], leaves[child[known]]
+        )
+        siblings = np.bincount(
+            owner[known] - owner[0], weights=sums[child[known]],
+            minlength=owner[-1] - owner[0] + 1
+        ).astype(np.int64)
+        last = child[~known]
+        sums[last] = sums[parent[last - 1]] - siblings[parent[last - 1] - owner[0]]
+
+    scale = (high - low) / ((1 << bits) - 1)
+    return low + sums[occupancy == 0] * scale
+
+
+def encode(tree, bits: int = 8, column: int = cfg.R) -> bytes:
+    """
+    Compresses the per leaf mean of an attribute of a built Octree or
+    LinearOctree
+    """
+    return encode_attributes(
+        np.asarray(tree.bft(), dtype=np.uint8),
+        leaf_attributes(tree, column), bits
+    )
+
+
+def decode(data: bytes, occupancy: np.ndarray) -> np.ndarray:
+    """
+    Decompresses a stream written by encode, see decode_attributes
+    """
+    return decode_attributes(data, occupancy)
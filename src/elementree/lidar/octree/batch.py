@@ -0,0 +1,147 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Encodes many independent frames, e.g. the scans of a recorded drive, in a
+process pool.
+
+Frames are handed out in order and at most max_in_flight of them are queued
+or being worked on at a time, so memory stays bounded however long the
+drive is. The pool is created once for all frames, and each worker reads
+frame files into one buffer that it keeps and grows between frames, then
+scales the points in place, so the per frame cost is the build itself.
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Union
+
+import numpy as np
+
+from elementree.lidar.octree import codec
+
+from elementree.lidar.octree.LinearOctree import LinearOctree
+from elementree.lidar.octree.Region import Region
+
+# read buffer kept by every worker process between frames
+_buffer: Union[bytearray, None] = None
+
+
+def _read(path: str, dtype: np.dtype, columns: int) -> np.ndarray:
+    """
+    Points of a .npy file, or of a raw binary file of dtype values with
+    columns values per point such as a KITTI .bin scan, read into the
+    process' buffer
+    """
+    global _buffer
+    if str(path).endswith('.npy'):
+        return np.load(path)
+    size = os.path.getsize(path)
+    if _buffer is None or len(_buffer) < size:
+        _buffer = bytearray(size + size // 2)
+    with open(path, 'rb') as file:
+        file.readinto(memoryview(_buffer)[:size])
+    dtype = np.dtype(dtype)
+    return np.frombuffer(
+        _buffer, dtype=dtype, count=size // dtype.itemsize
+    ).reshape(-1, columns)
+
+
+def encode_frame(
+        frame: Union[str, np.ndarray],
+        levels: int,
+        compress: bool = False,
+        dtype: np.dtype = np.float32,
+        columns: int = 4,
+        inplace: bool = False
+) -> bytes:
+    """
+    Builds the tree of one frame and returns its breadth first occupancy
+    stream, as Octree(frame).setup(levels), build_tree() and bft() would
+    :param frame: points, or a file for _read
+    :param levels: levels of the tree
+    :param compress: return the stream compressed by codec.encode
+    :param dtype: value type of raw binary files
+    :param columns: values per point of raw binary files
+    :param inplace: scale an array frame in place, frames read from files
+        always are
+    """
+    if isinstance(frame, np.ndarray):
+        points = frame
+    else:
+        points = _read(frame, dtype, columns)
+        inplace = True
+    inplace = inplace and points.flags.writeable and \
+        np.issubdtype(points.dtype, np.floating)
+    tree = LinearOctree(points, Region(1, 1, 1, 0, 0, 0))
+    tree.setup(levels, inplace=inplace)
+    tree.build_tree()
+    if compress:
+        return codec.encode(tree)
+    return tree.occupancy.tobytes()
+
+
+def encode_frames(
+        frames: Iterable[Union[str, np.ndarray]],
+        levels: int,
+        workers: Union[int, None] = None,
+        max_in_flight: Union[int, None] = None,
+        compress: bool = False,
+        dtype: np.dtype = np.float32,
+        columns: int = 4,
+        executor: Union[ProcessPoolExecutor, None] = None
+):
+    """
+    Encodes frames in a process pool, see encode_frame
+    :param frames: iterable of point arrays or files, read lazily
+    :param levels: levels of every tree
+    :param workers: processes in the pool, by default one per CPU. With one
+        worker and no executor the frames are encoded in this process
+    :param max_in_flight: frames submitted and not yet yielded, by default
+        twice the number of workers
+    :param compress: compress every stream with codec.encode
+    :param dtype: value type of raw binary files
+    :param columns: values per point of raw binary files
+    :param executor: pool to reuse, one is created for the call otherwise
+    :return: generator of the encoded frames, in the order of frames
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    if workers == 1 and executor is None:
+        for frame in frames:
+            yield encode_frame(frame, levels, compress, dtype, columns)
+        return
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        for frame in frames:
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+            # the worker gets its own copy of an array frame
+            pending.append(executor.submit(
+                encode_frame, frame, levels, compress, dtype, columns, True
+            ))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown()
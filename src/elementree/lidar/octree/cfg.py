@@ -25,3 +25,4 @@ Z_MIN: str = 'z_min'
 X: int = 0
 Y: int = 1
 Z: int = 2
+R: int = 3
@@ -0,0 +1,230 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Entropy coding of the breadth first occupancy stream.
+
+Every occupancy byte is coded as 8 binary decisions with an adaptive binary
+range coder, the same scheme LZMA uses for literals. The probabilities are
+chosen by the occupancy of the node's parent and the node's octant within it,
+so that each (parent occupancy, octant) pair learns its own distribution of
+child patterns.
+"""
+import struct
+from typing import Union
+
+import numpy as np
+
+from elementree.lidar.octree import morton
+
+# probabilities are 11 bit fixed point, adapting by 1/16 of the error
+PROB_BITS: int = 11
+PROB_INIT: int = 1 << (PROB_BITS - 1)
+MOVE_BITS: int = 4
+TOP: int = 1 << 24
+
+# one bit tree of 256 probabilities per (parent occupancy, octant) pair
+CONTEXTS: int = 256 * 8
+
+HEADER = struct.Struct('<I')
+
+
+class RangeEncoder:
+    """
+    Adaptive binary range coder, carries are resolved with a cached byte
+    """
+
+    def __init__(self):
+        self._low: int = 0
+        self._range: int = 0xFFFFFFFF
+        self._cache: int = 0
+        self._cache_size: int = 1
+        self._out: bytearray = bytearray()
+
+    def _shift_low(self):
+        if self._low < 0xFF000000 or self._low >= (1 << 32):
+            carry = self._low >> 32
+            temp = self._cache
+            while True:
+                self._out.append((temp + carry) & 0xFF)
+                temp = 0xFF
+                self._cache_size -= 1
+                if self._cache_size == 0:
+                    break
+            self._cache = (self._low >> 24) & 0xFF
+        self._cache_size += 1
+        self._low = (self._low & 0x00FFFFFF) << 8
+
+    def encode_bit(self, probs: list[int], index: int, bit: int):
+        prob = probs[index]
+        bound = (self._range >> PROB_BITS) * prob
+        if bit:
+            self._low += bound
+            self._range -= bound
+            probs[index] = prob - (prob >> MOVE_BITS)
+        else:
+            self._range = bound
+            probs[index] = prob + (((1 << PROB_BITS) - prob) >> MOVE_BITS)
+        while self._range < TOP:
+            self._range <<= 8
+            self._shift_low()
+
+    def encode_byte(self, probs: list[int], base: int, byte: int):
+        """
+        Codes the 8 bits of byte, lowest first, with the bit tree of 256
+        probabilities starting at base
+        """
+        node = 1
+        for i in range(8):
+            bit = (byte >> i) & 1
+            self.encode_bit(probs, base + node, bit)
+            node = (node << 1) | bit
+
+    def finish(self) -> bytes:
+        for _ in range(5):
+            self._shift_low()
+        return bytes(self._out)
+
+
+class RangeDecoder:
+    """
+    Decoder for RangeEncoder
+    """
+
+    def __init__(self, data: Union[bytes, memoryview], offset: int = 0):
+        self._data = data
+        self._position: int = offset + 5
+        self._range: int = 0xFFFFFFFF
+        self._code: int = int.from_bytes(data[offset + 1:offset + 5], 'big')
+
+    def decode_bit(self, probs: list[int], index: int) -> int:
+        prob = probs[index]
+        bound = (self._range >> PROB_BITS) * prob
+        if self._code < bound:
+            self._range = bound
+            probs[index] = prob + (((1 << PROB_BITS) - prob) >> MOVE_BITS)
+            bit = 0
+        else:
+            self._code -= bound
+            self._range -= bound
+            probs[index] = prob - (prob >> MOVE_BITS)
+            bit = 1
+        while self._range < TOP:
+            self._range <<= 8
+            byte = self._data[self._position] \
+                if self._position < len(self._data) else 0
+            self._code = ((self._code << 8) | byte) & 0xFFFFFFFF
+            self._position += 1
+        return bit
+
+    def decode_byte(self, probs: list[int], base: int) -> int:
+        node = 1
+        byte = 0
+        for i in range(8):
+            bit = self.decode_bit(probs, base + node)
+            byte |= bit << i
+            node = (node << 1) | bit
+        return byte
+
+
+def contexts(occupancy: np.ndarray) -> np.ndarray:
+    """
+    Context of every node of a breadth first occupancy stream, parent
+    occupancy * 8 + octant. The root, which has no parent, gets context 0.
+    """
+    occupancy = np.asarray(occupancy, dtype=np.uint8)
+    bits = np.unpackbits(occupancy[:, np.newaxis], axis=1, bitorder='little')
+    parent, octant = np.nonzero(bits)
+    ctx = np.zeros(len(occupancy), dtype=np.int64)
+    n = min(len(parent), len(occupancy) - 1)
+    ctx[1:n + 1] = occupancy[parent[:n]].astype(np.int64) * 8 + octant[:n]
+    return ctx
+
+
+def encode_occupancy(occupancy: np.ndarray) -> bytes:
+    """
+    Compresses a breadth first occupancy stream
+    :param occupancy: occupancy bytes as returned by bft()
+    :return: node count followed by the range coded stream
+    """
+    occupancy = np.asarray(occupancy, dtype=np.uint8)
+    probs = [PROB_INIT] * (CONTEXTS * 256)
+    encoder = RangeEncoder()
+    for ctx, occ in zip(contexts(occupancy).tolist(), occupancy.tolist()):
+        encoder.encode_byte(probs, ctx << 8, occ)
+    return HEADER.pack(len(occupancy)) + encoder.finish()
+
+
+def decode_occupancy(data: bytes) -> np.ndarray:
+    """
+    Decompresses a stream written by encode_occupancy
+    :return: uint8 occupancy bytes in breadth first order
+    """
+    (count,) = HEADER.unpack_from(data)
+    probs = [PROB_INIT] * (CONTEXTS * 256)
+    decoder = RangeDecoder(data, HEADER.size)
+    occupancy = bytearray(count)
+    # the contexts of the children are known as soon as the parent is decoded
+    ctx = [0] * count
+    child = 1
+    for i in range(count):
+        occ = decoder.decode_byte(probs, ctx[i] << 8)
+        occupancy[i] = occ
+        for octant in range(8):
+            if occ & (1 << octant):
+                if child >= count:
+                    raise ValueError('occupancy stream is corrupt')
+                ctx[child] = occ * 8 + octant
+                child += 1
+    return np.frombuffer(bytes(occupancy), dtype=np.uint8)
+
+
+def encode(tree) -> bytes:
+    """
+    Compresses the geometry of a built Octree or LinearOctree
+    """
+    return encode_occupancy(np.asarray(tree.bft(), dtype=np.uint8))
+
+
+def leaf_centers(occupancy: np.ndarray, levels: int) -> np.ndarray:
+    """
+    Center of the region of every leaf of a breadth first occupancy stream,
+    the position a single point leaf is reconstructed at
+    :param occupancy: occupancy bytes as returned by bft()
+    :param levels: levels passed to setup() when the tree was built
+    :return: (K, 3) int64 array of quantized coordinates
+    """
+    top = (2 ** levels) - 1
+    centers = []
+    for _, occ, lo, hi in morton.expand_levels(
+            occupancy, np.zeros(3, dtype=np.int64), np.full(3, top)
+    ):
+        leaf = occ == 0
+        centers.append((lo[leaf] + hi[leaf]) // 2)
+    if not centers:
+        return np.zeros((0, 3), dtype=np.int64)
+    return np.concatenate(centers)
+
+
+def decode(data: bytes, levels: int) -> np.ndarray:
+    """
+    Decompresses a stream written by encode back into points
+    :param data: compressed stream
+    :param levels: levels passed to setup() when the tree was built
+    :return: (K, 3) int64 array with one point per leaf, see leaf_centers
+    """
+    return leaf_centers(decode_occupancy(data), levels)
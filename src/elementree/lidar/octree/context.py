@@ -0,0 +1,194 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Context features of the nodes of a tree for learned occupancy coding, as
+used by OctSqueeze (ancestors) and VoxelContext-Net (neighbours at the same
+depth).
+
+The features are derived from the breadth first occupancy stream alone,
+one level at a time, so a decoder that has the levels above can derive the
+same ones. Every node gets integer coordinates at its level, its parent's
+coordinates doubled plus the octant bits. The nodes of one level split
+every axis at the same points, so nodes next to each other in coordinates
+are next to each other in space.
+
+The neighbours of a node are not searched for. A neighbour of a child is a
+child of one of its parent's neighbours, and which one and in which octant
+depends only on the child's octant and the offset. Both are tabulated once
+per radius, so the neighbours of a level are two table lookups into the
+neighbours of the level above and the child slots of its nodes.
+
+Per node, in breadth first order:
+
+    occupancy   uint8, the byte to predict
+    level       uint8
+    octant      uint8 octant in the parent, 8 for the root
+    position    (3,) int32 coordinates at the level
+    parent      uint8 occupancy of the parent, 0 for the root
+    siblings    (8,) uint8 occupancy of the parent's children by octant,
+                0 where there is no child
+    neighbours  ((2r+1) ** 3,) uint8 occupancy of the nodes at offsets
+                -r..r on every axis, x slowest, the node itself at the
+                centre, 0 where there is no node
+    present     ((2r+1) ** 3,) bool, whether there is a node there
+
+siblings and neighbours hold every node of the level. A causal model has to
+mask the ones coded after the node.
+"""
+from typing import Union
+
+import numpy as np
+
+from elementree.lidar.octree import morton
+from elementree.lidar.octree import serialize
+
+FIELDS: tuple = ('occupancy', 'level', 'octant', 'position', 'parent',
+                 'siblings', 'neighbours', 'present')
+
+
+def _offsets(radius: int) -> np.ndarray:
+    steps = np.arange(-radius, radius + 1)
+    return np.stack(np.meshgrid(steps, steps, steps, indexing='ij'),
+                    axis=-1).reshape(-1, 3)
+
+
+def _stream(tree) -> np.ndarray:
+    if isinstance(tree, bytes):
+        return np.frombuffer(tree, dtype=np.uint8)
+    if isinstance(tree, (np.ndarray, list)):
+        return np.asarray(tree, dtype=np.uint8)
+    return serialize.to_linear(tree).occupancy
+
+
+def _descent(radius: int) -> (np.ndarray, np.ndarray):
+    """
+    For a child in every octant and every offset, where the neighbour at
+    that offset is: the offset of its parent from the child's parent, as a
+    row of _offsets, and its octant in that parent
+    :return: tuple of (8, K) int64 arrays (parent offset, octant)
+    """
+    offsets = _offsets(radius)
+    width = 2 * radius + 1
+    target = morton.OCTANT_BITS[:, np.newaxis, :] + offsets[np.newaxis]
+    step = (target >> 1) + radius
+    bits = target & 1
+    parent = (step[..., 0] * width + step[..., 1]) * width + step[..., 2]
+    octant = morton.OCTANT_INDEX[
+        (bits[..., 0] << 2) | (bits[..., 1] << 1) | bits[..., 2]
+    ].astype(np.int64)
+    return parent, octant
+
+
+def _empty(radius: int) -> dict[str, np.ndarray]:
+    """
+    FIELDS -> arrays of no rows, for a tree without levels
+    """
+    around = (2 * radius + 1) ** 3
+    return {
+        'occupancy': np.zeros(0, dtype=np.uint8),
+        'level': np.zeros(0, dtype=np.uint8),
+        'octant': np.zeros(0, dtype=np.uint8),
+        'position': np.zeros((0, 3), dtype=np.int32),
+        'parent': np.zeros(0, dtype=np.uint8),
+        'siblings': np.zeros((0, 8), dtype=np.uint8),
+        'neighbours': np.zeros((0, around), dtype=np.uint8),
+        'present': np.zeros((0, around), dtype=bool),
+    }
+
+
+def iter_levels(tree, radius: int = 1):
+    """
+    Context features of a tree one level at a time
+    :param tree: a built LinearOctree or Octree, or its breadth first
+        occupancy stream
+    :param radius: neighbours up to radius nodes away on every axis
+    :return: generator of dicts of FIELDS -> arrays, one per level, their
+        rows in breadth first order
+    """
+    stream = _stream(tree)
+    offsets = _offsets(radius)
+    parent_offset, neighbour_octant = _descent(radius)
+    position = np.zeros((1, 3), dtype=np.int64)
+    octant = np.full(1, 8, dtype=np.uint8)
+    parent = np.zeros(1, dtype=np.uint8)
+    siblings = np.zeros((1, 8), dtype=np.uint8)
+    # position in the level of the node at every offset, -1 if there is none
+    around = np.full((1, len(offsets)), -1, dtype=np.int64)
+    around[0, len(offsets) // 2] = 0
+    start, level = 0, 0
+    while len(position) > 0 and start < len(stream):
+        occupancy = stream[start:start + len(position)]
+        count = len(occupancy)
+        around = around[:count]
+        # a 0 after the level's bytes for the missing nodes at -1
+        padded = np.append(occupancy, np.uint8(0))
+        yield {
+            'occupancy': occupancy,
+            'level': np.full(count, level, dtype=np.uint8),
+            'octant': octant[:count],
+            'position': position[:count].astype(np.int32),
+            'parent': parent[:count],
+            'siblings': siblings[:count],
+            'neighbours': padded[around],
+            'present': around >= 0,
+        }
+        bits = np.unpackbits(occupancy[:, np.newaxis], axis=1,
+                             bitorder='little')
+        row, child = np.nonzero(bits)
+        start += count
+        level += 1
+        following = stream[start:start + len(row)]
+        children = np.zeros((count, 8), dtype=np.uint8)
+        children[row[:len(following)], child[:len(following)]] = following
+        # a neighbour of a child is a child of a neighbour of its parent,
+        # found with two flat lookups instead of searching the level. The
+        # extra row of slots is read for the missing neighbours at -1
+        slots = np.full((count + 1, 8), -1, dtype=np.int64)
+        slots[row, child] = np.arange(len(row))
+        uncle = around.ravel()[
+            (row * len(offsets))[:, np.newaxis] + parent_offset[child]]
+        uncle *= 8
+        uncle += neighbour_octant[child]
+        around = slots.ravel()[uncle]
+        position = position[row] * 2 + morton.OCTANT_BITS[child]
+        octant = child.astype(np.uint8)
+        parent = occupancy[row]
+        siblings = children[row]
+
+
+def features(
+        tree,
+        radius: int = 1,
+        max_level: Union[int, None] = None
+) -> dict[str, np.ndarray]:
+    """
+    Context features of every node of a tree, see the module docstring
+    :param tree: a built LinearOctree or Octree, or its breadth first
+        occupancy stream
+    :param radius: neighbours up to radius nodes away on every axis
+    :param max_level: last level to export, by default all of them
+    :return: dict of FIELDS -> contiguous arrays, one row per node in
+        breadth first order, no rows for an empty stream
+    """
+    levels = [_empty(radius)]
+    for level in iter_levels(tree, radius):
+        if max_level is not None and int(level['level'][0]) > max_level:
+            break
+        levels.append(level)
+    return {name: np.concatenate([level[name] for level in levels])
+            for name in FIELDS}
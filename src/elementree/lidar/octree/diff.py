@@ -0,0 +1,241 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Change detection between two trees built with the same setup(levels).
+
+diff walks both trees together one level at a time, pairing the nodes that
+sit at the same place. Pairs whose LinearOctree.fingerprints are equal hold
+the same subtree and are not descended, so once the fingerprints of both
+trees are known the walk only visits the paths that changed. Where only one
+tree has a node, or a pair stops at a leaf above the requested depth, the
+voxels are taken from the points of the subtree.
+
+xor_occupancy gives the delta of the two occupancy streams for coding the
+second tree against the first, apply_xor undoes it. The stream covers every
+node of either tree, in the breadth first order of their union: a node
+present in both gives the XOR of its two occupancy bytes, a node in one tree
+only gives its occupancy byte.
+"""
+from typing import Union
+
+import numpy as np
+
+from elementree import utils
+from elementree.lidar.octree import morton
+from elementree.lidar.octree import serialize
+
+from elementree.lidar.octree.LinearOctree import LinearOctree
+from elementree.lidar.octree.LinearOctree import POPCOUNT
+
+
+def _bounds(tree_a: LinearOctree, tree_b: LinearOctree):
+    lo, hi = morton.root_bounds(tree_a.bounds)
+    other_lo, other_hi = morton.root_bounds(tree_b.bounds)
+    if np.any(lo != other_lo) or np.any(hi != other_hi):
+        raise ValueError('trees must have the same bounds, use the same '
+                         'setup(levels)')
+    return lo, hi
+
+
+def _children(tree: LinearOctree, nodes: np.ndarray) -> (np.ndarray, ...):
+    """
+    Children of nodes in order
+    :return: tuple of (position in nodes of the parent, octant, child node)
+    """
+    occupancy = tree.occupancy[nodes]
+    bits = np.unpackbits(occupancy[:, np.newaxis], axis=1, bitorder='little')
+    row, octant = np.nonzero(bits)
+    counts = POPCOUNT[occupancy].astype(np.int64)
+    rank = np.arange(len(row)) - np.repeat(np.cumsum(counts) - counts, counts)
+    child = tree.first_child[nodes].astype(np.int64)[row] + rank
+    return row, octant, child
+
+
+def _cells(
+        tree: LinearOctree,
+        nodes: list[np.ndarray],
+        depth: int,
+        lo: np.ndarray,
+        hi: np.ndarray
+) -> np.ndarray:
+    """
+    Keys, cut to depth, of the cells holding the points below nodes
+    """
+    nodes = np.concatenate(nodes) if nodes else np.zeros(0, dtype=np.int64)
+    if len(tree.points) < int(tree.point_count[0]):
+        raise ValueError('diff needs the point buffer of the trees')
+    rows = utils.ranges(tree.point_start[nodes].astype(np.int64),
+                       tree.point_count[nodes].astype(np.int64))
+    full = morton.key_depth(lo, hi)
+    keys, _ = morton.octant_keys(tree.points[rows], lo, hi, full)
+    return np.unique(keys >> np.uint64(3 * (full - depth)))
+
+
+def diff(
+        tree_a,
+        tree_b,
+        depth: Union[int, None] = None,
+        xor: bool = False
+):
+    """
+    Voxels occupied in only one of two trees
+    :param tree_a: earlier tree, a built LinearOctree or Octree
+    :param tree_b: later tree over the same bounds
+    :param depth: depth of the voxels, by default the full depth of the
+        trees, where every voxel is a single cell
+    :param xor: also return xor_occupancy(tree_a, tree_b)
+    :return: tuple of (added, removed), (K, 3) int64 lower corners of the
+        voxels occupied in tree_b only and in tree_a only, in key order.
+        With xor the XOR occupancy stream follows
+    """
+    tree_a, tree_b = serialize.to_linear(tree_a), serialize.to_linear(tree_b)
+    lo, hi = _bounds(tree_a, tree_b)
+    full = morton.key_depth(lo, hi)
+    if depth is None:
+        depth = full
+    if not 0 <= depth <= full:
+        raise ValueError(f'depth must be in [0, {full}]')
+    hash_a, hash_b = tree_a.fingerprints, tree_b.fingerprints
+
+    # subtrees whose cells are compared point by point
+    only_a: list[np.ndarray] = []
+    only_b: list[np.ndarray] = []
+    pair_a = np.zeros(1, dtype=np.int64)
+    pair_b = np.zeros(1, dtype=np.int64)
+    level = 0
+    while len(pair_a) > 0 and level < depth:
+        changed = hash_a[pair_a] != hash_b[pair_b]
+        pair_a, pair_b = pair_a[changed], pair_b[changed]
+        leaf = (tree_a.occupancy[pair_a] == 0) | (tree_b.occupancy[pair_b] == 0)
+        only_a.append(pair_a[leaf])
+        only_b.append(pair_b[leaf])
+        pair_a, pair_b = pair_a[~leaf], pair_b[~leaf]
+
+        row_a, octant_a, child_a = _children(tree_a, pair_a)
+        row_b, octant_b, child_b = _children(tree_b, pair_b)
+        _, in_a, in_b = np.intersect1d(
+            row_a * 8 + octant_a, row_b * 8 + octant_b,
+            assume_unique=True, return_indices=True
+        )
+        single_a = np.ones(len(child_a), dtype=bool)
+        single_a[in_a] = False
+        single_b = np.ones(len(child_b), dtype=bool)
+        single_b[in_b] = False
+        only_a.append(child_a[single_a])
+        only_b.append(child_b[single_b])
+        pair_a, pair_b = child_a[in_a], child_b[in_b]
+        level += 1
+    # pairs left at depth are a voxel of both trees
+
+    cells_a = _cells(tree_a, only_a, depth, lo, hi)
+    cells_b = _cells(tree_b, only_b, depth, lo, hi)
+    result = []
+    for cells in (np.setdiff1d(cells_b, cells_a, assume_unique=True),
+                  np.setdiff1d(cells_a, cells_b, assume_unique=True)):
+        corners, _ = morton.node_bounds(
+            cells << np.uint64(3 * (full - depth)), depth, full, lo, hi
+        )
+        result.append(corners)
+    if xor:
+        result.append(xor_occupancy(tree_a, tree_b))
+    return tuple(result)
+
+
+def _paths(occupancy: np.ndarray) -> (np.ndarray, np.ndarray):
+    """
+    Octant path of every node of a breadth first occupancy stream, three
+    bits per level, and the offsets of the levels, see morton.level_offsets
+    """
+    occupancy = np.asarray(occupancy, dtype=np.uint8)
+    offsets = morton.level_offsets(occupancy)
+    bits = np.unpackbits(occupancy[:, np.newaxis], axis=1, bitorder='little')
+    parent, octant = np.nonzero(bits)
+    paths = np.zeros(len(occupancy), dtype=np.uint64)
+    for start, end in zip(offsets[1:-1], offsets[2:]):
+        paths[start:end] = (paths[parent[start - 1:end - 1]] << np.uint64(3)) \
+            | octant[start - 1:end - 1].astype(np.uint64)
+    return paths, offsets
+
+
+def _at(paths: np.ndarray, occupancy: np.ndarray, union: np.ndarray):
+    """
+    Occupancy of the nodes of one level at the union paths, 0 where missing
+    """
+    position = np.minimum(np.searchsorted(paths, union), max(len(paths) - 1, 0))
+    found = (paths[position] == union) if len(paths) else \
+        np.zeros(len(union), dtype=bool)
+    values = np.zeros(len(union), dtype=np.uint8)
+    values[found] = occupancy[position[found]]
+    return values
+
+
+def xor_occupancy(tree_a, tree_b) -> np.ndarray:
+    """
+    Delta of the occupancy streams of two trees over the same bounds
+    :return: uint8 stream with one byte per node of the union of the trees
+    """
+    tree_a, tree_b = serialize.to_linear(tree_a), serialize.to_linear(tree_b)
+    _bounds(tree_a, tree_b)
+    paths_a, offsets_a = _paths(tree_a.occupancy)
+    paths_b, offsets_b = _paths(tree_b.occupancy)
+    stream = []
+    for level in range(max(len(offsets_a), len(offsets_b)) - 1):
+        level_a = slice(*offsets_a[level:level + 2]) \
+            if level + 1 < len(offsets_a) else slice(0, 0)
+        level_b = slice(*offsets_b[level:level + 2]) \
+            if level + 1 < len(offsets_b) else slice(0, 0)
+        union = np.union1d(paths_a[level_a], paths_b[level_b])
+        stream.append(
+            _at(paths_a[level_a], tree_a.occupancy[level_a], union) ^
+            _at(paths_b[level_b], tree_b.occupancy[level_b], union)
+        )
+    return np.concatenate(stream)
+
+
+def apply_xor(occupancy_a: np.ndarray, xor: np.ndarray) -> np.ndarray:
+    """
+    Occupancy stream of the second tree from the first and xor_occupancy
+    :param occupancy_a: breadth first occupancy stream of the first tree
+    :param xor: delta returned by xor_occupancy
+    :return: uint8 breadth first occupancy stream of the second tree
+    """
+    occupancy_a = np.asarray(occupancy_a, dtype=np.uint8)
+    xor = np.asarray(xor, dtype=np.uint8)
+    paths_a, offsets_a = _paths(occupancy_a)
+    union = np.zeros(1, dtype=np.uint64)
+    in_b = np.ones(1, dtype=bool)
+    stream = []
+    offset = level = 0
+    while len(union) > 0:
+        if level + 1 < len(offsets_a):
+            level_a = slice(*offsets_a[level:level + 2])
+            occ_a = _at(paths_a[level_a], occupancy_a[level_a], union)
+        else:
+            occ_a = np.zeros(len(union), dtype=np.uint8)
+        occ_b = occ_a ^ xor[offset:offset + len(union)]
+        stream.append(occ_b[in_b])
+        offset += len(union)
+
+        # the union has a child wherever either tree does
+        both = occ_a | occ_b
+        bits = np.unpackbits(both[:, np.newaxis], axis=1, bitorder='little')
+        parent, octant = np.nonzero(bits)
+        union = (union[parent] << np.uint64(3)) | octant.astype(np.uint64)
+        in_b = (occ_b[parent] >> octant.astype(np.uint8)) & 1 == 1
+        level += 1
+    return np.concatenate(stream)
@@ -0,0 +1,140 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Level of detail point clouds straight from the breadth first occupancy stream.
+
+A node exists as soon as its parent's occupancy byte is known, so the nodes
+of level d only need the bytes of the levels above d. Every node is
+represented by the center of its region, the same position leaf_centers
+reconstructs leaves at. Leaves above d stay in the cloud, as do nodes whose
+own byte has not arrived yet when the stream is truncated.
+"""
+from typing import Union
+
+import numpy as np
+
+from elementree.lidar.octree import morton
+
+
+def _root(levels: int) -> (np.ndarray, np.ndarray):
+    top = (2 ** levels) - 1
+    return np.zeros((1, 3), dtype=np.int64), np.full((1, 3), top, dtype=np.int64)
+
+
+def _centers(lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    return (lo + hi) // 2
+
+
+def level_of_detail(
+        occupancy: np.ndarray,
+        levels: int,
+        depth: Union[int, None] = None
+) -> np.ndarray:
+    """
+    Voxel centers of the tree cut at depth, without rebuilding the tree
+    :param occupancy: breadth first occupancy bytes, possibly truncated
+    :param levels: levels passed to setup() when the tree was built
+    :param depth: level to cut the tree at, by default as deep as the
+        stream goes
+    :return: (K, 3) int64 array of quantized coordinates, one per leaf above
+        depth and per node at depth
+    """
+    occupancy = np.asarray(occupancy, dtype=np.uint8)
+    lo, hi = _root(levels)
+    centers = []
+    offset = 0
+    level = 0
+    while len(lo) > 0 and (depth is None or level < depth):
+        occ = occupancy[offset:offset + len(lo)]
+        offset += len(lo)
+        # nodes without a byte yet, or leaves, are kept as they are
+        kept = np.ones(len(lo), dtype=bool)
+        kept[:len(occ)] = occ == 0
+        centers.append(_centers(lo[kept], hi[kept]))
+        if len(occ) == 0:
+            break
+        bits = np.unpackbits(occ[:, np.newaxis], axis=1, bitorder='little')
+        parent, octant = np.nonzero(bits)
+        lo, hi = morton.child_bounds(lo[parent], hi[parent], octant)
+        level += 1
+    else:
+        centers.append(_centers(lo, hi))
+    return np.concatenate(centers)
+
+
+class ProgressiveDecoder:
+    """
+    Turns a breadth first occupancy stream into successively finer point
+    clouds as its bytes arrive, e.g. from a socket or a file being read.
+    """
+
+    def __init__(self, levels: int):
+        """
+        :param levels: levels passed to setup() when the tree was built
+        """
+        self._lo, self._hi = _root(levels)
+        self._pending: np.ndarray = np.zeros(0, dtype=np.uint8)
+        self._leaves: list[np.ndarray] = [np.zeros((0, 3), dtype=np.int64)]
+        self._level: int = 0
+
+    def feed(
+            self,
+            data: Union[bytes, np.ndarray]
+    ) -> list[tuple[int, np.ndarray]]:
+        """
+        Adds the next bytes of the stream and decodes them right away
+        :param data: occupancy bytes following the ones already fed
+        :return: list of (level, points) for every level completed by data,
+            see points
+        """
+        self._pending = np.concatenate(
+            (self._pending, np.frombuffer(bytes(data), dtype=np.uint8))
+        )
+        completed = []
+        while len(self._lo) > 0 and len(self._pending) >= len(self._lo):
+            occ = self._pending[:len(self._lo)]
+            self._pending = self._pending[len(self._lo):]
+            leaf = occ == 0
+            self._leaves.append(_centers(self._lo[leaf], self._hi[leaf]))
+            bits = np.unpackbits(occ[:, np.newaxis], axis=1, bitorder='little')
+            parent, octant = np.nonzero(bits)
+            self._lo, self._hi = morton.child_bounds(
+                self._lo[parent], self._hi[parent], octant
+            )
+            self._level += 1
+            completed.append((self._level, self.points))
+        return completed
+
+    @property
+    def points(self) -> np.ndarray:
+        """
+        Cloud at the deepest level whose nodes are all known, the same as
+        level_of_detail(stream, levels, level)
+        """
+        return np.concatenate(self._leaves + [_centers(self._lo, self._hi)])
+
+    @property
+    def level(self) -> int:
+        return self._level
+
+    @property
+    def done(self) -> bool:
+        """
+        True once every byte of the tree has been fed
+        """
+        return len(self._lo) == 0
@@ -0,0 +1,484 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Vectorized octree construction.
+
+Every point is given an octant key: one 3 bit octant index per level of the
+tree, most significant level first. Sorting the keys places the points of every
+node in one contiguous run, and the runs of each level are in the same order
+the breadth first traversal of Octree visits them, so the whole tree can be
+derived with bulk array operations instead of per point Region checks.
+
+The split rules mirror Octree.build_tree exactly: a node splits its region at
+utils.find_center_point on each axis, the upper half of an axis includes the
+center, and a node with one point or fewer is a leaf. A larger bucket capacity
+and a maximum depth can be passed to stop splitting earlier.
+"""
+from typing import Union
+
+import numpy as np
+
+# Octant index -> (x, y, z) flags, 1 when the octant is the upper half of
+# that axis. This is the ordering used by the octant regions in build_tree.
+OCTANT_BITS: np.ndarray = np.array([
+    [1, 1, 1],
+    [0, 1, 1],
+    [0, 0, 1],
+    [1, 0, 1],
+    [1, 0, 0],
+    [0, 0, 0],
+    [0, 1, 0],
+    [1, 1, 0]
+], dtype=np.int64)
+
+# (x << 2 | y << 1 | z) -> octant index, the inverse of OCTANT_BITS
+OCTANT_INDEX: np.ndarray = np.zeros(8, dtype=np.uint64)
+OCTANT_INDEX[
+    (OCTANT_BITS[:, 0] << 2) | (OCTANT_BITS[:, 1] << 1) | OCTANT_BITS[:, 2]
+] = np.arange(8, dtype=np.uint64)
+
+# Keys are stored in an uint64, 3 bits per level
+MAX_DEPTH: int = 21
+
+
+def key_depth(lo: np.ndarray, hi: np.ndarray) -> int:
+    """
+    Number of levels after which every region inside the bounds has collapsed
+    to a single cell on every axis. Splitting a width w gives the widths
+    floor(w / 2) and ceil(w / 2), so this is ceil(log2(w)) of the widest axis.
+    :param lo: (3,) lower bounds of the root region
+    :param hi: (3,) upper bounds of the root region
+    :return: depth of the deepest possible node
+    """
+    width = int(np.max(np.asarray(hi) - np.asarray(lo)))
+    if width <= 1:
+        return 0
+    return (width - 1).bit_length()
+
+
+def root_bounds(bounds) -> (np.ndarray, np.ndarray):
+    """
+    Converts a Region into the integer (lo, hi) arrays used by this module
+    :param bounds: Region of the root node
+    :return: tuple of (3,) int64 arrays (lo, hi)
+    """
+    from elementree.lidar.octree import cfg
+    lo = np.array([bounds[cfg.X_MIN], bounds[cfg.Y_MIN], bounds[cfg.Z_MIN]])
+    hi = np.array([bounds[cfg.X_MAX], bounds[cfg.Y_MAX], bounds[cfg.Z_MAX]])
+    if np.any(lo != np.floor(lo)) or np.any(hi != np.floor(hi)):
+        raise ValueError('vectorized build requires integer bounds')
+    if np.any(lo < 0):
+        raise ValueError(
+            'vectorized build requires non-negative bounds, call setup() first'
+        )
+    return lo.astype(np.int64), hi.astype(np.int64)
+
+
+def _descend(values: np.ndarray, lo: int, hi: int, depth: int) -> np.ndarray:
+    """
+    Descends the splits of one axis and records, for every value, one bit per
+    level that is set when the value lands in the upper half.
+    :param values: int64 values inside [lo, hi)
+    :return: int64 array of path bits, first level in the highest bit
+    """
+    low = np.full(len(values), lo, dtype=np.int64)
+    high = np.full(len(values), hi, dtype=np.int64)
+    paths = np.zeros(len(values), dtype=np.int64)
+    for _ in range(depth):
+        mid = (low + high) // 2
+        upper = values >= mid
+        paths = (paths << 1) | upper
+        low = np.where(upper, mid, low)
+        high = np.where(upper, high, mid)
+    return paths
+
+
+def spread(paths: np.ndarray, depth: int) -> np.ndarray:
+    """
+    Moves path bit i to bit 3 * i, leaving room to interleave the other axes
+    """
+    spread = np.zeros(len(paths), dtype=np.uint64)
+    for i in range(depth):
+        spread |= ((paths >> i) & 1).astype(np.uint64) << np.uint64(3 * i)
+    return spread
+
+
+def _axis_spread(
+        values: np.ndarray,
+        lo: int,
+        hi: int,
+        depth: int
+) -> np.ndarray:
+    """
+    Spread path bits of every value along one axis, see _descend. When there
+    are more values than cells on the axis every cell is descended once and
+    the values are looked up instead.
+    """
+    if hi - lo < len(values):
+        table = _descend(np.arange(lo, hi, dtype=np.int64), lo, hi, depth)
+        return spread(table, depth)[values - lo]
+    return spread(_descend(values, lo, hi, depth), depth)
+
+
+def _remap_table() -> np.ndarray:
+    """
+    Table from 4 levels of interleaved (x, y, z) codes to the same 4 levels
+    as octant indices
+    """
+    codes = np.arange(1 << 12)
+    table = np.zeros(1 << 12, dtype=np.uint64)
+    for level in range(4):
+        table |= OCTANT_INDEX[(codes >> (3 * level)) & 7] << \
+            np.uint64(3 * level)
+    return table
+
+
+_REMAP: np.ndarray = _remap_table()
+
+
+def octant_keys(
+        points: np.ndarray,
+        lo: np.ndarray,
+        hi: np.ndarray,
+        depth: int
+) -> (np.ndarray, np.ndarray):
+    """
+    Computes the interleaved octant key of every point.
+    :param points: (N, 3+) array of coordinates
+    :param lo: (3,) lower bounds of the root region
+    :param hi: (3,) upper bounds of the root region
+    :param depth: number of levels to encode, see key_depth
+    :return: tuple of (uint64 keys of the points inside the bounds, boolean
+        mask of the points inside the bounds)
+    """
+    if depth > MAX_DEPTH:
+        raise ValueError(f'depth {depth} does not fit in a 64 bit key')
+
+    # Region.within_bounds is half open, and every split point is an integer,
+    # so flooring the coordinates never changes which octant they land in
+    coords = np.floor(points[:, :3]).astype(np.int64)
+    inside = np.all((coords >= lo) & (coords < hi), axis=1)
+    coords = coords[inside]
+
+    codes = _axis_spread(coords[:, 0], int(lo[0]), int(hi[0]), depth)
+    codes <<= np.uint64(1)
+    codes |= _axis_spread(coords[:, 1], int(lo[1]), int(hi[1]), depth)
+    codes <<= np.uint64(1)
+    codes |= _axis_spread(coords[:, 2], int(lo[2]), int(hi[2]), depth)
+
+    # (x, y, z) codes sort by Morton order, remap every level to the octant
+    # numbering so the keys sort in the order build_tree creates children
+    keys = np.zeros(len(codes), dtype=np.uint64)
+    for shift in range(0, 3 * depth, 12):
+        chunk = (codes >> np.uint64(shift)) & np.uint64(0xfff)
+        keys |= _REMAP[chunk.astype(np.intp)] << np.uint64(shift)
+    keys &= np.uint64((1 << (3 * depth)) - 1)
+    return keys, inside
+
+
+def child_bounds(
+        lo: np.ndarray,
+        hi: np.ndarray,
+        octant: np.ndarray
+) -> (np.ndarray, np.ndarray):
+    """
+    Bounds of the given octant of each region
+    :param lo: (M, 3) lower bounds of the parents
+    :param hi: (M, 3) upper bounds of the parents
+    :param octant: (M,) octant index of each child
+    :return: tuple of (M, 3) arrays (lo, hi) of the children
+    """
+    mid = (lo + hi) // 2
+    upper = OCTANT_BITS[octant].astype(bool)
+    return np.where(upper, mid, lo), np.where(upper, hi, mid)
+
+
+def node_bounds(
+        keys: np.ndarray,
+        level: Union[np.ndarray, int],
+        depth: int,
+        lo: np.ndarray,
+        hi: np.ndarray
+) -> (np.ndarray, np.ndarray):
+    """
+    Bounds of the nodes at the given levels on the paths of the given keys
+    :param keys: uint64 key of any point inside each node
+    :param level: level of each node
+    :param depth: depth the keys were computed with
+    :param lo: (3,) lower bounds of the root region
+    :param hi: (3,) upper bounds of the root region
+    :return: tuple of (M, 3) arrays (lo, hi)
+    """
+    keys = np.asarray(keys, dtype=np.uint64).reshape(-1)
+    level = np.broadcast_to(level, keys.shape)
+    low = np.tile(np.asarray(lo, dtype=np.int64), (len(keys), 1))
+    high = np.tile(np.asarray(hi, dtype=np.int64), (len(keys), 1))
+    for i in range(int(level.max(initial=0))):
+        octant = (keys >> np.uint64(3 * (depth - i - 1))) & np.uint64(7)
+        child_low, child_high = child_bounds(
+            low, high, octant.astype(np.int64)
+        )
+        descend = (level > i)[:, np.newaxis]
+        low = np.where(descend, child_low, low)
+        high = np.where(descend, child_high, high)
+    return low, high
+
+
+def expand_levels(
+        occupancy: np.ndarray,
+        lo: np.ndarray,
+        hi: np.ndarray
+):
+    """
+    Walks a breadth first occupancy stream one level at a time, deriving the
+    bounds of every node from its parent's occupancy. The stream may be
+    truncated, the last level is then only partly yielded.
+    :param occupancy: uint8 occupancy bytes in breadth first order
+    :param lo: (3,) lower bounds of the root region
+    :param hi: (3,) upper bounds of the root region
+    :return: generator of (offset, occupancy, lo, hi) per level, where offset
+        is the position of the level's first node in the stream
+    """
+    occupancy = np.asarray(occupancy, dtype=np.uint8)
+    low = np.asarray(lo, dtype=np.int64).reshape(1, 3)
+    high = np.asarray(hi, dtype=np.int64).reshape(1, 3)
+    offset = 0
+    while len(low) > 0 and offset < len(occupancy):
+        occ = occupancy[offset:offset + len(low)]
+        yield offset, occ, low[:len(occ)], high[:len(occ)]
+        bits = np.unpackbits(occ[:, np.newaxis], axis=1, bitorder='little')
+        parent, octant = np.nonzero(bits)
+        offset += len(low)
+        low, high = child_bounds(low[parent], high[parent], octant)
+
+
+def level_offsets(occupancy: np.ndarray) -> np.ndarray:
+    """
+    Position of the first node of every level in a breadth first occupancy
+    stream, with the length of the stream appended
+    """
+    occupancy = np.asarray(occupancy, dtype=np.uint8)
+    offsets = [0]
+    end = min(1, len(occupancy))
+    while end > offsets[-1]:
+        children = int(np.unpackbits(occupancy[offsets[-1]:end]).sum())
+        offsets.append(end)
+        end = min(end + children, len(occupancy))
+    return np.array(offsets, dtype=np.int64)
+
+
+def dft_order(occupancy: np.ndarray) -> np.ndarray:
+    """
+    Breadth first positions of the nodes in depth first (pre-order) order,
+    derived from the occupancy stream alone, one level at a time.
+    :param occupancy: complete uint8 occupancy stream in breadth first order
+    :return: int64 array, occupancy[dft_order(occupancy)] is the depth first
+        occupancy stream
+    """
+    occupancy = np.asarray(occupancy, dtype=np.uint8)
+    count = len(occupancy)
+    bits = np.unpackbits(occupancy[:, np.newaxis], axis=1, bitorder='little')
+    parent = np.nonzero(bits)[0][:max(count - 1, 0)]
+    offsets = level_offsets(occupancy)
+
+    # subtree sizes, bottom up
+    size = np.ones(count, dtype=np.int64)
+    for start, end in zip(offsets[-2:0:-1], offsets[:0:-1]):
+        np.add.at(size, parent[start - 1:end - 1], size[start:end])
+
+    # a child follows its parent and the subtrees of its earlier siblings
+    pre = np.zeros(count, dtype=np.int64)
+    for start, end in zip(offsets[1:-1], offsets[2:]):
+        parents = parent[start - 1:end - 1]
+        before = np.cumsum(size[start:end]) - size[start:end]
+        first = np.concatenate(([True], parents[1:] != parents[:-1]))
+        before -= np.maximum.accumulate(np.where(first, before, 0))
+        pre[start:end] = pre[parents] + 1 + before
+
+    order = np.empty(count, dtype=np.int64)
+    order[pre] = np.arange(count)
+    return order
+
+
+def _collapsed(
+        keys: np.ndarray,
+        start: np.ndarray,
+        length: np.ndarray,
+        level: int,
+        depth: int,
+        lo: np.ndarray,
+        hi: np.ndarray
+) -> np.ndarray:
+    """
+    Flags the nodes of one level whose region is a single cell. Only a node
+    holding one repeated key can be one, so only those nodes are descended.
+    """
+    collapsed = np.zeros(len(start), dtype=bool)
+    if level >= depth:
+        collapsed[:] = True
+        return collapsed
+    last = start + np.maximum(length, 1) - 1
+    candidates = np.flatnonzero(
+        (length > 1) & (keys[start] == keys[last])
+    ) if len(keys) > 0 else np.zeros(0, dtype=np.int64)
+    if len(candidates) > 0:
+        low, high = node_bounds(keys[start[candidates]], level, depth, lo, hi)
+        collapsed[candidates] = np.all(high - low <= 1, axis=1)
+    return collapsed
+
+
+def build_nodes(
+        keys: np.ndarray,
+        depth: int,
+        lo: np.ndarray,
+        hi: np.ndarray,
+        weights: np.ndarray = None,
+        dropped: int = 0,
+        root_level: int = 0,
+        max_level: Union[int, None] = None,
+        capacity: int = 1
+) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+    """
+    Derives every node of the tree from sorted octant keys, level by level.
+    Regions are split until they hold capacity points or fewer or collapse to
+    a single cell.
+    :param keys: sorted uint64 keys of the points inside the root region
+    :param depth: depth the keys were computed with
+    :param lo: (3,) lower bounds of the root region
+    :param hi: (3,) upper bounds of the root region
+    :param weights: optional number of points behind each key, used when
+        duplicate keys have been merged
+    :param dropped: points that fall outside of the root region. They still
+        count towards the root, as they do in build_tree
+    :param root_level: level of the first node, to build the subtree of a
+        node from its keys alone. lo and hi stay the bounds of the tree's root
+    :param max_level: stop at this level, its nodes are returned with an
+        occupancy of 0
+    :param capacity: most points a leaf holds before it is split
+    :return: tuple of arrays in breadth first order
+        (occupancy, level, start, length) where start and length are the run
+        of each node in keys
+    """
+    n_keys = len(keys)
+    if weights is None:
+        cumulative = np.arange(n_keys + 1, dtype=np.int64)
+    else:
+        cumulative = np.concatenate(([0], np.cumsum(weights, dtype=np.int64)))
+
+    occupancy = []
+    levels = []
+    starts = []
+    lengths = []
+
+    start = np.zeros(1, dtype=np.int64)
+    length = np.array([n_keys], dtype=np.int64)
+    count = np.array([cumulative[-1] + dropped], dtype=np.int64)
+    # positions in keys of the nodes of the current level, in order
+    positions = np.arange(n_keys, dtype=np.int64)
+
+    level = root_level
+    while len(start) > 0:
+        collapsed = _collapsed(keys, start, length, level, depth, lo, hi)
+        split = (count > capacity) & (length > 0) & ~collapsed
+        if level == max_level:
+            split[:] = False
+        occ = np.zeros(len(start), dtype=np.uint8)
+        if not np.all(split):
+            positions = positions[np.repeat(split, length)]
+
+        if len(positions) > 0:
+            parents = np.flatnonzero(split)
+            shift = np.uint64(3 * (depth - level - 1))
+            prefix = keys[positions] >> shift
+            first = np.concatenate(
+                ([0], np.flatnonzero(prefix[1:] != prefix[:-1]) + 1)
+            )
+            child_prefix = prefix[first]
+            octant = (child_prefix & np.uint64(7)).astype(np.int64)
+
+            # children of the same parent share the rest of the prefix
+            parent_prefix = child_prefix >> np.uint64(3)
+            parent_of_child = np.concatenate(
+                ([0], np.cumsum(parent_prefix[1:] != parent_prefix[:-1]))
+            )
+            occ[parents] = np.bincount(
+                parent_of_child,
+                weights=np.left_shift(1, octant),
+                minlength=len(parents)
+            ).astype(np.uint8)
+
+            child_start = positions[first]
+            child_length = np.diff(np.append(first, len(positions)))
+            child_count = cumulative[child_start + child_length] - \
+                cumulative[child_start]
+        else:
+            child_start = np.zeros(0, dtype=np.int64)
+            child_length = child_start
+            child_count = child_start
+
+        occupancy.append(occ)
+        levels.append(np.full(len(start), level, dtype=np.uint8))
+        starts.append(start)
+        lengths.append(length)
+
+        start, length, count = child_start, child_length, child_count
+        level += 1
+
+    return (
+        np.concatenate(occupancy),
+        np.concatenate(levels),
+        np.concatenate(starts),
+        np.concatenate(lengths)
+    )
+
+
+def build(
+        points: np.ndarray,
+        bounds,
+        weights: np.ndarray = None,
+        dropped: int = 0,
+        max_level: Union[int, None] = None,
+        capacity: int = 1
+) -> (np.ndarray, tuple):
+    """
+    Builds the tree of a point cloud that has already been scaled to bounds.
+    :param points: (N, 3+) array of points
+    :param bounds: Region of the root node
+    :param weights: optional number of points each row stands for
+    :param dropped: points already known to be outside of the bounds
+    :param max_level: deepest level of the tree, see build_nodes
+    :param capacity: most points a leaf holds, see build_nodes
+    :return: tuple of (order, nodes) where order sorts the points inside the
+        bounds by key and nodes is the result of build_nodes
+    """
+    lo, hi = root_bounds(bounds)
+    depth = key_depth(lo, hi)
+    keys, inside = octant_keys(points, lo, hi, depth)
+    order = np.argsort(keys, kind='stable')
+    index = np.flatnonzero(inside)[order]
+    if weights is None:
+        dropped += len(points) - len(keys)
+    else:
+        weights = np.asarray(weights)
+        dropped += int(weights.sum() - weights[index].sum())
+        weights = weights[index]
+    nodes = build_nodes(
+        keys[order], depth, lo, hi, weights=weights, dropped=dropped,
+        max_level=max_level, capacity=capacity
+    )
+    return index, nodes
@@ -0,0 +1,200 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Builds the subtrees below a split level in a process pool.
+
+The parent computes the octant keys and groups them by their first
+split_depth octants, which is a cheap 16 bit radix sort. Each group is the
+subtree of one node at split_depth, the workers sort their groups and derive
+the subtree nodes with morton.build_nodes. Keys and point indices are handed
+over in shared memory and sorted there in place, so no points are pickled.
+The parent derives the levels above split_depth and interleaves the subtrees
+level by level, which gives the same breadth first order as a serial build.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Union
+
+import numpy as np
+
+from elementree.lidar.octree import morton
+
+# groups have to fit in an uint16 for the radix sort
+MAX_SPLIT_DEPTH: int = 5
+
+
+def _share(array: np.ndarray) -> (shared_memory.SharedMemory, np.ndarray):
+    memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)
+    shared[...] = array
+    return memory, shared
+
+
+def _subtrees(
+        names: tuple,
+        size: int,
+        groups: list[tuple[int, int]],
+        depth: int,
+        lo: np.ndarray,
+        hi: np.ndarray,
+        split_depth: int,
+        max_level: Union[int, None] = None,
+        capacity: int = 1
+) -> list[tuple]:
+    """
+    Worker: sorts the keys of each group in place and builds its subtree
+    :return: list of (group start, nodes) with starts relative to all keys
+    """
+    memories = [shared_memory.SharedMemory(name=name) for name in names if name]
+    try:
+        keys = np.ndarray(size, dtype=np.uint64, buffer=memories[0].buf)
+        index = np.ndarray(size, dtype=np.int64, buffer=memories[1].buf)
+        weights = np.ndarray(size, dtype=np.int64, buffer=memories[2].buf) \
+            if len(memories) > 2 else None
+
+        results = []
+        for start, end in groups:
+            order = np.argsort(keys[start:end], kind='stable')
+            keys[start:end] = keys[start:end][order]
+            index[start:end] = index[start:end][order]
+            group_weights = None
+            if weights is not None:
+                weights[start:end] = weights[start:end][order]
+                group_weights = weights[start:end]
+            occupancy, level, node_start, length = morton.build_nodes(
+                keys[start:end], depth, lo, hi, weights=group_weights,
+                root_level=split_depth, max_level=max_level, capacity=capacity
+            )
+            results.append(
+                (start, (occupancy, level, node_start + start, length))
+            )
+        return results
+    finally:
+        del keys, index, weights
+        for memory in memories:
+            memory.close()
+
+
+def _batches(
+        starts: np.ndarray,
+        ends: np.ndarray,
+        count: int
+) -> list[list[tuple[int, int]]]:
+    """
+    Splits the groups into count batches of about the same number of keys
+    """
+    total = max(int(ends[-1]) if len(ends) else 0, 1)
+    batch = np.minimum(starts * count // total, count - 1)
+    batches = [[] for _ in range(count)]
+    for start, end, i in zip(starts.tolist(), ends.tolist(), batch.tolist()):
+        batches[i].append((start, end))
+    return [b for b in batches if b]
+
+
+def build(
+        points: np.ndarray,
+        bounds,
+        weights: np.ndarray = None,
+        dropped: int = 0,
+        workers: int = 2,
+        split_depth: int = 2,
+        executor: Union[ProcessPoolExecutor, None] = None,
+        max_level: Union[int, None] = None,
+        capacity: int = 1
+) -> (np.ndarray, tuple):
+    """
+    Parallel version of morton.build, same arguments and result
+    :param workers: processes in the pool
+    :param split_depth: level whose nodes are the roots of the subtrees
+        handed out to the workers, up to MAX_SPLIT_DEPTH
+    :param executor: pool to reuse, one is created for the call otherwise
+    :param max_level: deepest level of the tree, at or above split_depth the
+        tree is built serially
+    :param capacity: most points a leaf holds, see morton.build_nodes
+    """
+    if not 1 <= split_depth <= MAX_SPLIT_DEPTH:
+        raise ValueError(f'split_depth must be in [1, {MAX_SPLIT_DEPTH}]')
+    lo, hi = morton.root_bounds(bounds)
+    depth = morton.key_depth(lo, hi)
+    if depth <= split_depth or (
+            max_level is not None and max_level <= split_depth):
+        return morton.build(points, bounds, weights=weights, dropped=dropped,
+                            max_level=max_level, capacity=capacity)
+
+    keys, inside = morton.octant_keys(points, lo, hi, depth)
+    if weights is None:
+        dropped += len(points) - len(keys)
+    else:
+        weights = np.asarray(weights, dtype=np.int64)
+        dropped += int(weights.sum() - weights[inside].sum())
+        weights = weights[inside]
+
+    group = (keys >> np.uint64(3 * (depth - split_depth))).astype(np.uint16)
+    order = np.argsort(group, kind='stable')
+    bounds_of_groups = np.cumsum(np.bincount(group, minlength=8 ** split_depth))
+    ends = bounds_of_groups[bounds_of_groups > 0]
+    ends = np.unique(ends)
+    starts = np.concatenate(([0], ends[:-1]))
+
+    shared = [
+        _share(keys[order]),
+        _share(np.flatnonzero(inside)[order])
+    ]
+    if weights is not None:
+        shared.append(_share(weights[order]))
+    names = tuple(memory.name for memory, _ in shared)
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [
+            executor.submit(
+                _subtrees, names, len(keys), batch, depth, lo, hi, split_depth,
+                max_level, capacity
+            )
+            for batch in _batches(starts, ends, workers * 4)
+        ]
+        subtrees = dict(
+            result for future in futures for result in future.result()
+        )
+
+        sorted_keys = shared[0][1].copy()
+        index = shared[1][1].copy()
+        sorted_weights = shared[2][1].copy() if weights is not None else None
+    finally:
+        if own_executor:
+            executor.shutdown()
+        for memory, array in shared:
+            del array
+            memory.close()
+            memory.unlink()
+        del shared
+
+    top = morton.build_nodes(
+        sorted_keys, depth, lo, hi, weights=sorted_weights, dropped=dropped,
+        max_level=split_depth, capacity=capacity
+    )
+    # swap every node of the split level for its subtree
+    parts = [[array[top[1] < split_depth]] for array in top]
+    for start in top[2][top[1] == split_depth].tolist():
+        for part, array in zip(parts, subtrees[start]):
+            part.append(array)
+    nodes = tuple(np.concatenate(part) for part in parts)
+    bft = np.argsort(nodes[1], kind='stable')
+    return index, tuple(array[bft] for array in nodes)
@@ -0,0 +1,207 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+On disk format of a built tree, loaded back with memory mapping.
+
+The file is a fixed size header followed by the node and point arrays of a
+LinearOctree, each starting on a 64 byte boundary:
+
+    header      magic, version, flags, levels, bounds, transform, sizes,
+                dtypes of the index and point arrays
+    occupancy   uint8 per node, breadth first
+    level       uint8 per node
+    first_child index dtype per node, position of the node's first child
+    point_start index dtype per node
+    point_count index dtype per node
+    order       int64 per point, original index of every buffer row
+    points      (points, columns) point buffer, if saved
+    weights     per point, if the tree has them
+
+Everything is little endian. The loader maps the arrays read only, so the
+pages a traversal or query touches are the only ones read from disk.
+"""
+import struct
+
+import numpy as np
+
+from elementree import utils
+from elementree.lidar.octree import cfg
+
+from elementree.lidar.octree.LinearOctree import LinearOctree
+from elementree.lidar.octree.Region import Region
+
+MAGIC: bytes = b'ETOC'
+VERSION: int = 1
+
+# magic, version, flags, levels, bounds (x, y, z min then max), transform
+# offset and scale, node count, point count, point columns, index dtype,
+# point dtype, weights dtype
+HEADER = struct.Struct('<4sHHi6q3d3dQQI8s8s8s')
+
+HAS_POINTS: int = 1
+HAS_WEIGHTS: int = 2
+HAS_TRANSFORM: int = 4
+
+ALIGN: int = 64
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGN) * ALIGN
+
+
+def _layout(
+        flags: int,
+        nodes: int,
+        points: int,
+        columns: int,
+        index: np.dtype,
+        point: np.dtype,
+        weight: np.dtype
+) -> list[(str, int, np.dtype, tuple)]:
+    """
+    (name, offset, dtype, shape) of every array stored in the file
+    """
+    arrays = [
+        ('occupancy', np.dtype(np.uint8), (nodes,)),
+        ('level', np.dtype(np.uint8), (nodes,)),
+        ('first_child', index, (nodes,)),
+        ('point_start', index, (nodes,)),
+        ('point_count', index, (nodes,)),
+        ('order', np.dtype('<i8'), (points,)),
+    ]
+    if flags & HAS_POINTS:
+        arrays.append(('points', point, (points, columns)))
+    if flags & HAS_WEIGHTS:
+        arrays.append(('weights', weight, (points,)))
+    layout = []
+    offset = _aligned(HEADER.size)
+    for name, dtype, shape in arrays:
+        layout.append((name, offset, dtype, shape))
+        offset = _aligned(offset + dtype.itemsize * int(np.prod(shape)))
+    return layout
+
+
+def to_linear(tree) -> LinearOctree:
+    """
+    LinearOctree holding the nodes of tree. An Octree built without
+    vectorized=True is converted by building the same tree from its points.
+    """
+    if isinstance(tree, LinearOctree):
+        return tree
+    if tree._linear is not None:
+        return tree._linear
+    linear = LinearOctree(np.asarray(tree.points), tree.bounds)
+    merged = tree._counts is not None or (
+        tree._store is not None and tree._store[2] is not None)
+    # merging again keeps the counts as weights without splitting on them
+    linear.build_tree(
+        max_depth=tree._max_depth, capacity=tree._capacity,
+        weights=np.asarray(tree.counts, dtype=np.int64) if merged else None,
+        merge_duplicates=merged
+    )
+    return LinearOctree.from_arrays(
+        tree.bounds, linear.occupancy, linear.first_child, linear.level,
+        linear.point_start, linear.point_count, linear.points,
+        np.asarray(tree.indices, dtype=np.int64)[linear.order],
+        weights=linear.weights, transform=tree.transform,
+        levels=None if tree._max is None else int(tree._max + 1).bit_length() - 1
+    )
+
+
+def save(tree, path: str, points: bool = True):
+    """
+    Writes a built tree to path
+    :param tree: a built LinearOctree or Octree
+    :param path: file to write
+    :param points: store the point buffer, without it the loaded tree can be
+        traversed but not queried
+    """
+    tree = to_linear(tree)
+    lo = [tree.bounds[cfg.X_MIN], tree.bounds[cfg.Y_MIN], tree.bounds[cfg.Z_MIN]]
+    hi = [tree.bounds[cfg.X_MAX], tree.bounds[cfg.Y_MAX], tree.bounds[cfg.Z_MAX]]
+    transform = tree.transform
+    flags = (HAS_POINTS if points else 0) | \
+        (HAS_WEIGHTS if tree.weights is not None else 0) | \
+        (HAS_TRANSFORM if transform is not None else 0)
+    buffer = tree.points
+    columns = buffer.shape[1] if buffer.ndim == 2 else 0
+    index = tree.first_child.dtype.newbyteorder('<')
+    point = buffer.dtype.newbyteorder('<')
+    weight = (np.dtype(np.int64) if tree.weights is None
+              else tree.weights.dtype).newbyteorder('<')
+
+    header = HEADER.pack(
+        MAGIC, VERSION, flags, -1 if tree.levels is None else tree.levels,
+        *[int(v) for v in lo + hi],
+        *(np.zeros(3) if transform is None else transform.offset).tolist(),
+        *(np.zeros(3) if transform is None else transform.scale).tolist(),
+        len(tree), len(tree.order), columns,
+        index.str.encode(), point.str.encode(), weight.str.encode()
+    )
+    with open(path, 'wb') as file:
+        file.write(header)
+        for name, offset, dtype, _ in _layout(
+                flags, len(tree), len(tree.order), columns, index, point, weight
+        ):
+            file.write(b'\0' * (offset - file.tell()))
+            np.ascontiguousarray(getattr(tree, name), dtype=dtype).tofile(file)
+
+
+def load(path: str, mmap: bool = True) -> LinearOctree:
+    """
+    Reads a tree written by save
+    :param path: file to read
+    :param mmap: map the arrays read only instead of reading them into
+        memory
+    :return: the tree as a LinearOctree
+    """
+    with open(path, 'rb') as file:
+        fields = HEADER.unpack(file.read(HEADER.size))
+    magic, version, flags, levels = fields[:4]
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not a saved tree')
+    if version != VERSION:
+        raise ValueError(f'unsupported tree file version {version}')
+    x_min, y_min, z_min, x_max, y_max, z_max = fields[4:10]
+    offset, scale = fields[10:13], fields[13:16]
+    nodes, count, columns = fields[16:19]
+    index, point, weight = (np.dtype(f.rstrip(b'\0').decode()) for f in fields[19:22])
+
+    arrays = {}
+    for name, start, dtype, shape in _layout(
+            flags, nodes, count, columns, index, point, weight
+    ):
+        if mmap:
+            arrays[name] = np.memmap(
+                path, dtype=dtype, mode='r', offset=start, shape=shape
+            )
+        else:
+            arrays[name] = np.fromfile(
+                path, dtype=dtype, count=int(np.prod(shape)), offset=start
+            ).reshape(shape)
+    if 'points' not in arrays:
+        arrays['points'] = np.zeros((count, 0), dtype=point)
+
+    return LinearOctree.from_arrays(
+        Region(x_max=x_max, y_max=y_max, z_max=z_max,
+               x_min=x_min, y_min=y_min, z_min=z_min),
+        transform=utils.Transform(np.array(offset), np.array(scale))
+        if flags & HAS_TRANSFORM else None,
+        levels=None if levels < 0 else levels,
+        **arrays
+    )
@@ -0,0 +1,172 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""
+Readers for point cloud files that map the file instead of parsing it.
+
+Every reader returns a read only np.memmap over the point data of the file,
+so opening a file costs the header parse and nothing else, and the pages
+are read when the points are first used, e.g. by Octree.setup. KITTI .bin
+scans are (N, 4) float32 arrays, binary PCD and PLY files are structured
+arrays with one field per property. columns() turns the x, y, z (and
+intensity) fields into an (N, 3+) view of the same memory.
+"""
+from typing import BinaryIO, Sequence
+
+import numpy as np
+from numpy.lib import recfunctions
+
+# PCD TYPE and SIZE -> numpy type character
+_PCD_TYPES: dict[tuple[str, int], str] = {
+    ('F', 4): 'f4', ('F', 8): 'f8',
+    ('I', 1): 'i1', ('I', 2): 'i2', ('I', 4): 'i4', ('I', 8): 'i8',
+    ('U', 1): 'u1', ('U', 2): 'u2', ('U', 4): 'u4', ('U', 8): 'u8',
+}
+
+# PLY property type -> numpy type character
+_PLY_TYPES: dict[str, str] = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8',
+}
+
+
+def _header(file: BinaryIO, last: str) -> list[list[str]]:
+    """
+    Words of the header lines of file up to the line starting with last,
+    leaving file at the first byte of the data
+    """
+    lines = []
+    while True:
+        line = file.readline()
+        if not line:
+            raise ValueError(f'header ends before {last}')
+        words = line.decode('ascii').split()
+        if words and not words[0].startswith('#'):
+            lines.append(words)
+            if words[0] == last:
+                return lines
+
+
+def read_bin(
+        path: str,
+        columns: int = 4,
+        dtype: np.dtype = np.float32
+) -> np.ndarray:
+    """
+    Points of a raw binary file of dtype values, columns values per point,
+    such as a KITTI velodyne scan of x, y, z, reflectance float32
+    :param path: file to map
+    :param columns: values per point
+    :param dtype: value type
+    :return: (N, columns) read only memmap
+    """
+    return np.memmap(path, dtype=dtype, mode='r').reshape(-1, columns)
+
+
+def read_pcd(path: str) -> np.ndarray:
+    """
+    Points of a PCD file with DATA binary. ascii and binary_compressed files
+    have no fixed layout to map and are rejected.
+    :param path: file to map
+    :return: (N,) read only structured memmap, one field per PCD field
+    """
+    with open(path, 'rb') as file:
+        header = {words[0]: words[1:] for words in _header(file, 'DATA')}
+        offset = file.tell()
+    if header['DATA'][0] != 'binary':
+        raise ValueError(f'PCD DATA {header["DATA"][0]} can not be mapped')
+    fields = header['FIELDS']
+    counts = header.get('COUNT', ['1'] * len(fields))
+    dtype = np.dtype([
+        (name, '<' + _PCD_TYPES[(kind, int(size))], (int(count),))
+        if int(count) > 1 else (name, '<' + _PCD_TYPES[(kind, int(size))])
+        for name, kind, size, count in zip(
+            fields, header['TYPE'], header['SIZE'], counts)
+    ])
+    points = int(header['POINTS'][0]) if 'POINTS' in header else \
+        int(header['WIDTH'][0]) * int(header['HEIGHT'][0])
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset,
+                     shape=(points,))
+
+
+def read_ply(path: str) -> np.ndarray:
+    """
+    Vertices of a binary little endian PLY file. Elements before the
+    vertices are skipped, they and the vertices can not have list
+    properties.
+    :param path: file to map
+    :return: (N,) read only structured memmap, one field per vertex property
+    """
+    with open(path, 'rb') as file:
+        if file.readline().strip() != b'ply':
+            raise ValueError(f'{path} is not a PLY file')
+        header = _header(file, 'end_header')
+        offset = file.tell()
+    elements = []
+    for words in header:
+        if words[0] == 'format' and words[1] != 'binary_little_endian':
+            raise ValueError(f'PLY format {words[1]} can not be mapped')
+        if words[0] == 'element':
+            elements.append((words[1], int(words[2]), []))
+        elif words[0] == 'property':
+            if words[1] == 'list':
+                raise ValueError('PLY list properties can not be mapped')
+            elements[-1][2].append((words[2], '<' + _PLY_TYPES[words[1]]))
+    for name, count, properties in elements:
+        dtype = np.dtype(properties)
+        if name == 'vertex':
+            return np.memmap(path, dtype=dtype, mode='r', offset=offset,
+                             shape=(count,))
+        offset += count * dtype.itemsize
+    raise ValueError(f'{path} has no vertex element')
+
+
+def columns(
+        cloud: np.ndarray,
+        names: Sequence[str] = ('x', 'y', 'z', 'intensity')
+) -> np.ndarray:
+    """
+    (N, len(names)) array of the named fields of a structured point cloud,
+    names the cloud does not have are left out. It is a view of the cloud
+    when the fields are of one type and evenly spaced, as x, y, z and
+    intensity are in PCD and PLY files written by PCL or Open3D, and a copy
+    otherwise.
+    :param cloud: structured array, e.g. from read_pcd or read_ply
+    :param names: fields to take, in order
+    :return: (N, k) array
+    """
+    names = [name for name in names if name in cloud.dtype.names]
+    return recfunctions.structured_to_unstructured(cloud[names], copy=False)
+
+
+def read(path: str) -> np.ndarray:
+    """
+    x, y, z and intensity, when the file has it, of a .bin, .pcd or .ply
+    file, mapped as the readers above do
+    :param path: file to map, the type is taken from the suffix
+    :return: (N, 3+) array
+    """
+    suffix = str(path).rsplit('.', 1)[-1].lower()
+    if suffix == 'bin':
+        return read_bin(path)
+    if suffix == 'pcd':
+        return columns(read_pcd(path))
+    if suffix == 'ply':
+        return columns(read_ply(path))
+    raise ValueError(f'unknown point cloud file type .{suffix}')
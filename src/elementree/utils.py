@@ -15,6 +15,8 @@
 #      You should have received a copy of the GNU General Public License
 #      along with this program.  If not, see <https://www.gnu.org/licenses/>.
 # ------------------------------------------------------------------------------
+from typing import Union
+
 import numpy as np
 
 
@@ -37,26 +39,163 @@ def scale_to_range(
         np.ndarray, np.float32
 ):
     """
-    TODO
-    :param to_max:
-    :param to_min:
-    :param array:
-    :return:
+    Scales the values of array in place from their own range to
+    [to_min, to_max], truncated to integers
+    :param to_max: new max value
+    :param to_min: new min value
+    :param array: values to be scaled
+    :return: the scaled array and the scaling factor used
     """
     from_min = np.min(array)
     from_max = np.max(array)
 
-    scale_factor = scaling_factor(
+    scale_factor = _scaling_factor(
         from_min=from_min,
         from_max=from_max,
         to_max=to_max,
         to_min=to_min
     )
-    for i in range(len(array)):
-        array[i] = int(scale_factor * (array[i] - from_min))
+    # rows of a 2d array scale in the array's own precision, the elements of
+    # a 1d array are scalars and scale in double precision
+    dtype = _compute_dtype(array) if array.ndim > 1 else np.dtype(np.float64)
+    array[...] = np.trunc(
+        dtype.type(scale_factor) * (array - from_min).astype(dtype)
+    )
     return array, scale_factor
 
 
+def _compute_dtype(array: np.ndarray) -> np.dtype:
+    """
+    Type scaling happens in, float arrays keep their precision as they would
+    when multiplied by a scalar
+    """
+    if np.issubdtype(array.dtype, np.floating):
+        return array.dtype
+    return np.dtype(np.float64)
+
+
+def _scaling_factor(from_max, from_min, to_max, to_min) -> np.float32:
+    # a single value has no range to scale, it is moved to zero
+    if from_max == from_min:
+        return np.float64(0)
+    return scaling_factor(
+        from_max=from_max, from_min=from_min, to_max=to_max, to_min=to_min
+    )
+
+
+class Transform:
+    """
+    Per axis quantization of points, q = int(scale * (p - offset)), as done by
+    scale_to_range on each axis. Keeps the offset and scale so that more
+    points can be quantized the same way and quantized points mapped back.
+    """
+
+    def __init__(self, offset: np.ndarray, scale: np.ndarray):
+        self._offset: np.ndarray = np.asarray(offset)
+        self._scale: np.ndarray = np.asarray(scale, dtype=np.float64)
+
+    @classmethod
+    def from_bounds(
+            cls,
+            from_max: np.ndarray,
+            from_min: np.ndarray,
+            to_max: np.float32,
+            to_min: np.float32
+    ) -> 'Transform':
+        """
+        Transform taking the (3,) bounds from_min, from_max to
+        [to_min, to_max] on every axis
+        """
+        scale = [
+            _scaling_factor(from_max=from_max[i], from_min=from_min[i],
+                            to_max=to_max, to_min=to_min)
+            for i in range(3)
+        ]
+        return cls(from_min, scale)
+
+    def apply(
+            self,
+            points: np.ndarray,
+            out: np.ndarray = None,
+            dtype: np.dtype = None
+    ) -> np.ndarray:
+        """
+        Quantizes the x, y, z columns of points
+        :param points: (N, 3+) array
+        :param out: optional array to write the (N, 3) result to, may be a
+            slice of points to work in place
+        :param dtype: float type to compute in, by default the precision of
+            points
+        :return: (N, 3) int64 array, or out
+        """
+        coords = points[:, :3]
+        if dtype is not None:
+            coords = coords.astype(dtype)
+        dtype = _compute_dtype(coords)
+        scaled = np.trunc(
+            self._scale.astype(dtype) * (coords - self._offset.astype(
+                coords.dtype
+            ))
+        )
+        if out is None:
+            return scaled.astype(np.int64)
+        out[...] = scaled
+        return out
+
+    def invert(self, coords: np.ndarray) -> np.ndarray:
+        """
+        Maps quantized coordinates back to the original space. Axes with no
+        range map back to their offset.
+        :param coords: (N, 3) quantized coordinates
+        :return: (N, 3) float64 coordinates
+        """
+        scale = np.where(self._scale == 0, np.inf, self._scale)
+        return np.asarray(coords, dtype=np.float64) / scale + self._offset
+
+    @property
+    def offset(self) -> np.ndarray:
+        return self._offset
+
+    @property
+    def scale(self) -> np.ndarray:
+        return self._scale
+
+
+def quantize(
+        points: np.ndarray,
+        to_max: np.float32,
+        to_min: np.float32,
+        inplace: bool = False,
+        dtype: np.dtype = None
+) -> (np.ndarray, Transform):
+    """
+    Scales the x, y, z columns of a point cloud to [to_min, to_max] in one
+    pass, each axis from its own range as scale_to_range does.
+    :param points: (N, 3+) array, extra columns are carried over untouched
+    :param to_max: new max value
+    :param to_min: new min value
+    :param inplace: write the result into points instead of a copy, points
+        must be a writable array that can hold the integers, e.g. float32
+    :param dtype: float type to compute in, by default the precision of
+        points. Octree scales the Python floats of its point list, which is
+        float64
+    :return: tuple of (scaled points, Transform used)
+    """
+    points = np.asarray(points)
+    if len(points) == 0:
+        transform = Transform(np.zeros(3), np.zeros(3))
+    else:
+        from_max = np.max(points[:, :3], axis=0)
+        from_min = np.min(points[:, :3], axis=0)
+        if dtype is not None:
+            from_max, from_min = from_max.astype(dtype), from_min.astype(dtype)
+        transform = Transform.from_bounds(from_max, from_min, to_max, to_min)
+    if not inplace:
+        points = points.copy()
+    transform.apply(points, out=points[:, :3], dtype=dtype)
+    return points, transform
+
+
 def scaling_factor(
         from_max: np.float32,
         from_min: np.float32,
@@ -87,3 +226,95 @@ def downscale(coord: int, i: int) -> int:
     """
     coord = coord >> i
     return coord << i
+
+
+def voxelize(
+        points: np.ndarray,
+        levels: int,
+        depth: int,
+        counts: bool = False,
+        column: Union[int, None] = None,
+        transform: Union[Transform, None] = None
+):
+    """
+    Occupied voxels of a point cloud at one depth of the tree, without
+    building it. The points are quantized as Octree.setup(levels) does and
+    downscaled to cells of 2 ** (levels - depth) on every axis, the distinct
+    cells are found by sorting one integer key per point.
+
+    The cells are the power of two grid at that depth, the nodes of a built
+    tree split at the center of [0, 2 ** levels - 1] instead and line up
+    with it only at depth levels. Points on the upper bounds are kept.
+    :param points: (N, 3+) array of points
+    :param levels: number of levels of the tree, as passed to setup
+    :param depth: depth of the voxels, in [0, levels]
+    :param counts: also return the number of points in every voxel
+    :param column: also return the mean of this column in every voxel
+    :param transform: quantize with this Transform, e.g. the transform of an
+        existing tree, instead of the bounds of the points. Points that
+        land outside of [0, 2 ** levels) are dropped
+    :return: (M, 3) int64 lower corners of the voxels in the quantized
+        coordinates, sorted by x, y, then z. With counts or column a tuple,
+        followed by the (M,) int64 counts and then the (M,) float64 means
+    """
+    # the key packs the three coordinates into the 63 bits of an int64
+    if not 0 <= levels <= 21:
+        raise ValueError('levels must be in [0, 21]')
+    if not 0 <= depth <= levels:
+        raise ValueError(f'depth must be in [0, {levels}]')
+    points = np.asarray(points)
+    if transform is None:
+        coords, _ = quantize(
+            points[:, :3], (2 ** levels) - 1, 0, dtype=np.float64
+        )
+        coords = coords.astype(np.int64)
+    else:
+        coords = transform.apply(points, dtype=np.float64)
+        inside = np.all((coords >= 0) & (coords < 2 ** levels), axis=1)
+        if not np.all(inside):
+            points, coords = points[inside], coords[inside]
+    corners = downscale(coords, levels - depth)
+    side = np.int64(1) << levels
+    keys = (corners[:, 0] * side + corners[:, 1]) * side + corners[:, 2]
+    keys, inverse, number = np.unique(
+        keys, return_inverse=True, return_counts=True
+    )
+    voxels = np.empty((len(keys), 3), dtype=np.int64)
+    voxels[:, 2] = keys % side
+    voxels[:, 1] = (keys // side) % side
+    voxels[:, 0] = keys // (side * side)
+    if not counts and column is None:
+        return voxels
+    result = [voxels]
+    if counts:
+        result.append(number.astype(np.int64))
+    if column is not None:
+        result.append(np.bincount(
+            inverse.reshape(-1), weights=points[:, column],
+            minlength=len(keys)
+        ) / number)
+    return tuple(result)
+
+
+def ranges(start: np.ndarray, count: np.ndarray) -> np.ndarray:
+    """
+    Concatenation of arange(start[i], start[i] + count[i]) for every i
+    """
+    ends = np.cumsum(count)
+    return np.repeat(start - ends + count, count) + np.arange(ends[-1] if len(ends) else 0)
+
+
+def min_distance(point: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """
+    Squared distance from each point to the closest point of each box
+    """
+    gap = np.maximum(lo - point, 0) + np.maximum(point - hi, 0)
+    return np.einsum('ij,ij->i', gap, gap)
+
+
+def max_distance(point: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """
+    Squared distance from each point to the farthest corner of each box
+    """
+    gap = np.maximum(np.abs(point - lo), np.abs(point - hi))
+    return np.einsum('ij,ij->i', gap, gap)
@@ -0,0 +1,77 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import unittest
+import numpy as np
+
+
+class TestAttributes(unittest.TestCase):
+    def setUp(self):
+        from elementree.lidar.octree.LinearOctree import LinearOctree
+        from elementree.lidar.octree.Region import Region
+        rng = np.random.default_rng(13)
+        self.array = rng.uniform(-50, 50, size=(2000, 4)).astype(np.float32)
+        self.array[:, 3] = 0.5 + 0.4 * np.sin(self.array[:, 0] / 50)
+        self.tree = LinearOctree(self.array.copy(), Region(1, 1, 1, 0, 0, 0))
+        self.tree.setup(10)
+        self.tree.build_tree()
+
+    def _quantized(self, values, bits):
+        low, high = values.min(), values.max()
+        top = (1 << bits) - 1
+        return low + np.rint((values - low) * top / (high - low)) * (high - low) / top
+
+    def test_leaf_attributes(self):
+        from elementree.lidar.octree import attributes
+        from elementree.lidar.octree import codec
+        values = attributes.leaf_attributes(self.tree)
+        self.assertEqual(len(codec.leaf_centers(self.tree.occupancy, 10)), len(values))
+        leaf = np.flatnonzero(self.tree.occupancy == 0)[0]
+        start = self.tree.point_start[leaf]
+        points = self.tree.points[start:start + self.tree.point_count[leaf]]
+        self.assertAlmostEqual(float(np.mean(points[:, 3])), values[0])
+
+    def test_leaf_attributes_of_octree(self):
+        from elementree.lidar.octree import attributes
+        from elementree.lidar.octree.Octree import Octree
+        from elementree.lidar.octree.Region import Region
+        tree = Octree(self.array.copy(), Region(1, 1, 1, 0, 0, 0))
+        tree.setup(10)
+        tree.build_tree()
+        np.testing.assert_allclose(
+            attributes.leaf_attributes(self.tree), attributes.leaf_attributes(tree)
+        )
+
+    def test_round_trip(self):
+        from elementree.lidar.octree import attributes
+        values = attributes.leaf_attributes(self.tree)
+        for bits in (4, 8, 12):
+            data = attributes.encode(self.tree, bits=bits)
+            decoded = attributes.decode(data, self.tree.occupancy)
+            np.testing.assert_allclose(self._quantized(values, bits), decoded)
+
+    def test_smooth_attribute_compresses(self):
+        from elementree.lidar.octree import attributes
+        data = attributes.encode(self.tree)
+        self.assertLess(len(data), len(self.array))
+
+    def test_single_leaf(self):
+        from elementree.lidar.octree import attributes
+        occupancy = np.zeros(1, dtype=np.uint8)
+        data = attributes.encode_attributes(occupancy, [0.25])
+        np.testing.assert_allclose([0.25], attributes.decode(data, occupancy))
@@ -0,0 +1,76 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import os
+import tempfile
+import unittest
+import numpy as np
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        from elementree.lidar.octree.Octree import Octree
+        from elementree.lidar.octree.Region import Region
+        rng = np.random.default_rng(23)
+        self.frames = [
+            rng.uniform(-50, 50, size=(size, 4)).astype(np.float32)
+            for size in (800, 1200, 500, 1000)
+        ]
+        self.expected = []
+        for frame in self.frames:
+            tree = Octree(frame, Region(1, 1, 1, 0, 0, 0))
+            tree.setup(10)
+            tree.build_tree()
+            self.expected.append(bytes(tree.bft()))
+        self.directory = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i, frame in enumerate(self.frames):
+            path = os.path.join(self.directory.name, f'{i:06d}.bin')
+            frame.tofile(path)
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_serial(self):
+        from elementree.lidar.octree import batch
+        copies = [frame.copy() for frame in self.frames]
+        result = list(batch.encode_frames(iter(self.frames), 10, workers=1))
+        self.assertEqual(self.expected, result)
+        for frame, copy in zip(self.frames, copies):
+            np.testing.assert_array_equal(copy, frame)
+
+    def test_files_in_pool(self):
+        from elementree.lidar.octree import batch
+        result = list(batch.encode_frames(
+            self.paths, 10, workers=2, max_in_flight=2
+        ))
+        self.assertEqual(self.expected, result)
+
+    def test_npy_file(self):
+        from elementree.lidar.octree import batch
+        path = os.path.join(self.directory.name, 'frame.npy')
+        np.save(path, self.frames[1])
+        self.assertEqual(self.expected[1], batch.encode_frame(path, 10))
+
+    def test_compress(self):
+        from elementree.lidar.octree import batch, codec
+        data = next(batch.encode_frames(self.paths, 10, workers=1, compress=True))
+        self.assertEqual(
+            self.expected[0], codec.decode_occupancy(data).tobytes()
+        )
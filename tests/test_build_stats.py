@@ -0,0 +1,110 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import unittest
+import numpy as np
+
+
+class TestBuildStats(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(19)
+        self.array = rng.uniform(-50, 50, size=(500, 4)).astype(np.float32)
+
+    def _tree(self, stats):
+        from elementree.lidar.octree.Octree import Octree
+        from elementree.lidar.octree.Region import Region
+        tree = Octree(self.array.copy(), Region(1, 1, 1, 0, 0, 0))
+        tree.stats = stats
+        tree.setup(12)
+        return tree
+
+    def test_object_build(self):
+        from elementree.lidar.octree.BuildStats import BuildStats
+        tree = self._tree(BuildStats())
+        tree.build_tree()
+        occupancy = tree.bft()
+        stats = tree.stats
+        self.assertEqual(
+            {'scale', 'regions', 'bucketing', 'children', 'build_tree'},
+            set(stats.timings)
+        )
+        self.assertEqual(len(occupancy), sum(stats.nodes_per_level))
+        self.assertEqual(1, stats.nodes_per_level[0])
+        self.assertEqual(len(stats.nodes_per_level) - 1, stats.max_depth)
+        self.assertEqual(occupancy.count(0), sum(stats.points_per_leaf.values()))
+        self.assertEqual(len(occupancy), stats.bytes_emitted)
+
+    def test_vectorized_build_matches(self):
+        from elementree.lidar.octree.BuildStats import BuildStats
+        reference = self._tree(BuildStats())
+        reference.build_tree()
+        tree = self._tree(BuildStats())
+        tree.build_tree(vectorized=True)
+        list(tree.iter_dft(batch_size=100))
+        self.assertEqual(reference.stats.nodes_per_level, tree.stats.nodes_per_level)
+        self.assertEqual(reference.stats.points_per_leaf, tree.stats.points_per_leaf)
+        self.assertEqual(reference.stats.max_depth, tree.stats.max_depth)
+        self.assertEqual(sum(tree.stats.nodes_per_level), tree.stats.bytes_emitted)
+
+    def test_callback(self):
+        from elementree.lidar.octree.BuildStats import BuildStats
+        reports = []
+        tree = self._tree(BuildStats(callback=lambda s: reports.append(s.as_dict())))
+        tree.build_tree()
+        self.assertEqual(1, len(reports))
+        self.assertIn('build_tree', reports[0]['timings'])
+
+    def test_lazy_build_finishes_on_expand(self):
+        from elementree.lidar.octree.BuildStats import BuildStats
+        reference = self._tree(BuildStats())
+        reference.build_tree()
+        reports = []
+        tree = self._tree(BuildStats(callback=lambda s: reports.append(s.as_dict())))
+        tree.build_tree(lazy=True)
+        self.assertEqual([], reports)
+        tree.expand()
+        self.assertEqual(1, len(reports))
+        self.assertEqual(reference.stats.nodes_per_level,
+                         reports[0]['nodes_per_level'])
+        tree.expand()
+        self.assertEqual(1, len(reports))
+
+    def test_lazy_build_finishes_on_first_use(self):
+        from elementree.lidar.octree.BuildStats import BuildStats
+        reference = self._tree(BuildStats())
+        reference.build_tree()
+        for use in ('bft', 'knn'):
+            reports = []
+            tree = self._tree(BuildStats(callback=lambda s: reports.append(s.as_dict())))
+            tree.build_tree(lazy=True)
+            if use == 'bft':
+                self.assertEqual(reference.bft(), tree.bft())
+            else:
+                tree.knn(np.zeros(3), len(self.array))
+            self.assertEqual(1, len(reports))
+            self.assertEqual(reference.stats.nodes_per_level,
+                             reports[0]['nodes_per_level'])
+            self.assertGreater(reports[0]['timings']['build_tree'], 0)
+            tree.expand()
+            self.assertEqual(1, len(reports))
+
+    def test_off_by_default(self):
+        tree = self._tree(None)
+        tree.build_tree()
+        self.assertIsNone(tree.stats)
+        self.assertIsNone(tree.children[0].stats if tree.children[0] else None)
@@ -0,0 +1,80 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import unittest
+import numpy as np
+
+
+class TestCodec(unittest.TestCase):
+    def setUp(self):
+        from elementree.lidar.octree.LinearOctree import LinearOctree
+        from elementree.lidar.octree.Region import Region
+        rng = np.random.default_rng(11)
+        self.tree = LinearOctree(rng.normal(size=(2000, 4)),
+                                 Region(1, 1, 1, 0, 0, 0))
+        self.tree.setup(10)
+        self.tree.build_tree()
+
+    def test_range_coder_round_trip(self):
+        from elementree.lidar.octree.codec import RangeEncoder, RangeDecoder, PROB_INIT
+        rng = np.random.default_rng(0)
+        bits = (rng.random(5000) < 0.1).astype(int).tolist()
+        probs = [PROB_INIT] * 4
+        encoder = RangeEncoder()
+        for i, bit in enumerate(bits):
+            encoder.encode_bit(probs, i % 4, bit)
+        data = encoder.finish()
+        self.assertLess(len(data), len(bits) // 8)
+        probs = [PROB_INIT] * 4
+        decoder = RangeDecoder(data)
+        self.assertEqual(bits, [decoder.decode_bit(probs, i % 4) for i in range(5000)])
+
+    def test_occupancy_round_trip(self):
+        from elementree.lidar.octree import codec
+        data = codec.encode(self.tree)
+        self.assertLess(len(data), len(self.tree.occupancy))
+        np.testing.assert_array_equal(self.tree.occupancy, codec.decode_occupancy(data))
+
+    def test_encode_octree(self):
+        from elementree.lidar.octree import codec
+        from elementree.lidar.octree.Octree import Octree
+        tree = Octree(self.tree.points, self.tree.bounds)
+        tree.build_tree()
+        self.assertEqual(codec.encode(self.tree), codec.encode(tree))
+
+    def test_contexts(self):
+        from elementree.lidar.octree.codec import contexts
+        # root with octants 1 and 3, the first child has octant 0
+        ctx = contexts(np.array([10, 1, 0, 0], dtype=np.uint8))
+        self.assertEqual([0, 81, 83, 8], ctx.tolist())
+
+    def test_decode_points(self):
+        from elementree.lidar.octree import codec, morton
+        points = codec.decode(codec.encode(self.tree), 10)
+        self.assertEqual(int(np.sum(self.tree.occupancy == 0)), len(points))
+        # the decoded points come out in the breadth first order of the leaves,
+        # each within its leaf of the point it stands for
+        leaves = np.flatnonzero(self.tree.occupancy == 0)
+        originals = self.tree.points[self.tree.point_start[leaves], :3]
+        widths = [hi[occ == 0] - lo[occ == 0] for _, occ, lo, hi in
+                  morton.expand_levels(self.tree.occupancy, np.zeros(3), np.full(3, 1023))]
+        self.assertTrue(np.all(np.abs(originals - points) < np.concatenate(widths)))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=3)
@@ -0,0 +1,110 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+import unittest
+from collections import deque
+import numpy as np
+
+
+class TestContext(unittest.TestCase):
+    def setUp(self):
+        from elementree.lidar.octree.Octree import Octree
+        from elementree.lidar.octree.Region import Region
+        rng = np.random.default_rng(25)
+        self.array = rng.uniform(-50, 50, size=(400, 4))
+        self.tree = Octree(self.array, Region(1, 1, 1, 0, 0, 0))
+        self.tree.setup(6)
+        self.tree.build_tree()
+
+    def _reference(self, radius):
+        # the features read off the Octree objects one node at a time
+        from elementree.lidar.octree import morton
+        rows = []
+        nodes = deque([(self.tree, None, (0, 0, 0), 8)])
+        grid = {}
+        while nodes:
+            node, parent, position, octant = nodes.popleft()
+            rows.append((node, parent, position, octant))
+            grid[(node.level, position)] = node
+            for i, child in enumerate(node.children):
+                if child:
+                    bits = morton.OCTANT_BITS[i].tolist()
+                    nodes.append((child, node, tuple(
+                        2 * p + b for p, b in zip(position, bits)), i))
+        steps = range(-radius, radius + 1)
+        offsets = [(x, y, z) for x in steps for y in steps for z in steps]
+        expected = {name: [] for name in ('occupancy', 'level', 'octant',
+                                          'position', 'parent', 'siblings',
+                                          'neighbours', 'present')}
+        for node, parent, position, octant in rows:
+            expected['occupancy'].append(int(node.occupancy))
+            expected['level'].append(node.level)
+            expected['octant'].append(octant)
+            expected['position'].append(position)
+            expected['parent'].append(0 if parent is None else int(parent.occupancy))
+            expected['siblings'].append(
+                [0] * 8 if parent is None else
+                [0 if c is None else int(c.occupancy) for c in parent.children])
+            around = [grid.get((node.level, tuple(
+                p + o for p, o in zip(position, offset)))) for offset in offsets]
+            expected['neighbours'].append(
+                [0 if n is None else int(n.occupancy) for n in around])
+            expected['present'].append([n is not None for n in around])
+        return expected
+
+    def test_features_match_the_node_objects(self):
+        from elementree.lidar.octree import context
+        for radius in (1, 2):
+            found = context.features(self.tree, radius=radius)
+            expected = self._reference(radius)
+            self.assertEqual(set(context.FIELDS), set(found))
+            for name in context.FIELDS:
+                np.testing.assert_array_equal(found[name],
+                                              np.array(expected[name]), name)
+            self.assertEqual((len(found['level']), (2 * radius + 1) ** 3),
+                             found['neighbours'].shape)
+            self.assertTrue(found['neighbours'].flags.c_contiguous)
+
+    def test_stream_and_levels(self):
+        from elementree.lidar.octree import context
+        found = context.features(self.tree)
+        stream = context.features(self.tree.bft())
+        for name in context.FIELDS:
+            np.testing.assert_array_equal(found[name], stream[name])
+        np.testing.assert_array_equal(found['occupancy'], self.tree.bft())
+
+        levels = list(context.iter_levels(self.tree))
+        self.assertEqual([1], [len(level['level']) for level in levels][:1])
+        top = context.features(self.tree, max_level=2)
+        count = sum(len(level['level']) for level in levels[:3])
+        np.testing.assert_array_equal(top['neighbours'],
+                                      found['neighbours'][:count])
+
+    def test_no_levels(self):
+        from elementree.lidar.octree import context
+        found = context.features(self.tree, radius=2)
+        for empty in (context.features(b'', radius=2),
+                      context.features(self.tree, radius=2, max_level=-1)):
+            self.assertEqual(set(context.FIELDS), set(empty))
+            for name in context.FIELDS:
+                self.assertEqual(0, len(empty[name]))
+                self.assertEqual(found[name].dtype, empty[name].dtype)
+                self.assertEqual(found[name].shape[1:], empty[name].shape[1:])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+import unittest
+import numpy as np
+
+
+class TestDiff(unittest.TestCase):
+    def setUp(self):
+        from elementree.lidar.octree.Region import Region
+        rng = np.random.default_rng(5)
+        self.region = Region(1023, 1023, 1023, 0, 0, 0)
+        self.a = rng.integers(0, 1023, size=(3000, 4)).astype(np.float64)
+        self.b = self.a.copy()
+        self.b[:40, :3] = rng.integers(0, 1023, size=(40, 3))
+        self.b = np.concatenate((self.b[5:], rng.integers(0, 1023, (20, 4))))
+
+    def _tree(self, points):
+        from elementree.lidar.octree.LinearOctree import LinearOctree
+        tree = LinearOctree(points, self.region)
+        tree.build_tree()
+        return tree
+
+    def _cells(self, points, depth):
+        from elementree.lidar.octree import morton
+        lo, hi = morton.root_bounds(self.region)
+        keys, _ = morton.octant_keys(points, lo, hi, 10)
+        return np.unique(keys >> np.uint64(3 * (10 - depth)))
+
+    def _corners(self, cells, depth):
+        from elementree.lidar.octree import morton
+        lo, hi = morton.root_bounds(self.region)
+        return morton.node_bounds(
+            cells << np.uint64(3 * (10 - depth)), depth, 10, lo, hi
+        )[0]
+
+    def test_matches_cell_sets(self):
+        from elementree.lidar.octree import diff
+        tree_a, tree_b = self._tree(self.a), self._tree(self.b)
+        for depth in (10, 6, 2):
+            added, removed = diff.diff(tree_a, tree_b, depth)
+            cells_a, cells_b = self._cells(self.a, depth), self._cells(self.b, depth)
+            np.testing.assert_array_equal(
+                self._corners(np.setdiff1d(cells_b, cells_a), depth), added)
+            np.testing.assert_array_equal(
+                self._corners(np.setdiff1d(cells_a, cells_b), depth), removed)
+
+    def test_identical_trees(self):
+        from elementree.lidar.octree import diff
+        added, removed = diff.diff(self._tree(self.a), self._tree(self.a[::-1]))
+        self.assertEqual((0, 3), added.shape)
+        self.assertEqual((0, 3), removed.shape)
+
+    def test_leaf_point_moved_inside_leaf(self):
+        from elementree.lidar.octree import diff
+        a = np.array([[1, 1, 1, 0], [900, 900, 900, 0]], dtype=np.float64)
+        b = np.array([[2, 1, 1, 0], [900, 900, 900, 0]], dtype=np.float64)
+        tree_a, tree_b = self._tree(a), self._tree(b)
+        self.assertEqual(tree_a.bft(), tree_b.bft())
+        added, removed = diff.diff(tree_a, tree_b)
+        self.assertEqual([[2, 1, 1]], added.tolist())
+        self.assertEqual([[1, 1, 1]], removed.tolist())
+
+    def test_xor_round_trip(self):
+        from elementree.lidar.octree import diff
+        tree_a, tree_b = self._tree(self.a), self._tree(self.b)
+        *_, xor = diff.diff(tree_a, tree_b, xor=True)
+        self.assertEqual(tree_b.bft(), diff.apply_xor(tree_a.occupancy, xor).tolist())
+        self.assertEqual(tree_a.bft(), diff.apply_xor(tree_b.occupancy, xor).tolist())
+        self.assertFalse(np.any(diff.xor_occupancy(tree_a, tree_a)))
+
+    def test_object_trees(self):
+        from elementree.lidar.octree import diff
+        from elementree.lidar.octree.Octree import Octree
+        trees = []
+        for points in (self.a[:300], self.b[:300]):
+            tree = Octree(points, self.region)
+            tree.build_tree()
+            trees.append(tree)
+        added, removed = diff.diff(*trees, depth=8)
+        expected, _ = diff.diff(self._tree(self.a[:300]),
+                                self._tree(self.b[:300]), depth=8)
+        np.testing.assert_array_equal(expected, added)
+
+    def test_different_bounds_rejected(self):
+        from elementree.lidar.octree import diff
+        from elementree.lidar.octree.LinearOctree import LinearOctree
+        from elementree.lidar.octree.Region import Region
+        other = LinearOctree(self.a, Region(511, 511, 511, 0, 0, 0))
+        other.build_tree()
+        with self.assertRaises(ValueError):
+            diff.diff(self._tree(self.a), other)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=3)
@@ -0,0 +1,82 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import unittest
+import numpy as np
+
+
+class TestLinearOctree(unittest.TestCase):
+    def setUp(self):
+        from elementree.lidar.octree.LinearOctree import LinearOctree
+        from elementree.lidar.octree.Octree import Octree
+        from elementree.lidar.octree.Region import Region
+        rng = np.random.default_rng(3)
+        self.array = rng.normal(size=(300, 4))
+        region = Region(x_max=1, x_min=0, y_max=1, y_min=0, z_max=1, z_min=0)
+        self.octree = Octree(self.array.copy(), region)
+        self.octree.setup(10)
+        self.octree.build_tree()
+        self.tree = LinearOctree(self.array.copy(), region)
+        self.tree.setup(10)
+        self.tree.build_tree()
+
+    def _assert_same(self, node, view):
+        for key in ('x_min', 'x_max', 'y_min', 'y_max', 'z_min', 'z_max'):
+            self.assertEqual(node.bounds[key], view.bounds[key])
+        self.assertEqual(node.occupancy, view.occupancy)
+        self.assertEqual(node.level, view.level)
+        self.assertEqual(node.octant, view.octant)
+        for child, child_view in zip(node.children, view.children):
+            self.assertEqual(child is None, child_view is None)
+            if child is not None:
+                self._assert_same(child, child_view)
+
+    def test_breadth_first_traversal(self):
+        self.assertEqual(self.octree.bft(), self.tree.bft())
+
+    def test_views_match_octree_nodes(self):
+        self._assert_same(self.octree, self.tree.root)
+
+    def test_node_by_index(self):
+        view = self.tree.root.children[0].children[1]
+        node = self.tree.node(view.index)
+        self.assertEqual(view, node)
+        self.assertEqual(view.bounds['x_min'], node.bounds['x_min'])
+        self.assertEqual(view.octant, node.octant)
+
+    def test_leaf_points_are_ranges_of_buffer(self):
+        from elementree.lidar.octree.LinearOctree import POPCOUNT
+        leaves = np.flatnonzero(self.tree.occupancy == 0)
+        self.assertEqual(len(self.tree.points), self.tree.point_count[leaves].sum())
+        children = POPCOUNT[self.tree.occupancy].sum()
+        self.assertEqual(len(self.tree) - 1, children)
+
+    def test_vectorized_octree_children(self):
+        from elementree.lidar.octree.Octree import Octree
+        tree = Octree(self.array.copy(), self.octree.bounds)
+        tree.setup(10)
+        tree.build_tree(vectorized=True)
+        self.assertEqual(self.octree.occupancy, tree.occupancy)
+        for child, child_view in zip(self.octree.children, tree.children):
+            self.assertEqual(child is None, child_view is None)
+            if child is not None:
+                self._assert_same(child, child_view)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=3)
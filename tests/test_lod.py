@@ -0,0 +1,90 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import unittest
+import numpy as np
+
+
+class TestLevelOfDetail(unittest.TestCase):
+    def setUp(self):
+        from elementree.lidar.octree.Octree import Octree
+        from elementree.lidar.octree.Region import Region
+        rng = np.random.default_rng(11)
+        array = rng.uniform(-50, 50, size=(3000, 4)).astype(np.float32)
+        tree = Octree(array, Region(1, 1, 1, 0, 0, 0))
+        tree.setup(12)
+        tree.build_tree(vectorized=True)
+        self.occupancy = np.array(tree.bft(), dtype=np.uint8)
+
+    def _sorted(self, points):
+        return points[np.lexsort(points.T[::-1])]
+
+    def test_full_depth_matches_leaf_centers(self):
+        from elementree.lidar.octree import codec
+        from elementree.lidar.octree import lod
+        np.testing.assert_array_equal(
+            self._sorted(lod.level_of_detail(self.occupancy, 12)),
+            self._sorted(codec.leaf_centers(self.occupancy, 12))
+        )
+
+    def test_coarse_levels(self):
+        from elementree.lidar.octree import lod
+        np.testing.assert_array_equal(
+            [[2047, 2047, 2047]], lod.level_of_detail(self.occupancy, 12, 0)
+        )
+        self.assertEqual(
+            bin(self.occupancy[0]).count('1'),
+            len(lod.level_of_detail(self.occupancy, 12, 1))
+        )
+        sizes = [len(lod.level_of_detail(self.occupancy, 12, d)) for d in range(8)]
+        self.assertEqual(sizes, sorted(sizes))
+
+    def test_truncated_stream(self):
+        from elementree.lidar.octree import lod
+        # every node of level 3 is known from the bytes of levels 0 to 2
+        end = 1 + bin(self.occupancy[0]).count('1')
+        end += int(np.unpackbits(self.occupancy[1:end]).sum())
+        np.testing.assert_array_equal(
+            lod.level_of_detail(self.occupancy, 12, 3),
+            lod.level_of_detail(self.occupancy[:end], 12)
+        )
+        partial = lod.level_of_detail(self.occupancy[:end + 5], 12)
+        self.assertGreater(len(partial), len(lod.level_of_detail(self.occupancy, 12, 3)))
+
+    def test_progressive_decoder(self):
+        from elementree.lidar.octree import lod
+        decoder = lod.ProgressiveDecoder(12)
+        seen = []
+        for chunk in np.array_split(self.occupancy, 9):
+            for level, points in decoder.feed(chunk.tobytes()):
+                seen.append(level)
+                np.testing.assert_array_equal(
+                    lod.level_of_detail(self.occupancy, 12, level), points
+                )
+        self.assertTrue(decoder.done)
+        self.assertEqual(list(range(1, decoder.level + 1)), seen)
+
+    def test_progressive_decoder_ignoring_results(self):
+        from elementree.lidar.octree import lod
+        decoder = lod.ProgressiveDecoder(12)
+        for chunk in np.array_split(self.occupancy, 9):
+            decoder.feed(chunk.tobytes())
+        self.assertTrue(decoder.done)
+        np.testing.assert_array_equal(
+            lod.level_of_detail(self.occupancy, 12), decoder.points
+        )
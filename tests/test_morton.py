@@ -0,0 +1,81 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import unittest
+import numpy as np
+
+
+class TestMorton(unittest.TestCase):
+    def setUp(self):
+        from elementree.lidar.octree.Region import Region
+        rng = np.random.default_rng(7)
+        self.array = rng.normal(size=(500, 4))
+        self.region = Region(x_max=1, x_min=0, y_max=1, y_min=0, z_max=1, z_min=0)
+
+    def _tree(self, levels):
+        from elementree.lidar.octree.Octree import Octree
+        tree = Octree(self.array.copy(), self.region)
+        tree.setup(levels)
+        return tree
+
+    def test_octant_tables_are_inverse(self):
+        from elementree.lidar.octree import morton
+        codes = (morton.OCTANT_BITS[:, 0] << 2) | \
+            (morton.OCTANT_BITS[:, 1] << 1) | morton.OCTANT_BITS[:, 2]
+        self.assertEqual(list(range(8)), morton.OCTANT_INDEX[codes].tolist())
+
+    def test_key_depth(self):
+        from elementree.lidar.octree import morton
+        self.assertEqual(8, morton.key_depth(np.zeros(3), np.full(3, 255)))
+        self.assertEqual(8, morton.key_depth(np.zeros(3), np.full(3, 256)))
+        self.assertEqual(0, morton.key_depth(np.zeros(3), np.ones(3)))
+
+    def test_matches_object_build(self):
+        for levels in (8, 10, 12):
+            tree = self._tree(levels)
+            tree.build_tree()
+            vectorized = self._tree(levels)
+            vectorized.build_tree(vectorized=True)
+            self.assertEqual(tree.bft(), vectorized.bft())
+
+    def test_order_sorts_points_by_key(self):
+        from elementree.lidar.octree import morton
+        tree = self._tree(10)
+        points = np.asarray(tree._points)
+        order, nodes = morton.build(points, tree.bounds)
+        lo, hi = morton.root_bounds(tree.bounds)
+        keys, _ = morton.octant_keys(points[order], lo, hi, 10)
+        self.assertTrue(np.all(keys[1:] >= keys[:-1]))
+        self.assertEqual(len(nodes[0]), len(nodes[2]))
+
+    def test_duplicates_stop_at_single_cell(self):
+        from elementree.lidar.octree import morton
+        from elementree.lidar.octree.Region import Region
+        points = np.array([[3, 3, 3, 0], [3, 3, 3, 1]])
+        _, nodes = morton.build(points, Region(7, 7, 7, 0, 0, 0))
+        self.assertEqual([1, 32, 32, 0], nodes[0].tolist())
+
+    def test_negative_bounds_rejected(self):
+        from elementree.lidar.octree import morton
+        from elementree.lidar.octree.Region import Region
+        with self.assertRaises(ValueError):
+            morton.build(self.array, Region(5, 5, 5, -5, -5, -5))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=3)
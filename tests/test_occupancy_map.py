@@ -0,0 +1,104 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+import unittest
+import numpy as np
+
+
+class TestOccupancyMap(unittest.TestCase):
+    def setUp(self):
+        from elementree.lidar.octree.OccupancyMap import OccupancyMap
+        from elementree.lidar.octree.Region import Region
+        self.map = OccupancyMap(5, Region(32, 32, 32, 0, 0, 0))
+        self.hit = np.log(0.7 / 0.3)
+        self.miss = np.log(0.4 / 0.6)
+
+    def test_ray_marks_free_and_hit(self):
+        self.map.insert_scan(np.array([[10.5, 1.5, 1.5]]), [0.5, 1.5, 1.5])
+        depth, corners, values = self.map.leaves()
+        self.assertEqual(list(range(11)), sorted(corners[:, 0].tolist()))
+        values = self.map.log_odds(np.array([[10.2, 1.2, 1.9], [4.5, 1.5, 1.5],
+                                             [20, 20, 20], [-1, 0, 0]]))
+        np.testing.assert_allclose([self.hit, self.miss, 0, 0], values, rtol=1e-6)
+
+    def test_diagonal_ray_steps_through_faces(self):
+        self.map.insert_scan(np.array([[3.5, 2.2, 0.5]]), [0.5, 0.5, 0.5])
+        _, corners, values = self.map.leaves()
+        free = [tuple(c) for c, v in zip(corners.tolist(), values) if v < 0]
+        self.assertEqual({(0, 0, 0), (1, 0, 0), (1, 1, 0), (2, 1, 0),
+                          (3, 1, 0)}, set(free))
+        for a, b in zip(sorted(free), sorted(free)[1:]):
+            self.assertEqual(1, sum(abs(x - y) for x, y in zip(a, b)))
+
+    def test_one_update_per_cell_per_scan(self):
+        points = np.array([[5.5, 5.5, 5.5], [5.2, 5.7, 5.1], [9.5, 5.5, 5.5]])
+        self.map.insert_scan(points, [0.5, 5.5, 5.5])
+        values = self.map.log_odds(points)
+        np.testing.assert_allclose([self.hit, self.hit, self.hit], values,
+                                   rtol=1e-6)
+        self.assertEqual(1, self.map.scans)
+
+    def test_prune_and_expand(self):
+        from elementree.lidar.octree.OccupancyMap import OccupancyMap
+        from elementree.lidar.octree.Region import Region
+        grid = np.stack(np.meshgrid(*[np.arange(4)] * 3, indexing='ij'),
+                        -1).reshape(-1, 3) + 0.5
+        for _ in range(10):
+            self.map.insert_scan(grid, [0.5, 0.5, 0.5])
+        # every cell of the 4 x 4 x 4 block is an end point, hits win over
+        # the misses of the rays crossing it and all clamp to the same value
+        depth, corners, values = self.map.leaves()
+        self.assertEqual([3], depth.tolist())
+        self.assertEqual([[0, 0, 0]], corners.tolist())
+        top = np.log(0.97 / 0.03)
+        np.testing.assert_allclose(top, self.map.log_odds(grid), rtol=1e-6)
+
+        self.map.insert_scan(np.array([[2.5, 2.5, 2.5]]), [9.5, 9.5, 9.5])
+        self.assertAlmostEqual(
+            top, self.map.log_odds(np.array([[0.5, 0.5, 0.5]]))[0], places=5)
+        self.assertLess(3, len(self.map))
+
+        # one cell taking another hit splits the block down to it
+        unclamped = OccupancyMap(5, Region(32, 32, 32, 0, 0, 0),
+                                 clamp=(0.001, 0.999))
+        unclamped.insert_scan(grid, [0.5, 0.5, 0.5])
+        self.assertEqual(1, len(unclamped))
+        unclamped.insert_scan(grid[:1], [0.5, 0.5, 0.5])
+        self.assertEqual(7 + 8, len(unclamped))
+        np.testing.assert_allclose(
+            [2 * self.hit, self.hit], unclamped.log_odds(grid[:2]), rtol=1e-6)
+
+    def test_max_range(self):
+        from elementree.lidar.octree.OccupancyMap import OccupancyMap
+        from elementree.lidar.octree.Region import Region
+        limited = OccupancyMap(5, Region(32, 32, 32, 0, 0, 0), max_range=5)
+        limited.insert_scan(np.array([[20.5, 0.5, 0.5], [3.5, 0.5, 0.5]]),
+                            [0.5, 0.5, 0.5])
+        values = limited.log_odds(np.array([[20.5, 0.5, 0.5], [3.5, 0.5, 0.5],
+                                            [2.5, 0.5, 0.5], [7, 0.5, 0.5]]))
+        np.testing.assert_allclose([0, self.hit, self.miss, 0], values,
+                                   rtol=1e-6)
+
+    def test_occupied(self):
+        self.map.insert_scan(np.array([[10.5, 1.5, 1.5]]), [0.5, 1.5, 1.5])
+        centres, sizes = self.map.occupied()
+        self.assertEqual([[10.5, 1.5, 1.5]], centres.tolist())
+        self.assertEqual([1.0], sizes.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=3)
@@ -100,15 +100,252 @@ class TestOctree(unittest.TestCase):
         ]
         self.assertEqual(test_occupancy, occupancy)
 
-    @unittest.skip("Not Implemented Yet")
     def test_depth_first_traversal(self):
+        self.tree.setup(8)
+        self.tree.build_tree()
         occupancy = self.tree.dft()
         test_occupancy = [
-            243, 40, 0, 20, 0, 0, 180, 0, 0, 3, 0, 0, 0, 64, 18, 0, 0, 142, 24,
-            0, 0, 0, 0, 0, 194, 0, 0, 0, 66, 160, 0, 0, 0
+            206, 45, 0, 0, 132, 0, 0, 0, 0, 232, 0, 0, 0, 0, 3, 0, 0, 66, 0, 0
         ]
         self.assertEqual(test_occupancy, occupancy)
 
+    def test_depth_first_traversal_deeper_than_recursion_limit(self):
+        import sys
+        from elementree.lidar.octree import Octree as oc
+        node = self.tree
+        for _ in range(sys.getrecursionlimit() + 10):
+            node.children[0] = oc.Octree([], self.region, _level=node.level + 1)
+            node.occupancy = 1
+            node = node.children[0]
+        occupancy = self.tree.dft()
+        self.assertEqual(sys.getrecursionlimit() + 11, len(occupancy))
+
+    def test_traversal_generators(self):
+        self.tree.setup(8)
+        self.tree.build_tree()
+        self.assertEqual(self.tree.bft(), list(self.tree.iter_bft()))
+        batches = list(self.tree.iter_dft(batch_size=6))
+        self.assertEqual([6, 6, 6, 2], [len(batch) for batch in batches])
+        self.assertEqual(self.tree.dft(), np.concatenate(batches).tolist())
+
+    def test_vectorized_traversals(self):
+        from elementree.lidar.octree import Octree as oc
+        vectorized = oc.Octree(self.array, self.region)
+        vectorized.setup(8)
+        vectorized.build_tree(vectorized=True)
+        self.tree.setup(8)
+        self.tree.build_tree()
+        self.assertEqual(self.tree.dft(), vectorized.dft())
+        self.assertEqual(self.tree.bft(),
+                         np.concatenate(list(vectorized.iter_bft(batch_size=7))).tolist())
+        self.assertEqual(self.tree.dft(), list(vectorized.iter_dft()))
+
+    def _rebuilt(self, points):
+        from elementree.lidar.octree import Octree as oc
+        from elementree.lidar.octree import Region as rg
+        tree = oc.Octree(points, rg.Region(255, 255, 255, 0, 0, 0))
+        tree.build_tree()
+        return tree
+
+    def test_insert(self):
+        self.tree.setup(8)
+        points = list(self.tree._points)
+        self.tree.build_tree()
+        for point in ([10, 20, 30, 0], [200, 100, 50, 0], [11, 20, 30, 0]):
+            index = self.tree.insert(point)
+            self.assertEqual(len(points), index)
+            points.append(point)
+            self.assertEqual(self._rebuilt(points).bft(), self.tree.bft())
+
+    def test_delete_and_move(self):
+        self.tree.setup(8)
+        points = list(self.tree._points)
+        self.tree.build_tree()
+        self.assertEqual(points[4], self.tree.delete(4))
+        self.tree.move(7, [128, 128, 128, 0])
+        remaining = [p for i, p in enumerate(points) if i not in (4, 7)]
+        remaining.append([128, 128, 128, 0])
+        self.assertEqual(self._rebuilt(remaining).bft(), self.tree.bft())
+        for index in range(len(points)):
+            if index != 4:
+                self.tree.delete(index)
+        self.assertEqual([0], self.tree.bft())
+
+    def test_pop_changes(self):
+        self.tree.setup(8)
+        self.tree.build_tree()
+        self.assertEqual([], self.tree.pop_changes())
+        index = self.tree.insert([1, 1, 1, 0])
+        changes = self.tree.pop_changes()
+        self.assertEqual((0, (0, 0, 0), self.tree.occupancy), changes[0])
+        self.assertTrue(all(occupancy is not None for *_, occupancy in changes))
+        self.tree.delete(index)
+        inserted = {change[:2] for change in changes}
+        removed = [change[:2] for change in self.tree.pop_changes()
+                   if change[2] is None]
+        self.assertTrue(removed)
+        self.assertTrue(inserted.issuperset(removed))
+        self.assertEqual([], self.tree.pop_changes())
+
+    def test_stopping_criteria(self):
+        from elementree.lidar.octree import Octree as oc
+        for options in ({'capacity': 3}, {'max_depth': 2},
+                        {'capacity': 2, 'max_depth': 3}):
+            tree = oc.Octree(self.array, self.region)
+            tree.setup(8)
+            tree.build_tree(**options)
+            vectorized = oc.Octree(self.array, self.region)
+            vectorized.setup(8)
+            vectorized.build_tree(vectorized=True, **options)
+            self.assertEqual(vectorized.bft(), tree.bft())
+            leaves = [node for node in tree._leaves(lambda lo, hi: True)]
+            self.assertTrue(all(
+                len(node.points) <= options.get('capacity', 1) or
+                node.level == options['max_depth'] for node in leaves
+            ))
+            # points on the upper bounds stay at the root only
+            inside = [i for node in leaves for i in node.indices]
+            self.assertEqual(len(set(inside)), len(inside))
+            self.assertLess(len(self.array) - 8, len(inside))
+        with self.assertRaises(ValueError):
+            self.tree.build_tree(capacity=0)
+
+    def test_array_partition_matches_list_partition(self):
+        from elementree.lidar.octree import Octree as oc
+        from elementree.lidar.octree import Region as rg
+        rng = np.random.default_rng(3)
+        array = rng.integers(0, 300, size=(2000, 4))
+        array[:50] = 255
+        trees = []
+        vectorize = oc._VECTORIZE
+        try:
+            for threshold in (len(array) + 1, 16):
+                oc._VECTORIZE = threshold
+                tree = oc.Octree(array, rg.Region(256, 256, 256, 0, 0, 0))
+                tree.build_tree(capacity=2, max_depth=12)
+                trees.append(tree)
+        finally:
+            oc._VECTORIZE = vectorize
+        self.assertEqual(trees[0].bft(), trees[1].bft())
+        self.assertEqual(trees[0].indices, trees[1].indices)
+
+    def test_duplicates_stop_at_single_cell(self):
+        from elementree.lidar.octree import Octree as oc
+        array = np.concatenate((self.array, self.array[:3]))
+        tree = oc.Octree(array, self.region)
+        tree.setup(8)
+        tree.build_tree()
+        vectorized = oc.Octree(array, self.region)
+        vectorized.setup(8)
+        vectorized.build_tree(vectorized=True)
+        self.assertEqual(vectorized.bft(), tree.bft())
+
+    def test_merge_duplicates(self):
+        from elementree.lidar.octree import Octree as oc
+        array = np.concatenate((self.array, self.array[:3], self.array[:1]))
+        tree = oc.Octree(array, self.region)
+        tree.setup(8)
+        tree.build_tree(merge_duplicates=True)
+        self.tree.setup(8)
+        self.tree.build_tree()
+        self.assertEqual(self.tree.bft(), tree.bft())
+        self.assertEqual(sorted(self.tree.indices), sorted(tree.indices))
+        self.assertEqual(len(array), sum(tree.counts))
+        self.assertEqual(3, dict(zip(tree.indices, tree.counts))[0])
+
+        vectorized = oc.Octree(array, self.region)
+        vectorized.setup(8)
+        vectorized.build_tree(vectorized=True, merge_duplicates=True)
+        self.assertEqual(tree.bft(), vectorized.bft())
+        weights = dict(zip(vectorized._linear.order.tolist(),
+                           vectorized._linear.weights.tolist()))
+        self.assertEqual(3, weights[0])
+        counts = dict(zip(tree.indices, tree.counts))
+        self.assertTrue(weights.items() <= counts.items())
+
+    def test_insert_and_delete_with_capacity(self):
+        from elementree.lidar.octree import Octree as oc
+        from elementree.lidar.octree import Region as rg
+        self.tree.setup(8)
+        points = list(self.tree._points)
+        self.tree.build_tree(capacity=2)
+        for point in ([10, 20, 30, 0], [11, 20, 30, 0], [12, 20, 30, 0]):
+            self.tree.insert(point)
+            points.append(point)
+        self.tree.delete(0)
+        expected = oc.Octree(points[1:], rg.Region(255, 255, 255, 0, 0, 0))
+        expected.build_tree(capacity=2)
+        self.assertEqual(expected.bft(), self.tree.bft())
+
+    def _expanded(self, tree):
+        # nodes split so far, read without expanding any
+        count, nodes = 0, [tree]
+        while len(nodes) > 0:
+            node = nodes.pop()
+            if not node._pending:
+                count += 1
+                nodes.extend(child for child in node._children if child)
+        return count
+
+    def test_lazy_build(self):
+        from elementree.lidar.octree import Octree as oc
+        self.tree.setup(8)
+        self.tree.build_tree(capacity=2)
+        lazy = oc.Octree(self.array, self.region)
+        lazy.setup(8)
+        lazy.build_tree(capacity=2, lazy=True)
+        self.assertEqual(0, self._expanded(lazy))
+        self.assertEqual(self.tree.occupancy, lazy.occupancy)
+        self.assertEqual(1, self._expanded(lazy))
+        self.assertEqual(self.tree.bft(), lazy.bft())
+        self.assertEqual(self.tree.dft(), lazy.dft())
+        self.assertEqual(self.tree.indices, lazy.indices)
+
+        lazy = oc.Octree(self.array, self.region)
+        lazy.setup(8)
+        lazy.build_tree(capacity=2, lazy=True)
+        lazy.expand()
+        self.assertEqual(self._expanded(self.tree), self._expanded(lazy))
+        self.assertEqual(self.tree.bft(), lazy.bft())
+        with self.assertRaises(ValueError):
+            lazy.build_tree(vectorized=True, lazy=True)
+
+    def test_lazy_queries_split_the_touched_nodes(self):
+        from elementree.lidar.octree import Octree as oc
+        from elementree.lidar.octree import Region as rg
+        rng = np.random.default_rng(24)
+        array = rng.uniform(-50, 50, size=(3000, 4))
+        trees = []
+        for lazy in (False, True):
+            tree = oc.Octree(array, self.region)
+            tree.setup(10)
+            tree.build_tree(lazy=lazy)
+            trees.append(tree)
+        eager, lazy = trees
+        region = rg.Region(400, 300, 200, 300, 200, 100)
+        np.testing.assert_array_equal(eager.query_box(region),
+                                      lazy.query_box(region))
+        point = np.array([700.0, 100.0, 500.0])
+        np.testing.assert_array_equal(eager.knn(point, 5), lazy.knn(point, 5))
+        np.testing.assert_array_equal(eager.query_radius(point, 60),
+                                      lazy.query_radius(point, 60))
+        self.assertLess(self._expanded(lazy), self._expanded(eager) // 4)
+        self.assertEqual(eager.bft(), lazy.bft())
+
+    def test_lazy_insert_and_delete(self):
+        from elementree.lidar.octree import Octree as oc
+        trees = []
+        for lazy in (False, True):
+            tree = oc.Octree(self.array, self.region)
+            tree.setup(8)
+            tree.build_tree(lazy=lazy)
+            tree.insert([10, 20, 30, 0])
+            tree.insert([11, 20, 30, 0])
+            tree.delete(3)
+            tree.move(5, [128, 128, 128, 0])
+            trees.append(tree)
+        self.assertEqual(trees[0].bft(), trees[1].bft())
+        self.assertEqual(trees[0].pop_changes(), trees[1].pop_changes())
 
 if __name__ == '__main__':
     unittest.main(verbosity=3)
@@ -0,0 +1,77 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import unittest
+import numpy as np
+
+
+class TestParallel(unittest.TestCase):
+    def setUp(self):
+        from elementree.lidar.octree.Region import Region
+        rng = np.random.default_rng(9)
+        self.array = rng.integers(0, 1000, size=(5000, 4))
+        # duplicates collapse to a single cell in both builds
+        self.array[:500] = self.array[0]
+        self.region = Region(1023, 1023, 1023, 0, 0, 0)
+
+    def _assert_same(self, expected, result):
+        np.testing.assert_array_equal(expected[0], result[0])
+        for a, b in zip(expected[1], result[1]):
+            np.testing.assert_array_equal(a, b)
+
+    def test_matches_serial_build(self):
+        from elementree.lidar.octree import morton, parallel
+        expected = morton.build(self.array, self.region)
+        for split_depth in (1, 3):
+            result = parallel.build(self.array, self.region, workers=2,
+                                    split_depth=split_depth)
+            self._assert_same(expected, result)
+
+    def test_weights(self):
+        from elementree.lidar.octree import morton, parallel
+        weights = np.arange(len(self.array)) % 3
+        expected = morton.build(self.array, self.region, weights=weights)
+        result = parallel.build(self.array, self.region, weights=weights, workers=2)
+        self._assert_same(expected, result)
+
+    def test_stopping_criteria(self):
+        from elementree.lidar.octree import morton, parallel
+        for max_level in (2, 6):
+            expected = morton.build(self.array, self.region, capacity=4,
+                                    max_level=max_level)
+            result = parallel.build(self.array, self.region, workers=2,
+                                    capacity=4, max_level=max_level)
+            self._assert_same(expected, result)
+
+    def test_linear_octree_workers(self):
+        from elementree.lidar.octree.LinearOctree import LinearOctree
+        serial = LinearOctree(self.array, self.region)
+        serial.build_tree()
+        tree = LinearOctree(self.array, self.region)
+        tree.build_tree(workers=2)
+        self.assertEqual(serial.bft(), tree.bft())
+        np.testing.assert_array_equal(serial.points, tree.points)
+
+    def test_split_depth_range(self):
+        from elementree.lidar.octree import parallel
+        with self.assertRaises(ValueError):
+            parallel.build(self.array, self.region, split_depth=6)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=3)
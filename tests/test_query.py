@@ -0,0 +1,102 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import unittest
+import numpy as np
+
+
+class TestQuery(unittest.TestCase):
+    def setUp(self):
+        from elementree import utils
+        from elementree.lidar.octree.Octree import Octree
+        from elementree.lidar.octree.Region import Region
+        rng = np.random.default_rng(5)
+        self.array = rng.uniform(-50, 50, size=(2000, 4)).astype(np.float32)
+        region = Region(x_max=1, x_min=0, y_max=1, y_min=0, z_max=1, z_min=0)
+        self.trees = []
+        for vectorized in (False, True):
+            tree = Octree(self.array.copy(), region)
+            tree.setup(10)
+            tree.build_tree(vectorized=vectorized)
+            self.trees.append(tree)
+        scaled, _ = utils.quantize(self.array, 1023, np.float32(0))
+        self.coords = scaled[:, :3].astype(np.float64)
+        # points on the upper bound are dropped from the tree
+        self.kept = np.all(self.coords < 1023, axis=1)
+        self.queries = rng.uniform(0, 1023, size=(10, 3))
+
+    def test_query_box(self):
+        from elementree.lidar.octree.Region import Region
+        region = Region(x_max=600, x_min=100, y_max=700, y_min=200,
+                        z_max=800, z_min=300)
+        expected = np.flatnonzero(np.all(
+            (self.coords >= [100, 200, 300]) & (self.coords < [600, 700, 800]),
+            axis=1
+        ))
+        for tree in self.trees:
+            np.testing.assert_array_equal(tree.query_box(region), expected)
+            found = tree.query_box([region, region])
+            self.assertEqual(len(found), 2)
+            np.testing.assert_array_equal(found[1], expected)
+
+    def test_query_radius(self):
+        for tree in self.trees:
+            found = tree.query_radius(self.queries, 120)
+            self.assertEqual(len(found), len(self.queries))
+            for query, indices in zip(self.queries, found):
+                distance = np.sum((self.coords - query) ** 2, axis=1)
+                expected = np.flatnonzero((distance <= 120 ** 2) & self.kept)
+                np.testing.assert_array_equal(indices, expected)
+            np.testing.assert_array_equal(
+                tree.query_radius(self.queries[0], 120), found[0]
+            )
+
+    def test_knn(self):
+        for tree in self.trees:
+            found = tree.knn(self.queries, 8)
+            self.assertEqual(found.shape, (len(self.queries), 8))
+            for query, indices in zip(self.queries, found):
+                distance = np.sum((self.coords - query) ** 2, axis=1)
+                distance[~self.kept] = np.inf
+                expected = np.lexsort((np.arange(len(distance)), distance))[:8]
+                np.testing.assert_array_equal(indices, expected)
+            np.testing.assert_array_equal(
+                tree.knn(self.queries[0], 8), found[0]
+            )
+
+    def test_knn_ties_in_index_order(self):
+        from elementree.lidar.octree.Octree import Octree
+        from elementree.lidar.octree.Region import Region
+        # points 0 and 8 are both at squared distance 50, the leaf of point 8
+        # is opened before the node holding point 0
+        points = [[14, 4, 8], [13, 9, 11], [11, 6, 1], [10, 0, 5], [0, 7, 1],
+                  [13, 4, 15], [0, 4, 9], [5, 9, 5], [7, 3, 0], [13, 8, 13],
+                  [2, 10, 0], [14, 12, 3]]
+        tree = Octree(points, Region(16, 16, 16, 0, 0, 0))
+        tree.build_tree()
+        np.testing.assert_array_equal(tree.knn([14, 3, 1], 3), [2, 3, 0])
+
+    def test_knn_more_than_points(self):
+        from elementree.lidar.octree.LinearOctree import LinearOctree
+        from elementree.lidar.octree.Region import Region
+        tree = LinearOctree(
+            np.array([[1, 1, 1], [5, 5, 5], [9, 2, 3]], dtype=np.float64),
+            Region(16, 16, 16, 0, 0, 0)
+        )
+        tree.build_tree()
+        np.testing.assert_array_equal(tree.knn([0, 0, 0], 10), [0, 1, 2])
@@ -0,0 +1,146 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+import os
+import tempfile
+import unittest
+import numpy as np
+
+FIELDS = [('x', '<f4'), ('y', '<f4'), ('z', '<f4'), ('intensity', '<f4'),
+          ('ring', '<u2')]
+
+
+class TestReaders(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(23)
+        self.cloud = np.zeros(500, dtype=FIELDS)
+        for name in ('x', 'y', 'z', 'intensity'):
+            self.cloud[name] = rng.uniform(-40, 40, 500)
+        self.cloud['ring'] = rng.integers(0, 64, 500)
+        self.xyzi = np.stack([self.cloud[name] for name in
+                              ('x', 'y', 'z', 'intensity')], axis=1)
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def _write_pcd(self, data='binary'):
+        path = self._path('cloud.pcd')
+        header = (
+            '# .PCD v0.7 - Point Cloud Data file format\n'
+            'VERSION 0.7\n'
+            'FIELDS x y z intensity ring\n'
+            'SIZE 4 4 4 4 2\n'
+            'TYPE F F F F U\n'
+            'COUNT 1 1 1 1 1\n'
+            f'WIDTH {len(self.cloud)}\n'
+            'HEIGHT 1\n'
+            'VIEWPOINT 0 0 0 1 0 0 0\n'
+            f'POINTS {len(self.cloud)}\n'
+            f'DATA {data}\n'
+        )
+        with open(path, 'wb') as file:
+            file.write(header.encode('ascii'))
+            file.write(self.cloud.tobytes())
+        return path
+
+    def _write_ply(self, format='binary_little_endian'):
+        path = self._path('cloud.ply')
+        header = (
+            'ply\n'
+            f'format {format} 1.0\n'
+            'comment written by the tests\n'
+            'element camera 1\n'
+            'property double view_x\n'
+            'property uchar id\n'
+            f'element vertex {len(self.cloud)}\n'
+            'property float x\n'
+            'property float y\n'
+            'property float z\n'
+            'property float intensity\n'
+            'property ushort ring\n'
+            'end_header\n'
+        )
+        with open(path, 'wb') as file:
+            file.write(header.encode('ascii'))
+            file.write(np.zeros(1, dtype=[('view_x', '<f8'), ('id', 'u1')]).tobytes())
+            file.write(self.cloud.tobytes())
+        return path
+
+    def test_read_bin(self):
+        from elementree.lidar import readers
+        path = self._path('000000.bin')
+        self.xyzi.astype(np.float32).tofile(path)
+        points = readers.read_bin(path)
+        self.assertIsInstance(points, np.memmap)
+        self.assertEqual(points.shape, (500, 4))
+        self.assertFalse(points.flags.writeable)
+        np.testing.assert_array_equal(points, self.xyzi)
+        np.testing.assert_array_equal(readers.read(path), self.xyzi)
+
+    def test_read_pcd(self):
+        from elementree.lidar import readers
+        cloud = readers.read_pcd(self._write_pcd())
+        self.assertIsInstance(cloud, np.memmap)
+        self.assertEqual(cloud.dtype, np.dtype(FIELDS))
+        np.testing.assert_array_equal(cloud, self.cloud)
+
+        points = readers.columns(cloud)
+        self.assertTrue(np.shares_memory(points, cloud))
+        np.testing.assert_array_equal(points, self.xyzi)
+        np.testing.assert_array_equal(readers.read(self._path('cloud.pcd')),
+                                      self.xyzi)
+
+    def test_read_ply(self):
+        from elementree.lidar import readers
+        cloud = readers.read_ply(self._write_ply())
+        np.testing.assert_array_equal(cloud, self.cloud)
+        points = readers.columns(cloud, ('x', 'y', 'z'))
+        self.assertTrue(np.shares_memory(points, cloud))
+        np.testing.assert_array_equal(points, self.xyzi[:, :3])
+
+    def test_unmappable_files(self):
+        from elementree.lidar import readers
+        with self.assertRaises(ValueError):
+            readers.read_pcd(self._write_pcd('ascii'))
+        with self.assertRaises(ValueError):
+            readers.read_ply(self._write_ply('ascii'))
+        with self.assertRaises(ValueError):
+            readers.read(self._path('cloud.las'))
+
+    def test_mapped_points_build_the_same_tree(self):
+        from elementree.lidar import readers
+        from elementree.lidar.octree.Octree import Octree
+        from elementree.lidar.octree.Region import Region
+        points = readers.read(self._write_pcd())
+        trees = []
+        for cloud in (points, self.xyzi.tolist()):
+            tree = Octree(cloud, Region(1, 1, 1, 0, 0, 0))
+            tree.setup(10)
+            tree.build_tree()
+            trees.append(tree)
+        self.assertEqual(trees[0].bft(), trees[1].bft())
+        self.assertEqual(trees[0].points, trees[1].points)
+        # the file is only read, never written
+        np.testing.assert_array_equal(points, self.xyzi)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -32,6 +32,49 @@ class TestRegion(unittest.TestCase):
         within_bounds = self.region.within_bounds(point=(14, 2, 1))
         self.assertFalse(within_bounds)
 
+    def test_getitem(self):
+        from elementree.lidar.octree import cfg
+        self.assertEqual(5, self.region[cfg.X_MAX])
+        self.assertEqual(-5, self.region[cfg.Z_MIN])
+        self.assertEqual((-5, -5, -5), self.region.lo)
+        self.assertEqual((5, 5, 5), self.region.hi)
+
+    def test_box(self):
+        import numpy as np
+        lo, hi = self.region.box()
+        self.assertEqual(np.float64, lo.dtype)
+        np.testing.assert_array_equal([-5, -5, -5], lo)
+        np.testing.assert_array_equal([5, 5, 5], hi)
+
+    def test_children_tile_region(self):
+        import numpy as np
+        from elementree.lidar.octree import morton
+        center = self.region.center()
+        self.assertEqual((0, 0, 0), center)
+        children = self.region.children()
+        grid = np.stack(np.meshgrid(*[np.arange(-5, 5)] * 3), -1).reshape(-1, 3)
+        inside = np.array([[child.within_bounds(p) for child in children]
+                           for p in grid.tolist()])
+        self.assertTrue(np.all(inside.sum(axis=1) == 1))
+        for octant, child in enumerate(children):
+            upper = morton.OCTANT_BITS[octant]
+            for axis in range(3):
+                expected = (0, 5) if upper[axis] else (-5, 0)
+                self.assertEqual(expected, (child.lo[axis], child.hi[axis]))
+
+    def test_contains_and_octants(self):
+        import numpy as np
+        points = np.array([[4, 2, 1], [14, 2, 1], [-5, -5, -5], [0, -1, 0],
+                           [5, 0, 0]])
+        self.assertEqual([True, False, True, True, False],
+                         self.region.contains(points).tolist())
+        octants = self.region.octants(points)
+        self.assertEqual([0, -1, 5, 3, -1], octants.tolist())
+        children = self.region.children()
+        for point, octant in zip(points.tolist(), octants.tolist()):
+            if octant >= 0:
+                self.assertTrue(children[octant].within_bounds(point))
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=3)
@@ -0,0 +1,91 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import os
+import tempfile
+import unittest
+import numpy as np
+
+
+class TestSerialize(unittest.TestCase):
+    def setUp(self):
+        from elementree.lidar.octree.Octree import Octree
+        from elementree.lidar.octree.Region import Region
+        rng = np.random.default_rng(17)
+        self.array = rng.uniform(-50, 50, size=(1500, 4)).astype(np.float32)
+        self.tree = Octree(self.array.copy(), Region(1, 1, 1, 0, 0, 0))
+        self.tree.setup(10)
+        self.tree.build_tree()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'tree.etoc')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        from elementree.lidar.octree import serialize
+        serialize.save(self.tree, self.path)
+        for mmap in (True, False):
+            tree = serialize.load(self.path, mmap=mmap)
+            self.assertEqual(self.tree.bft(), tree.bft())
+            self.assertEqual(self.tree.dft(), tree.dft())
+            self.assertEqual(10, tree.levels)
+            self.assertEqual(self.tree.scaling_factor, tree.scaling_factor)
+            for key in ('x_min', 'x_max', 'y_min', 'y_max', 'z_min', 'z_max'):
+                self.assertEqual(self.tree.bounds[key], tree.bounds[key])
+
+    def test_loaded_tree_is_memory_mapped(self):
+        from elementree.lidar.octree import serialize
+        serialize.save(self.tree, self.path)
+        tree = serialize.load(self.path)
+        self.assertIsInstance(tree.occupancy, np.memmap)
+        self.assertIsInstance(tree.points, np.memmap)
+
+    def test_queries_on_loaded_tree(self):
+        from elementree.lidar.octree import serialize
+        serialize.save(self.tree, self.path)
+        tree = serialize.load(self.path)
+        query = np.array([[100, 200, 300], [900, 20, 512]], dtype=np.float64)
+        for expected, found in zip(self.tree.query_radius(query, 150),
+                                   tree.query_radius(query, 150)):
+            np.testing.assert_array_equal(expected, found)
+        np.testing.assert_array_equal(self.tree.knn(query, 5), tree.knn(query, 5))
+
+    def test_without_points(self):
+        from elementree.lidar.octree import serialize
+        serialize.save(self.tree, self.path, points=False)
+        tree = serialize.load(self.path)
+        self.assertEqual(self.tree.bft(), tree.bft())
+        self.assertEqual(0, tree.points.shape[1])
+
+    def test_weights_and_no_transform(self):
+        from elementree.lidar.octree import serialize
+        from elementree.lidar.octree.StreamBuilder import build_streaming
+        built = build_streaming(self.array, 8, chunk_size=500)
+        serialize.save(built, self.path)
+        tree = serialize.load(self.path)
+        np.testing.assert_array_equal(built.weights, tree.weights)
+        np.testing.assert_array_equal(built.occupancy, tree.occupancy)
+        self.assertIsNone(tree.transform)
+
+    def test_rejects_other_files(self):
+        from elementree.lidar.octree import serialize
+        with open(self.path, 'wb') as file:
+            file.write(b'\0' * 1024)
+        with self.assertRaises(ValueError):
+            serialize.load(self.path)
@@ -0,0 +1,112 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import os
+import tempfile
+import unittest
+import numpy as np
+
+
+class TestStreamBuilder(unittest.TestCase):
+    def setUp(self):
+        from elementree.lidar.octree.LinearOctree import LinearOctree
+        from elementree.lidar.octree.Region import Region
+        rng = np.random.default_rng(5)
+        self.array = rng.normal(size=(3000, 4)).astype(np.float32)
+        self.tree = LinearOctree(self.array.copy(), Region(1, 1, 1, 0, 0, 0))
+        self.tree.setup(8)
+        self.tree.build_tree()
+
+    def test_matches_setup_build(self):
+        from elementree.lidar.octree.StreamBuilder import build_streaming
+        tree = build_streaming(self.array, 8, chunk_size=128)
+        self.assertEqual(self.tree.bft(), tree.bft())
+
+    def test_float32_input_matches_object_build(self):
+        from elementree.lidar.octree.LinearOctree import LinearOctree
+        from elementree.lidar.octree.Octree import Octree
+        from elementree.lidar.octree.Region import Region
+        from elementree.lidar.octree.StreamBuilder import build_streaming
+        # quantized in float32 some of these points land in another cell
+        # than Octree puts them in from its list of Python floats
+        array = np.random.default_rng(0).uniform(
+            -50, 50, size=(2000, 4)).astype(np.float32)
+        tree = Octree(array.copy(), Region(1, 1, 1, 0, 0, 0))
+        tree.setup(16)
+        tree.build_tree(vectorized=True)
+        linear = LinearOctree(array.copy(), Region(1, 1, 1, 0, 0, 0))
+        linear.setup(16)
+        linear.build_tree()
+        self.assertEqual(tree.bft(), linear.bft())
+        self.assertEqual(tree.bft(),
+                         build_streaming(array, 16, chunk_size=300).bft())
+
+    def test_levels_fit_the_packed_positions(self):
+        from elementree.lidar.octree.LinearOctree import LinearOctree
+        from elementree.lidar.octree.Region import Region
+        from elementree.lidar.octree.StreamBuilder import StreamBuilder
+        builder = StreamBuilder(21)
+        builder.scan([self.array])
+        builder.insert(self.array)
+        tree = LinearOctree(self.array.copy(), Region(1, 1, 1, 0, 0, 0))
+        tree.setup(21)
+        tree.build_tree()
+        self.assertEqual(tree.bft(), builder.build_tree().bft())
+        with self.assertRaises(ValueError):
+            StreamBuilder(22)
+
+    def test_npy_and_raw_files(self):
+        from elementree.lidar.octree.StreamBuilder import build_streaming
+        with tempfile.TemporaryDirectory() as directory:
+            npy = os.path.join(directory, 'cloud.npy')
+            raw = os.path.join(directory, 'cloud.bin')
+            np.save(npy, self.array)
+            self.array.tofile(raw)
+            self.assertEqual(self.tree.bft(), build_streaming(npy, 8, chunk_size=500).bft())
+            self.assertEqual(self.tree.bft(), build_streaming(raw, 8, chunk_size=500).bft())
+
+    def test_path_source(self):
+        import pathlib
+        from elementree.lidar.octree.StreamBuilder import build_streaming
+        with tempfile.TemporaryDirectory() as directory:
+            npy = pathlib.Path(directory) / 'cloud.npy'
+            np.save(npy, self.array)
+            self.assertEqual(self.tree.bft(), build_streaming(npy, 8, chunk_size=500).bft())
+
+    def test_supplied_bounds(self):
+        from elementree.lidar.octree.Region import Region
+        from elementree.lidar.octree.StreamBuilder import StreamBuilder
+        from elementree.utils import find_bounds
+        x_max, x_min, y_max, y_min, z_max, z_min = find_bounds(self.array)
+        bounds = Region(x_max=x_max, y_max=y_max, z_max=z_max,
+                        x_min=x_min, y_min=y_min, z_min=z_min)
+        builder = StreamBuilder(8, bounds)
+        for chunk in np.array_split(self.array, 7):
+            builder.insert(chunk)
+        self.assertEqual(self.tree.scaling_factor, builder.scaling_factor)
+        self.assertEqual(self.tree.bft(), builder.build_tree().bft())
+        self.assertEqual(len(self.array), builder.inserted)
+
+    def test_one_shot_iterator_needs_bounds(self):
+        from elementree.lidar.octree.StreamBuilder import build_streaming
+        with self.assertRaises(ValueError):
+            build_streaming(iter(np.array_split(self.array, 3)), 8)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=3)
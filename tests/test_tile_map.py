@@ -0,0 +1,112 @@
+# ------------------------------------------------------------------------------
+#      ElemenTree - Python library of tree data structures
+#      Copyright (C) 2023  Michael Nutt
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU General Public License as published by
+#      the Free Software Foundation, either version 3 of the License, or
+#      (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU General Public License for more details.
+#
+#      You should have received a copy of the GNU General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+import os
+import tempfile
+import unittest
+import numpy as np
+
+
+class TestTileMap(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(22)
+        self.points = rng.uniform(-30, 30, size=(3000, 3))
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _map(self, budget):
+        from elementree.lidar.octree.TileMap import TileMap
+        tiles = TileMap(10.0, 8, budget, directory=self.directory.name)
+        tiles.insert(self.points[:2000])
+        tiles.insert(self.points[2000:])
+        return tiles
+
+    def _corners(self, tiles):
+        # world position of the cell corner every point is stored at
+        key = np.floor(self.points / tiles.tile_size)
+        cells = np.floor((self.points - key * tiles.tile_size) / tiles.resolution)
+        return key * tiles.tile_size + cells * tiles.resolution
+
+    def test_routes_points_to_tiles(self):
+        from elementree.lidar.octree.Region import Region
+        tiles = self._map(1 << 30)
+        self.assertEqual(len(tiles), 3000)
+        self.assertEqual(len(tiles.tiles), 216)
+        self.assertEqual(tiles.evictions, 0)
+        everything = tiles.query_box(
+            Region(100, 100, 100, -100, -100, -100))
+        np.testing.assert_array_equal(everything, np.arange(3000))
+
+    def test_queries_across_tile_boundaries(self):
+        from elementree.lidar.octree.Region import Region
+        tiles = self._map(1 << 30)
+        corners = self._corners(tiles)
+
+        region = Region(12.5, 3.0, 25.0, -7.5, -14.0, 5.0)
+        inside = np.all((corners >= [-7.5, -14.0, 5.0]) &
+                        (corners < [12.5, 3.0, 25.0]), axis=1)
+        np.testing.assert_array_equal(tiles.query_box(region),
+                                      np.flatnonzero(inside))
+
+        centre = np.array([0.3, 9.8, -10.1])
+        distance = np.linalg.norm(corners - centre, axis=1)
+        np.testing.assert_array_equal(tiles.query_radius(centre, 6.0),
+                                      np.flatnonzero(distance <= 6.0))
+        expected = np.lexsort((np.arange(3000), distance))[:15]
+        np.testing.assert_array_equal(tiles.knn(centre, 15), expected)
+
+    def test_evicted_tiles_are_reloaded(self):
+        from elementree.lidar.octree.Region import Region
+        reference = self._map(1 << 30)
+        tiles = self._map(20_000)
+        self.assertLessEqual(tiles.resident_bytes, 20_000)
+        self.assertGreater(tiles.evictions, 0)
+        self.assertEqual(tiles.spills, tiles.evictions)
+        self.assertGreater(len(os.listdir(self.directory.name)), 0)
+
+        region = Region(30, 30, 30, -30, -30, -30)
+        np.testing.assert_array_equal(tiles.query_box(region),
+                                      reference.query_box(region))
+        self.assertGreater(tiles.misses, 0)
+        for centre in ([0, 0, 0], [-25, 14, 3]):
+            np.testing.assert_array_equal(tiles.knn(centre, 20),
+                                          reference.knn(centre, 20))
+        self.assertLessEqual(tiles.resident_bytes, 20_000)
+
+    def test_hit_rate(self):
+        tiles = self._map(1 << 30)
+        self.assertEqual(tiles.hit_rate, 0.0)
+        tiles.query_radius([5, 5, 5], 1.0)
+        self.assertEqual(tiles.hits, 1)
+        tiles.query_radius([10, 10, 10], 1.0)
+        self.assertEqual(tiles.hits, 9)
+        self.assertEqual(tiles.misses, 0)
+        self.assertEqual(tiles.hit_rate, 1.0)
+
+    def test_flush_writes_changed_tiles(self):
+        tiles = self._map(1 << 30)
+        tiles.flush()
+        self.assertEqual(len(os.listdir(self.directory.name)), 216)
+        self.assertEqual(tiles.spills, 216)
+        tiles.flush()
+        self.assertEqual(tiles.spills, 216)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -82,11 +82,88 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(178, scaled_8[1])
         self.assertEqual(204, scaled_8[2])
 
+    def test_quantize_matches_scale_to_range(self):
+        from elementree.utils import quantize, scale_to_range
+        points = self.array.astype(np.float32)
+        scaled, transform = quantize(points, np.float32(255), np.float32(0))
+        for axis in range(3):
+            column = points[:, axis:axis + 1].copy()
+            expected, factor = scale_to_range(np.float32(255), np.float32(0), column)
+            self.assertTrue(np.array_equal(expected[:, 0], scaled[:, axis]))
+            self.assertEqual(factor, transform.scale[axis])
+        self.assertTrue(np.array_equal(points[:, 3], scaled[:, 3]))
+
+    def test_quantize_in_place(self):
+        from elementree.utils import quantize
+        points = self.array.astype(np.float32)
+        scaled, _ = quantize(points, np.float32(255), np.float32(0), inplace=True)
+        self.assertIs(points, scaled)
+        self.assertEqual(255, points[:, 0].max())
+
+    def test_transform_round_trip(self):
+        from elementree.utils import quantize
+        scaled, transform = quantize(self.array, np.float32(65535), np.float32(0))
+        self.assertTrue(np.array_equal(scaled[:, :3], transform.apply(self.array)))
+        restored = transform.invert(scaled[:, :3])
+        self.assertTrue(np.all(np.abs(restored - self.array[:, :3]) < 1e-3))
+
+    def test_quantize_single_value_axis(self):
+        from elementree.utils import quantize
+        points = self.array.copy()
+        points[:, 2] = 3
+        scaled, transform = quantize(points, np.float32(255), np.float32(0))
+        self.assertEqual(0, transform.scale[2])
+        self.assertTrue(np.all(scaled[:, 2] == 0))
+        self.assertTrue(np.all(transform.invert(scaled[:, :3])[:, 2] == 3))
+
     def test_find_center_point(self):
         from elementree.utils import find_center_point
         cp = find_center_point(0, 255)
         self.assertEqual(127, cp)
 
+    def test_voxelize(self):
+        from elementree.utils import quantize, voxelize
+        scaled, _ = quantize(self.array.astype(np.float64), 255, 0)
+        voxels = voxelize(self.array, 8, 8)
+        self.assertTrue(np.array_equal(
+            np.unique(scaled[:, :3].astype(np.int64), axis=0), voxels
+        ))
+        voxels, counts, means = voxelize(self.array, 8, 1, counts=True,
+                                         column=3)
+        self.assertTrue(np.all(voxels % 128 == 0))
+        self.assertEqual(len(self.array), counts.sum())
+        cells = [tuple(c) for c in scaled[:, :3].astype(np.int64) // 128 * 128]
+        for voxel, count, mean in zip(voxels.tolist(), counts, means):
+            rows = [i for i, cell in enumerate(cells) if cell == tuple(voxel)]
+            self.assertEqual(len(rows), count)
+            self.assertAlmostEqual(self.array[rows, 3].mean(), mean)
+        self.assertEqual([[0, 0, 0]], voxelize(self.array, 8, 0).tolist())
+        with self.assertRaises(ValueError):
+            voxelize(self.array, 8, 9)
+
+    def test_voxelize_levels_fit_the_key(self):
+        from elementree.utils import voxelize
+        voxels = voxelize(self.array, 21, 21)
+        self.assertEqual(len(np.unique(voxels, axis=0)), len(voxels))
+        self.assertTrue(np.all(voxels < 2 ** 21))
+        with self.assertRaises(ValueError):
+            voxelize(self.array, 22, 22)
+
+    def test_voxelize_drops_points_outside_the_transform(self):
+        from elementree.utils import Transform, voxelize
+        transform = Transform.from_bounds(np.array([10, 10, 10]),
+                                          np.zeros(3), 255, 0)
+        points = np.array([[1, 1, 1, 2],
+                           [9, 9, 9, 4],
+                           [10.5, 5, 5, 8],
+                           [-1, 5, 5, 16],
+                           [1, 1, 1, 6]], dtype=np.float64)
+        voxels, counts, means = voxelize(points, 8, 8, counts=True, column=3,
+                                         transform=transform)
+        self.assertEqual([[25, 25, 25], [229, 229, 229]], voxels.tolist())
+        self.assertEqual([2, 1], counts.tolist())
+        self.assertEqual([4, 4], means.tolist())
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=3)
\ No newline at end of file